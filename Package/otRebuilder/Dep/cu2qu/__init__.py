@@ -15,6 +15,8 @@
 
 from __future__ import print_function, division, absolute_import
 
+import math
+
 __version__ = "1.2.0"
 
 __all__ = ['curve_to_quadratic', 'curves_to_quadratic']
@@ -218,6 +220,23 @@ def cubic_approx_spline(cubic, n, tolerance, _2_3=2/3):
     return spline
 
 
+def cubic_approx_n_bound(cubic, tolerance, _1_3=1/3):
+    """Return a lower bound of the number of quadratics for which
+    cubic_approx_spline() may find an approximation within tolerance.
+
+    Each of n pieces of the cubic has 1/n**3 of its leading coefficient,
+    and no quadratic comes closer than 1/32 of that to a cubic over the
+    whole piece (Chebyshev), so every smaller n fails.
+    """
+
+    if tolerance <= 0:
+        return 1
+    a = cubic[3] - cubic[0] + (cubic[1] - cubic[2]) * 3
+    # Lowered a bit, so as to stay a bound despite rounding errors.
+    n = math.ceil((abs(a) * .999 / (32 * tolerance)) ** _1_3)
+    return max(1, int(n))
+
+
 def curve_to_quadratic(curve, max_err):
     """Return a quadratic spline approximating this cubic bezier.
     Raise 'ApproxNotFoundError' if no suitable approximation can be found
@@ -226,7 +245,7 @@ def curve_to_quadratic(curve, max_err):
 
     curve = [complex(*p) for p in curve]
 
-    for n in range(1, MAX_N + 1):
+    for n in range(cubic_approx_n_bound(curve, max_err), MAX_N + 1):
         spline = cubic_approx_spline(curve, n, max_err)
         if spline is not None:
             # done. go home
@@ -247,8 +266,14 @@ def curves_to_quadratic(curves, max_errors):
 
     l = len(curves)
     splines = [None] * l
-    last_i = i = 0
-    n = 1
+    # Start with the curve needing the most quadratics, at the least
+    # number of them which may do for all curves.
+    n_bounds = [cubic_approx_n_bound(curve, max_err)
+                for curve, max_err in zip(curves, max_errors)]
+    n = max(n_bounds)
+    if n > MAX_N:
+        raise ApproxNotFoundError(curves)
+    last_i = i = n_bounds.index(n)
     while True:
         spline = cubic_approx_spline(curves[i], n, max_errors[i])
         if spline is None:
@@ -0,0 +1,201 @@
+# Copyright 2015 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import print_function, division, absolute_import
+
+from itertools import chain
+
+from cu2qu import (
+    curve_to_quadratic, cubic_approx_control, split_cubic_into_n_iter,
+    ApproxNotFoundError, MAX_N)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ['batch_curve_to_quadratic']
+
+
+def batch_curve_to_quadratic(curves, max_err):
+    """Return quadratic splines approximating these cubic beziers, each one
+    as curve_to_quadratic() would.
+
+    The curves are approximated together with NumPy, trying all of them
+    with one number of quadratics after another, and trying again only
+    those which did not fit. Without NumPy, curve_to_quadratic() is called
+    for each curve instead.
+
+    Raise 'ApproxNotFoundError' if no suitable approximation can be found
+    for some curve with the given parameters.
+    """
+
+    if numpy is None:
+        return [curve_to_quadratic(curve, max_err) for curve in curves]
+    if len(curves) == 0:
+        return []
+
+    coordinates = chain.from_iterable(chain.from_iterable(curves))
+    points = numpy.fromiter(coordinates, float, len(curves) * 8)
+    points = points.reshape(len(curves), 4, 2)
+    cubics = numpy.empty((len(curves), 4), dtype=complex)
+    cubics.real = points[:, :, 0]
+    cubics.imag = points[:, :, 1]
+    n_bounds = cubic_approx_n_bounds(cubics, max_err)
+    splines = [None] * len(curves)
+    done = numpy.zeros(len(curves), dtype=bool)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        for n in range(1, MAX_N + 1):
+            tried = numpy.flatnonzero(~done & (n_bounds <= n))
+            if len(tried) == 0:
+                continue
+            fit, spline_points = cubic_approx_splines(cubics[tried], n, max_err)
+            for i, spline in zip(tried[fit].tolist(),
+                                 spline_points[fit].tolist()):
+                splines[i] = [(s.real, s.imag) for s in spline]
+            done[tried[fit]] = True
+            if done.all():
+                # done. go home
+                return splines
+
+    curve = curves[numpy.flatnonzero(~done)[0]]
+    raise ApproxNotFoundError([complex(*p) for p in curve])
+
+
+def cubic_approx_n_bounds(cubics, tolerance):
+    """Same as cu2qu.cubic_approx_n_bound(), for an array of cubics."""
+
+    if tolerance <= 0:
+        return numpy.ones(len(cubics))
+    a = cubics[:, 3] - cubics[:, 0] + (cubics[:, 1] - cubics[:, 2]) * 3
+    n = numpy.ceil((norm(a) * .999 / (32 * tolerance)) ** (1 / 3))
+    return numpy.maximum(n, 1)
+
+
+def calc_intersects(a, b, c, d):
+    """Same as cu2qu.calc_intersect(), for arrays of points. Also returns
+    whether the lines intersect at all."""
+
+    ab = b - a
+    cd = d - c
+    p = ab * 1j
+    divisor = dot(p, cd)
+    h = dot(p, a - c) / divisor
+    return c + cd * h, divisor != 0
+
+
+def dot(v1, v2):
+    return (v1 * v2.conjugate()).real
+
+
+def norm(v):
+    # abs() of NumPy complex numbers may differ from Python's in the last bit
+    return numpy.hypot(v.real, v.imag)
+
+
+def split_cubics_into_n(p0, p1, p2, p3, n):
+    """Same as cu2qu.split_cubic_into_n_iter(), for arrays of cubics.
+
+    The real and imaginary parts are split apart, as NumPy divides complex
+    numbers by real ones otherwise than Python does, unlike other operations.
+    """
+
+    pieces = []
+    for real, imag in zip(
+            split_cubic_into_n_iter(p0.real, p1.real, p2.real, p3.real, n),
+            split_cubic_into_n_iter(p0.imag, p1.imag, p2.imag, p3.imag, n)):
+        points = numpy.empty((4, len(p0)), dtype=complex)
+        points.real = real
+        points.imag = imag
+        pieces.append(tuple(points))
+    return pieces
+
+
+def cubic_farthest_fit_inside(p0, p1, p2, p3, tolerance):
+    """Same as cu2qu.cubic_farthest_fit_inside(), for arrays of cubics,
+    returning whether each of them fits. Instead of recursing, the halves
+    of the cubics yet undecided are checked together, round after round.
+    """
+
+    fit = numpy.ones(len(p1), dtype=bool)
+    owners = numpy.arange(len(p1))
+    p0, p1, p2, p3 = numpy.broadcast_arrays(p0, p1, p2, p3)
+    while len(owners):
+        split = ~((norm(p2) <= tolerance) & (norm(p1) <= tolerance))
+        owners, p0, p1, p2, p3 = (
+            owners[split], p0[split], p1[split], p2[split], p3[split])
+
+        mid = (p0 + 3 * (p1 + p2) + p3) * .125
+        fit[owners[norm(mid) > tolerance]] = False
+        split = fit[owners]
+        owners, p0, p1, p2, p3, mid = (
+            owners[split], p0[split], p1[split], p2[split], p3[split],
+            mid[split])
+        deriv3 = (p3 + p2 - p1 - p0) * .125
+        owners = numpy.concatenate((owners, owners))
+        p0, p1, p2, p3 = (
+            numpy.concatenate((p0, mid)),
+            numpy.concatenate(((p0 + p1) * .5, mid + deriv3)),
+            numpy.concatenate((mid - deriv3, (p2 + p3) * .5)),
+            numpy.concatenate((mid, p3)))
+    return fit
+
+
+def cubic_approx_splines(cubics, n, tolerance, _2_3=2/3):
+    """Same as cu2qu.cubic_approx_spline(), for an array of cubics.
+
+    Returns whether a spline of n quadratics is found for each cubic,
+    along with an array of the points of the splines.
+    """
+
+    c0, c1, c2, c3 = cubics.T
+    if n == 1:
+        q1, fit = calc_intersects(c0, c1, c2, c3)
+        fit[fit] = cubic_farthest_fit_inside(0,
+                                             (c0 + (q1 - c0) * _2_3 - c1)[fit],
+                                             (c3 + (q1 - c3) * _2_3 - c2)[fit],
+                                             0, tolerance)
+        return fit, numpy.stack((c0, q1, c3), axis=1)
+
+    pieces = split_cubics_into_n(c0, c1, c2, c3, n)
+    controls = [cubic_approx_control(pieces[0], 0)]
+    controls += [cubic_approx_control(pieces[i], i / (n-1))
+                 for i in range(1, n)]
+
+    # Errors of all quadratics are checked together, for the cubics whose
+    # end-point deltas are all within tolerance.
+    fit = numpy.ones(len(cubics), dtype=bool)
+    deltas = []
+    q2 = c0
+    d1 = 0j
+    for i in range(1, n+1):
+        piece_c0, piece_c1, piece_c2, piece_c3 = pieces[i-1]
+        q0 = q2
+        q1 = controls[i-1]
+        if i < n:
+            q2 = (q1 + controls[i]) * .5
+        else:
+            q2 = piece_c3
+        d0 = d1
+        d1 = q2 - piece_c3
+        fit &= ~(norm(d1) > tolerance)
+        deltas.append(numpy.broadcast_arrays(
+            d0, q0 + (q1 - q0) * _2_3 - piece_c1,
+            q2 + (q1 - q2) * _2_3 - piece_c2, d1))
+    fit[fit] = cubic_farthest_fit_inside(
+        *[numpy.concatenate([p[fit] for p in points])
+          for points in zip(*deltas)],
+        tolerance=tolerance).reshape(n, -1).all(axis=0)
+    return fit, numpy.stack([c0] + controls + [c3], axis=1)
@@ -18,7 +18,12 @@ from __future__ import print_function, division, absolute_import
 import random
 import timeit
 
+from cu2qu import (
+    curve_to_quadratic, cubic_approx_spline, ApproxNotFoundError, MAX_N)
+
 MAX_ERR = 5
+TIGHT_MAX_ERR = 0.25
+BATCH_SIZE = 1000
 
 SETUP_CODE = '''
 from %(module)s import %(function)s
@@ -44,6 +49,74 @@ def setup_curves_to_quadratic():
         [MAX_ERR] * num_curves)
 
 
+def setup_curve_to_quadratic_tight():
+    return generate_curve(), TIGHT_MAX_ERR
+
+
+def setup_curves_to_quadratic_tight():
+    num_curves = 3
+    return (
+        [generate_curve() for curve in range(num_curves)],
+        [TIGHT_MAX_ERR] * num_curves)
+
+
+def setup_batch_curve_to_quadratic():
+    return [generate_curve() for curve in range(BATCH_SIZE)], MAX_ERR
+
+
+def setup_batch_curve_to_quadratic_tight():
+    return [generate_curve() for curve in range(BATCH_SIZE)], TIGHT_MAX_ERR
+
+
+# The same curves converted one by one, for comparison with cu2qu.batch.
+
+def each_curve_to_quadratic(curves, max_err):
+    return [curve_to_quadratic(curve, max_err) for curve in curves]
+
+
+setup_each_curve_to_quadratic = setup_batch_curve_to_quadratic
+setup_each_curve_to_quadratic_tight = setup_batch_curve_to_quadratic_tight
+
+
+# The former searches, which try every number of quadratics from 1, for
+# comparison with those of cu2qu starting from cubic_approx_n_bound().
+
+def linear_curve_to_quadratic(curve, max_err):
+    curve = [complex(*p) for p in curve]
+    for n in range(1, MAX_N + 1):
+        spline = cubic_approx_spline(curve, n, max_err)
+        if spline is not None:
+            return [(s.real, s.imag) for s in spline]
+    raise ApproxNotFoundError(curve)
+
+
+def linear_curves_to_quadratic(curves, max_errors):
+    curves = [[complex(*p) for p in curve] for curve in curves]
+    l = len(curves)
+    splines = [None] * l
+    last_i = i = 0
+    n = 1
+    while True:
+        spline = cubic_approx_spline(curves[i], n, max_errors[i])
+        if spline is None:
+            if n == MAX_N:
+                break
+            n += 1
+            last_i = i
+            continue
+        splines[i] = spline
+        i = (i + 1) % l
+        if i == last_i:
+            return [[(s.real, s.imag) for s in spline] for spline in splines]
+    raise ApproxNotFoundError(curves)
+
+
+setup_linear_curve_to_quadratic = setup_curve_to_quadratic
+setup_linear_curves_to_quadratic = setup_curves_to_quadratic
+setup_linear_curve_to_quadratic_tight = setup_curve_to_quadratic_tight
+setup_linear_curves_to_quadratic_tight = setup_curves_to_quadratic_tight
+
+
 def run_benchmark(
         benchmark_module, module, function, setup_suffix='', repeat=1000):
     setup_func = 'setup_' + function
@@ -63,8 +136,15 @@ def run_benchmark(
 
 
 def main():
-    run_benchmark('cu2qu.benchmark', 'cu2qu', 'curve_to_quadratic')
-    run_benchmark('cu2qu.benchmark', 'cu2qu', 'curves_to_quadratic')
+    for setup_suffix in ('', 'tight'):
+        for function in ('curve_to_quadratic', 'curves_to_quadratic'):
+            run_benchmark('cu2qu.benchmark', 'cu2qu', function, setup_suffix)
+            run_benchmark('cu2qu.benchmark', 'cu2qu.benchmark',
+                          'linear_' + function, setup_suffix)
+        run_benchmark('cu2qu.benchmark', 'cu2qu.batch',
+                      'batch_curve_to_quadratic', setup_suffix, repeat=10)
+        run_benchmark('cu2qu.benchmark', 'cu2qu.benchmark',
+                      'each_curve_to_quadratic', setup_suffix, repeat=10)
 
 
 if __name__ == '__main__':
@@ -1,6 +1,7 @@
 from __future__ import print_function, division, absolute_import
 from cu2qu import curve_to_quadratic
 from fontTools.pens.basePen import AbstractPen, decomposeSuperBezierSegment
+from fontTools.pens.recordingPen import RecordingPen
 
 try:
     from ufoLib.pointPen import AbstractPointPen, BasePointToSegmentPen
@@ -21,10 +22,12 @@ class Cu2QuPen(AbstractPen):
     reverse_direction: flip the contours' direction but keep starting point.
     stats: a dictionary counting the point numbers of quadratic segments.
     ignore_single_points: don't emit contours containing only a single point.
+    splines: an iterator of quadratic splines to use for the curves drawn,
+        in order, instead of converting them one by one; see Cu2QuCollectPen.
     """
 
     def __init__(self, other_pen, max_err, reverse_direction=False,
-                 stats=None, ignore_single_points=False):
+                 stats=None, ignore_single_points=False, splines=None):
         if reverse_direction:
             self.pen = ReverseContourPen(other_pen)
         else:
@@ -32,6 +35,7 @@ class Cu2QuPen(AbstractPen):
         self.max_err = max_err
         self.stats = stats
         self.ignore_single_points = ignore_single_points
+        self.splines = splines
         self.start_pt = None
         self.current_pt = None
 
@@ -73,8 +77,11 @@ class Cu2QuPen(AbstractPen):
             raise AssertionError("illegal qcurve segment point count: %d" % n)
 
     def _curve_to_quadratic(self, pt1, pt2, pt3):
-        curve = (self.current_pt, pt1, pt2, pt3)
-        quadratic = curve_to_quadratic(curve, self.max_err)
+        if self.splines is not None:
+            quadratic = next(self.splines)
+        else:
+            curve = (self.current_pt, pt1, pt2, pt3)
+            quadratic = curve_to_quadratic(curve, self.max_err)
         if self.stats is not None:
             n = str(len(quadratic))
             self.stats[n] = self.stats.get(n, 0) + 1
@@ -114,6 +121,54 @@ class Cu2QuPen(AbstractPen):
         self.pen.addComponent(glyphName, transformation)
 
 
+class Cu2QuCollectPen(RecordingPen):
+    """ A pen recording an outline, and collecting the cubic curves that a
+    Cu2QuPen would convert when it is replayed, in the same order. These can
+    be converted all at once with cu2qu.batch, then the recording replayed
+    onto a Cu2QuPen given the resulting splines.
+
+    curves: a list which the curves are appended to, as tuples of 4 points.
+    """
+
+    def __init__(self, curves):
+        RecordingPen.__init__(self)
+        self.curves = curves
+        self.current_pt = None
+
+    def moveTo(self, pt):
+        self.value.append(("moveTo", (pt,)))
+        self.current_pt = pt
+
+    def lineTo(self, pt):
+        self.value.append(("lineTo", (pt,)))
+        self.current_pt = pt
+
+    def qCurveTo(self, *points):
+        self.value.append(("qCurveTo", points))
+        if points:
+            self.current_pt = points[-1]
+
+    def curveTo(self, *points):
+        self.value.append(("curveTo", points))
+        n = len(points)
+        if n == 3:
+            self.curves.append((self.current_pt,) + points)
+        elif n > 3:
+            for segment in decomposeSuperBezierSegment(points):
+                self.curves.append((self.current_pt,) + segment)
+                self.current_pt = segment[-1]
+        if points:
+            self.current_pt = points[-1]
+
+    def closePath(self):
+        self.value.append(("closePath", ()))
+        self.current_pt = None
+
+    def endPath(self):
+        self.value.append(("endPath", ()))
+        self.current_pt = None
+
+
 class Cu2QuPointPen(BasePointToSegmentPen):
     """ A filter pen to convert cubic bezier curves to quadratic b-splines
     using the RoboFab PointPen protocol.
@@ -0,0 +1,83 @@
+# Copyright 2016 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import print_function, division, absolute_import
+
+import unittest
+import os
+import json
+import random
+
+from cu2qu import curve_to_quadratic, ApproxNotFoundError
+from cu2qu import batch
+from cu2qu.batch import batch_curve_to_quadratic
+from cu2qu.test import DATADIR
+
+
+class BatchCurveToQuadraticTest(unittest.TestCase):
+    """Test that converting curves together gives exactly the same results
+    as converting them one by one."""
+
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(DATADIR, "curves.json"), "r") as fp:
+            cls.curves = [[tuple(p) for p in curve] for curve in json.load(fp)]
+        rnd = random.Random(0)
+        for _ in range(200):
+            p0, p1, p2, p3 = [(rnd.randint(0, 2048), rnd.randint(0, 2048))
+                              for _ in range(4)]
+            cls.curves += [
+                [p0, p1, p2, p3],
+                # degree-elevated quadratic, which needs a single one
+                [p0, ((p0[0] + 2 * p1[0]) / 3, (p0[1] + 2 * p1[1]) / 3),
+                 ((p3[0] + 2 * p1[0]) / 3, (p3[1] + 2 * p1[1]) / 3), p3],
+                # degenerate ones, whose handles cannot be intersected
+                [p0, p0, p3, p3], [p0, p0, p0, p0], [p0, p3, p0, p3]]
+
+    def setUp(self):
+        self.numpy = batch.numpy
+
+    def tearDown(self):
+        batch.numpy = self.numpy
+
+    def check_same_results(self):
+        for max_err in (5, 1, 0.1):
+            self.assertEqual(
+                batch_curve_to_quadratic(self.curves, max_err),
+                [curve_to_quadratic(c, max_err) for c in self.curves])
+
+    @unittest.skipIf(batch.numpy is None, "numpy not installed")
+    def test_same_results(self):
+        self.check_same_results()
+
+    def test_same_results_without_numpy(self):
+        batch.numpy = None
+        self.check_same_results()
+
+    def test_no_curves(self):
+        self.assertEqual(batch_curve_to_quadratic([], 1), [])
+
+    def test_not_found(self):
+        quadratic = [(0, 0), (100, 200), (200, 200), (300, 0)]
+        curve = [(0, 0), (0, 100000), (100000, -100000), (100000, 0)]
+        self.assertEqual(batch_curve_to_quadratic([quadratic], 0.001),
+                         [[(0, 0), (150, 300), (300, 0)]])
+        with self.assertRaises(ApproxNotFoundError) as cm:
+            batch_curve_to_quadratic([quadratic, curve, quadratic], 0.001)
+        self.assertEqual(cm.exception.curve, [complex(*p) for p in curve])
+
+
+if __name__ == '__main__':
+    unittest.main()
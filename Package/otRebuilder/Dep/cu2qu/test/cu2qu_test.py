@@ -20,8 +20,11 @@ import math
 import unittest
 import os
 import json
+import random
 
-from cu2qu import curve_to_quadratic, curves_to_quadratic
+from cu2qu import (
+    curve_to_quadratic, curves_to_quadratic, cubic_approx_spline,
+    cubic_approx_n_bound, ApproxNotFoundError, MAX_N)
 from cu2qu.test import DATADIR
 
 
@@ -176,5 +179,61 @@ class CurveToQuadraticTest(unittest.TestCase):
                 _t3 * y1 + _3_t_t2 * y2 + _3_t2_t * y3 + t3 * y4)
 
 
+
+class MinimalNTest(unittest.TestCase):
+    """Test that starting from the lower bound of the number of quadratics
+    gives the same results as trying every number from 1."""
+
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(DATADIR, "curves.json"), "r") as fp:
+            cls.curves = json.load(fp)
+        rnd = random.Random(0)
+        cls.curves += [
+            [(rnd.uniform(0, 2048), rnd.uniform(0, 2048)) for _ in range(4)]
+            for _ in range(200)]
+
+    @staticmethod
+    def linear_search(curves, max_err):
+        curves = [[complex(*p) for p in curve] for curve in curves]
+        for n in range(1, MAX_N + 1):
+            splines = [cubic_approx_spline(c, n, max_err) for c in curves]
+            if None not in splines:
+                return [[(s.real, s.imag) for s in spline]
+                        for spline in splines]
+        return None
+
+    def test_bound(self):
+        for max_err in (5, 1, 0.1):
+            for curve in self.curves:
+                curve = [complex(*p) for p in curve]
+                for n in range(1, cubic_approx_n_bound(curve, max_err)):
+                    self.assertIsNone(cubic_approx_spline(curve, n, max_err))
+
+    def test_same_results(self):
+        for max_err in (5, 1, 0.1):
+            for curve in self.curves:
+                self.assertEqual(curve_to_quadratic(curve, max_err),
+                                 self.linear_search([curve], max_err)[0])
+
+    def test_same_results_multiple(self):
+        for max_err in (5, 1, 0.1):
+            for i in range(0, len(self.curves), 3):
+                curves = self.curves[i:i + 3]
+                self.assertEqual(
+                    curves_to_quadratic(curves, [max_err] * len(curves)),
+                    self.linear_search(curves, max_err))
+
+    def test_not_found(self):
+        curve = [(0, 0), (0, 100000), (100000, -100000), (100000, 0)]
+        self.assertGreater(cubic_approx_n_bound(
+            [complex(*p) for p in curve], 0.001), MAX_N)
+        self.assertIsNone(self.linear_search([curve], 0.001))
+        self.assertRaises(ApproxNotFoundError, curve_to_quadratic,
+                          curve, 0.001)
+        self.assertRaises(ApproxNotFoundError, curves_to_quadratic,
+                          [curve, curve], [0.001, 0.001])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,8 @@
 from __future__ import print_function, division, absolute_import
 import unittest
 
-from cu2qu.pens import Cu2QuPen, Cu2QuPointPen
+from cu2qu import curve_to_quadratic
+from cu2qu.pens import Cu2QuPen, Cu2QuCollectPen, Cu2QuPointPen
 from cu2qu.test import CUBIC_GLYPHS, QUAD_GLYPHS
 from cu2qu.test.utils import DummyGlyph, DummyPointGlyph
 from cu2qu.test.utils import DummyPen, DummyPointPen
@@ -250,6 +251,23 @@ class TestCu2QuPen(unittest.TestCase, _TestPenMixin):
             "pen.closePath()"
         ])
 
+    def test_collected_splines(self):
+        for name in ('a', 'A', 'Eacute'):
+            source = CUBIC_GLYPHS[name]
+            curves = []
+            source.draw(Cu2QuCollectPen(curves))
+            self.assertTrue(curves)
+            splines = [curve_to_quadratic(c, MAX_ERR) for c in curves]
+            splines_iter = iter(splines)
+            converted = self.convert_glyph(source, splines=splines_iter)
+            self.assertEqual(converted, self.convert_glyph(source))
+            self.assertRaises(StopIteration, next, splines_iter)
+
+            # the given splines are used instead of converting the curves
+            splines = [[s[0]] + s[1:-1][::-1] + [s[-1]] for s in splines]
+            converted = self.convert_glyph(source, splines=iter(splines))
+            self.assertNotEqual(converted, self.convert_glyph(source))
+
 
 class TestCu2QuPointPen(unittest.TestCase, _TestPenMixin):
 
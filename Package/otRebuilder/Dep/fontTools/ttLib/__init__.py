@@ -65,7 +65,8 @@ class TTFont(object):
 	def __init__(self, file=None, res_name_or_index=None,
 			sfntVersion="\000\001\000\000", flavor=None, checkChecksums=False,
 			verbose=None, recalcBBoxes=True, allowVID=False, ignoreDecompileErrors=False,
-			recalcTimestamp=True, fontNumber=-1, lazy=None, quiet=None):
+			recalcTimestamp=True, fontNumber=-1, lazy=None, quiet=None,
+			useMmap=False, tableStore=None, _tableCache=None):
 
 		"""The constructor can be called with a few different arguments.
 		When reading a font from disk, 'file' should be either a pathname
@@ -122,6 +123,21 @@ class TTFont(object):
 		If lazy is set to True, many data structures are loaded lazily, upon
 		access only.  If it is set to False, many data structures are loaded
 		immediately.  The default is lazy=None which is somewhere in between.
+
+		If useMmap is set to True, a font file on disk is memory-mapped
+		instead of being read into memory, and large tables such as 'glyf'
+		are decompiled straight from the map. The file must then not be
+		modified, or overwritten by save(), while the font is open.
+
+		The 'tableStore' argument may be an object keeping decompiled
+		tables beyond the life of the font, e.g. on disk. Its method
+		load(font, tag) returns a table which it has kept for the font,
+		or None, in which case the table is decompiled, and then given
+		to its method store(font, tag, table).
+
+		The '_tableCache' argument is for ttCollection.TTCollection only:
+		fonts of a collection sharing the dict also share the decompiled
+		tables which they read from the same place in the file.
 		"""
 
 		from fontTools.ttLib import sfnt
@@ -133,10 +149,13 @@ class TTFont(object):
 			setattr(self, name, val)
 
 		self.lazy = lazy
+		self.useMmap = useMmap
 		self.recalcBBoxes = recalcBBoxes
 		self.recalcTimestamp = recalcTimestamp
 		self.tables = {}
 		self.reader = None
+		self.tableStore = tableStore
+		self._tableCache = _tableCache
 
 		# Permit the user to reference glyphs that are not int the font.
 		self.last_vid = 0xFFFE # Can't make it be 0xFFFF, as the world is full unsigned short integer counters that get incremented after the last seen GID value.
@@ -170,8 +189,9 @@ class TTFont(object):
 		else:
 			# assume "file" is a readable file object
 			closeStream = False
-		if not self.lazy:
+		if not self.lazy and not self.useMmap:
 			# read input file in memory and wrap a stream around it to allow overwriting
+			file.seek(0)  # The fonts of a collection are read one after another
 			tmp = BytesIO(file.read())
 			if hasattr(file, 'name'):
 				# save reference to input file name
@@ -180,6 +200,8 @@ class TTFont(object):
 				file.close()
 			file = tmp
 		self.reader = sfnt.SFNTReader(file, checkChecksums, fontNumber=fontNumber)
+		if self.useMmap:
+			self.reader.mapFile()
 		self.sfntVersion = self.reader.sfntVersion
 		self.flavor = self.reader.flavor
 		self.flavorData = self.reader.flavorData
@@ -189,16 +211,23 @@ class TTFont(object):
 		if self.reader is not None:
 			self.reader.close()
 
-	def save(self, file, reorderTables=True):
+	def save(self, file, reorderTables=True, workers=None):
 		"""Save the font to disk. Similarly to the constructor,
 		the 'file' argument can be either a pathname or a writable
 		file object.
+
+		If 'workers' is greater than 1, loaded tables which are independent
+		of the others are compiled in that many worker processes, alongside
+		the rest. The output is the same as that of a serial save.
 		"""
 		from fontTools.ttLib import sfnt
 		if not hasattr(file, "write"):
 			if self.lazy and self.reader.file.name == file:
 				raise TTLibError(
 					"Can't overwrite TTFont when 'lazy' attribute is True")
+			if self.useMmap and self.reader and _isSameFile(self.reader.file, file):
+				raise TTLibError(
+					"Can't overwrite TTFont when 'useMmap' attribute is True")
 			closeStream = True
 			file = open(file, "wb")
 		else:
@@ -212,6 +241,14 @@ class TTFont(object):
 		if "GlyphOrder" in tags:
 			tags.remove("GlyphOrder")
 		numTables = len(tags)
+
+		if self.flavor is None and _isSeekable(file) and (
+				self.reader is None or self.reader.flavor is None):
+			self._saveDirect(file, tags, reorderTables, workers=workers)
+			if closeStream:
+				file.close()
+			return
+
 		# write to a temporary stream to allow saving to unseekable streams
 		tmp = BytesIO()
 		writer = sfnt.SFNTWriter(tmp, numTables, self.sfntVersion, self.flavor, self.flavorData)
@@ -245,6 +282,158 @@ class TTFont(object):
 		if closeStream:
 			file.close()
 
+	def _saveDirect(self, file, tags, reorderTables, tableCache=None, compileCache=None, workers=None):
+		"""Internal helper function for self.save(). Only tables which have
+		been loaded are compiled; the others are copied from the source file,
+		with their checksums calculated again. Everything is written to 'file'
+		in a single pass, already in the final table order.
+
+		The fonts of a collection pass a 'tableCache' for sfnt.SFNTWriter,
+		and a 'compileCache' for self._compileTable(), which are shared
+		among them.
+
+		With more than one of 'workers', the tables picked by
+		self._getParallelTables() are compiled in forked worker processes,
+		while the others are compiled here in the meantime.
+		"""
+		from fontTools.ttLib import sfnt
+		global _parallelSaveFont
+		compiled = {}
+		done = []
+		parallelTags = []
+		context = _getForkContext() if workers and workers > 1 and compileCache is None else None
+		if context is not None:
+			parallelTags = self._getParallelTables(tags)
+		if len(parallelTags) > 0:
+			for tag in parallelTags:
+				compiled[tag] = None  # Placeholder, skipped by self._compileTable()
+			_parallelSaveFont = self  # Inherited by the forked workers
+			try:
+				pool = context.Pool(min(workers, len(parallelTags)))
+			finally:
+				_parallelSaveFont = None
+			try:
+				asyncResult = pool.map_async(_compileTableInWorker, parallelTags, chunksize=1)
+				for tag in tags:
+					self._compileTable(tag, compiled, done, compileCache)
+				for tag, data in zip(parallelTags, asyncResult.get()):
+					compiled[tag] = [data]
+				pool.close()
+			except:
+				pool.terminate()
+				raise
+			finally:
+				pool.join()
+		else:
+			for tag in tags:
+				self._compileTable(tag, compiled, done, compileCache)
+
+		if reorderTables is None or (reorderTables is False and self.reader is None):
+			# don't reorder tables and save as is
+			tableOrder = done
+		elif reorderTables is False:
+			# sort tables using the original font's order
+			tableOrder = list(self.reader.keys())
+		else:
+			# use the recommended order from the OpenType specification
+			tableOrder = None
+		writer = sfnt.SFNTWriter(file, len(tags), self.sfntVersion, tableCache=tableCache)
+		for tag in sortedTagList(tags, tableOrder):
+			if tag in compiled:
+				chunks = compiled.pop(tag)
+				if len(chunks) == 1:
+					writer[tag] = chunks[0]
+				else:
+					writer.writeChunks(tag, chunks)
+			else:
+				entry = self.reader.tables[Tag(tag)]
+				if self.reader.mmap is not None:
+					data = self.reader.getView(tag)
+				else:
+					data = entry.loadData(self.reader.file)
+				writer[tag] = data
+		writer.close()
+
+	def _compileTable(self, tag, compiled, done, compileCache=None):
+		"""Internal helper function for self._saveDirect(). Same as
+		self._writeTable(), but keeps compiled data in 'compiled' as a list
+		of chunks instead of writing it, and leaves tables which have not
+		been loaded alone.
+
+		A table object shared by several fonts of a collection is compiled
+		only once, as long as the tables which it depends on, or which its
+		compile() updates, are shared as well. Those are recorded in the
+		'compileCache' dict along with the data.
+		"""
+		if tag in done:
+			return
+		tableClass = getTableClass(tag)
+		for masterTable in tableClass.dependencies:
+			if masterTable not in done:
+				if masterTable in self:
+					self._compileTable(masterTable, compiled, done, compileCache)
+				else:
+					done.append(masterTable)
+		tag = Tag(tag)
+		if self.isLoaded(tag) or tag == "head" or not (self.reader and tag in self.reader):
+			# The checksum of `head` excludes checkSumAdjustment, so it is never copied.
+			if tag in compiled:
+				pass  # Being compiled by a worker process
+			elif compileCache is None or not self.isLoaded(tag):
+				compiled[tag] = self.getTableChunks(tag)
+			else:
+				relatedTags = list(tableClass.dependencies) + list(_compileRelatedTables.get(tag, ()))
+				cacheKey = (tag, id(self.tables[tag]), self.recalcBBoxes,
+						tuple(self._getTableIdentity(relatedTag) for relatedTag in relatedTags))
+				if cacheKey in compileCache:
+					table, related, data = compileCache[cacheKey]
+					for relatedTag, relatedTable in related:
+						if relatedTable is not None and relatedTag not in self.tables:
+							self[relatedTag]  # Loaded upon compile, and maybe updated
+				else:
+					data = bytesjoin(self.getTableChunks(tag))
+					# Related tables are kept along, so that their ids are not reused.
+					related = [(relatedTag, self.tables.get(relatedTag)) for relatedTag in relatedTags]
+					compileCache[cacheKey] = (self.tables[tag], related, data)
+				compiled[tag] = [data]
+		done.append(tag)
+
+	def _getParallelTables(self, tags):
+		"""Internal helper function for self._saveDirect(). Returns the
+		loaded tables which can be compiled apart from the font: those in
+		_parallelCompileTables that neither depend on a present table nor
+		are a dependency of one. Larger tables come first, so that they
+		are not left to the end.
+		"""
+		masters = set()
+		for tag in tags:
+			masters.update(getTableClass(tag).dependencies)
+		parallelTags = []
+		for tag in tags:
+			tag = Tag(tag)
+			if tag not in _parallelCompileTables or tag in masters or not self.isLoaded(tag):
+				continue
+			if any(masterTable in self for masterTable in getTableClass(tag).dependencies):
+				continue
+			parallelTags.append(tag)
+		if self.reader is not None:
+			parallelTags.sort(key=lambda tag: -self.reader.tables[tag].length if tag in self.reader else 0)
+		return parallelTags
+
+	def _getTableIdentity(self, tag):
+		"""Internal helper function for self._compileTable(). Tells tables
+		of a collection apart: a loaded table by its object, and any other
+		by its place in the file, where it would be loaded from.
+		"""
+		tag = Tag(tag)
+		if tag in self.tables:
+			return id(self.tables[tag])
+		elif self.reader and tag in self.reader:
+			entry = self.reader.tables[tag]
+			return (entry.offset, entry.length)
+		else:
+			return None
+
 	def saveXML(self, fileOrPath, progress=None, quiet=None,
 			tables=None, skipTables=None, splitTables=False, disassembleInstructions=True,
 			bitmapGlyphDataFormat='raw', newlinestr=None):
@@ -417,8 +606,27 @@ class TTFont(object):
 			if self.reader is not None:
 				import traceback
 				log.debug("Reading '%s' table from disk", tag)
-				data = self.reader[tag]
+				if tag not in self.reader:
+					raise KeyError("'%s' table not found" % tag)
+				if self._tableCache is not None:
+					entry = self.reader.tables[tag]
+					cacheKey = (tag, entry.offset, entry.length)
+					if cacheKey in self._tableCache:
+						table = self.tables[tag] = self._tableCache[cacheKey]
+						return table
+				if self.tableStore is not None:
+					table = self.tableStore.load(self, tag)
+					if table is not None:
+						log.debug("Loaded '%s' table from the table store", tag)
+						self.tables[tag] = table
+						if self._tableCache is not None:
+							self._tableCache[cacheKey] = table
+						return table
 				tableClass = getTableClass(tag)
+				if getattr(tableClass, "decompilesViews", False):
+					data = self.reader.getView(tag)
+				else:
+					data = self.reader[tag]
 				table = tableClass(tag)
 				self.tables[tag] = table
 				log.debug("Decompiling '%s' table", tag)
@@ -436,7 +644,12 @@ class TTFont(object):
 					table = DefaultTable(tag)
 					table.ERROR = file.getvalue()
 					self.tables[tag] = table
-					table.decompile(data, self)
+					table.decompile(self.reader[tag], self)  # Never keep a view
+				else:
+					if self.tableStore is not None:
+						self.tableStore.store(self, tag, table)
+				if self._tableCache is not None:
+					self._tableCache[cacheKey] = table
 				return table
 			else:
 				raise KeyError("'%s' table not found" % tag)
@@ -468,10 +681,10 @@ class TTFont(object):
 			pass
 		if 'CFF ' in self:
 			cff = self['CFF ']
-			self.glyphOrder = cff.getGlyphOrder()
+			self.glyphOrder = self._getSharedGlyphOrder(cff)
 		elif 'post' in self:
 			# TrueType font
-			glyphOrder = self['post'].getGlyphOrder()
+			glyphOrder = self._getSharedGlyphOrder(self['post'])
 			if glyphOrder is None:
 				#
 				# No names found in the 'post' table.
@@ -485,6 +698,19 @@ class TTFont(object):
 			self._getGlyphNamesFromCmap()
 		return self.glyphOrder
 
+	def _getSharedGlyphOrder(self, table):
+		"""Internal helper function for self.getGlyphOrder(). Tables hand
+		out the glyph order only once, but fonts of a collection may share
+		the table, and they share its glyph order too.
+		"""
+		if self._tableCache is None:
+			return table.getGlyphOrder()
+		cacheKey = ("GlyphOrder", id(table))
+		cached = self._tableCache.get(cacheKey)
+		if cached is None or cached[0] is not table:
+			cached = self._tableCache[cacheKey] = (table, table.getGlyphOrder())
+		return cached[1]
+
 	def _getGlyphNamesFromCmap(self):
 		#
 		# This is rather convoluted, but then again, it's an interesting problem:
@@ -662,6 +888,16 @@ class TTFont(object):
 		writer[tag] = tabledata
 		done.append(tag)
 
+	def getTableChunks(self, tag):
+		"""Returns raw table data as a list of byte strings. Tables which can
+		compile in pieces, like 'glyf', are not joined into a single string.
+		"""
+		tag = Tag(tag)
+		if self.isLoaded(tag) and hasattr(self.tables[tag], "compileChunks"):
+			log.debug("compiling '%s' table", tag)
+			return self.tables[tag].compileChunks(self)
+		return [self.getTableData(tag)]
+
 	def getTableData(self, tag):
 		"""Returns raw table data, whether compiled or directly read from disk.
 		"""
@@ -987,6 +1223,67 @@ def sortedTagList(tagList, tableOrder=None):
 	return orderedTables
 
 
+# Tables which compile() reads or updates besides the dependencies of the
+# table, e.g. `glyf` sets the offsets of `loca`. A compiled table can only be
+# reused by another font of a collection if these are shared as well.
+_compileRelatedTables = {
+	"glyf": ("loca", "maxp"),
+	"loca": ("head",),
+	"maxp": ("hmtx", "head"),
+	"hmtx": ("hhea",),
+	"vmtx": ("vhea",),
+}
+
+
+# Tables whose compile() reads nothing but themselves and the glyph order, and
+# updates no other table, so that they can be compiled in a forked worker
+# process while the others are compiled and updated in the parent. E.g. `CFF `
+# is not among them, since `head` and `hhea` read the bounding box which its
+# compile() recalculates, nor is `post`, which reads `maxp`.
+_parallelCompileTables = frozenset([
+	"BASE", "GDEF", "GPOS", "GSUB", "JSTF", "MATH", "cmap", "kern", "name",
+])
+
+# The font being saved by TTFont._saveDirect() with worker processes, which
+# inherit it upon fork instead of having it pickled.
+_parallelSaveFont = None
+
+
+def _compileTableInWorker(tag):
+	return bytesjoin(_parallelSaveFont.getTableChunks(tag))
+
+
+def _getForkContext():
+	"""Returns the multiprocessing context which forks worker processes, or
+	None where processes can't be forked, as on Windows, or can't be started
+	at all, as in daemonic processes.
+	"""
+	import multiprocessing
+	if not hasattr(os, "fork") or multiprocessing.current_process().daemon:
+		return None
+	if hasattr(multiprocessing, "get_context"):
+		return multiprocessing.get_context("fork")
+	return multiprocessing  # Python 2 always forks on POSIX
+
+
+def _isSameFile(readerFile, path):
+	readerPath = getattr(readerFile, "name", None)
+	if not isinstance(readerPath, basestring) or not os.path.exists(path):
+		return False
+	try:
+		return os.path.samefile(readerPath, path)
+	except AttributeError:  # Python 2 on Windows
+		return os.path.normcase(os.path.abspath(readerPath)) == os.path.normcase(os.path.abspath(path))
+
+
+def _isSeekable(file):
+	try:
+		file.seek(file.tell())
+	except (AttributeError, IOError, OSError, ValueError):
+		return False
+	return True
+
+
 def reorderFontTables(inFile, outFile, tableOrder=None, checkChecksums=False):
 	"""Rewrite a font file, ordering the tables as recommended by the
 	OpenType specification 1.4.
@@ -1021,3 +1318,6 @@ def getSearchRange(n, itemSize=16):
 	entrySelector = exponent
 	rangeShift = max(0, n * itemSize - searchRange)
 	return searchRange, entrySelector, rangeShift
+
+
+from fontTools.ttLib.ttCollection import TTCollection
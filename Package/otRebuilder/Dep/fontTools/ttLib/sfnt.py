@@ -15,17 +15,28 @@ a table's length chages you need to rewrite the whole file anyway.
 from __future__ import print_function, division, absolute_import
 from fontTools.misc.py23 import *
 from fontTools.misc import sstruct
+from fontTools.misc.py23 import SimpleNamespace
 from fontTools.ttLib import getSearchRange
+import array
+import mmap
 import struct
+import sys
 from collections import OrderedDict
 import logging
 
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
 
 log = logging.getLogger(__name__)
 
 
 class SFNTReader(object):
 
+	mmap = None  # See mapFile()
+
 	def __new__(cls, *args, **kwargs):
 		""" Return an instance of the SFNTReader sub-class which is compatible
 		with the input file type.
@@ -51,19 +62,13 @@ class SFNTReader(object):
 		self.sfntVersion = self.file.read(4)
 		self.file.seek(0)
 		if self.sfntVersion == b"ttcf":
-			data = self.file.read(ttcHeaderSize)
-			if len(data) != ttcHeaderSize:
-				from fontTools import ttLib
-				raise ttLib.TTLibError("Not a Font Collection (not enough data)")
-			sstruct.unpack(ttcHeaderFormat, data, self)
-			assert self.Version == 0x00010000 or self.Version == 0x00020000, "unrecognized TTC version 0x%08x" % self.Version
-			if not 0 <= fontNumber < self.numFonts:
+			header = readTTCHeader(self.file)
+			numFonts = header.numFonts
+			if not 0 <= fontNumber < numFonts:
 				from fontTools import ttLib
-				raise ttLib.TTLibError("specify a font number between 0 and %d (inclusive)" % (self.numFonts - 1))
-			offsetTable = struct.unpack(">%dL" % self.numFonts, self.file.read(self.numFonts * 4))
-			if self.Version == 0x00020000:
-				pass # ignoring version 2.0 signatures
-			self.file.seek(offsetTable[fontNumber])
+				raise ttLib.TTLibError("specify a font number between 0 and %d (inclusive)" % (numFonts - 1))
+			self.numFonts = numFonts
+			self.file.seek(header.offsetTable[fontNumber])
 			data = self.file.read(sfntDirectorySize)
 			if len(data) != sfntDirectorySize:
 				from fontTools import ttLib
@@ -111,11 +116,38 @@ class SFNTReader(object):
 	def __getitem__(self, tag):
 		"""Fetch the raw table data."""
 		entry = self.tables[Tag(tag)]
-		data = entry.loadData (self.file)
+		if self.mmap is not None:
+			data = entry.loadData(self.mmap)
+		else:
+			data = entry.loadData(self.file)
+		self._checkChecksum(tag, entry, data)
+		return data
+
+	def getView(self, tag):
+		"""Fetch the raw table data without copying it, as a read-only
+		view into the memory-mapped file: a memoryview, or a buffer on
+		Python 2. Slicing a buffer returns a string, so callers which
+		need bytes should slice, or call bytes() on slices. When the file
+		is not memory-mapped, this is the same as reader[tag].
+		"""
+		if self.mmap is None:
+			return self[tag]
+		entry = self.tables[Tag(tag)]
+		if sys.version_info[0] < 3:
+			data = buffer(self.mmap, entry.offset, entry.length)
+		else:
+			data = memoryview(self.mmap)[entry.offset:entry.offset + entry.length]
+		if len(data) != entry.length:
+			from fontTools import ttLib
+			raise ttLib.TTLibError("not enough '%s' table data" % tag)
+		self._checkChecksum(tag, entry, data)
+		return data
+
+	def _checkChecksum(self, tag, entry, data):
 		if self.checkChecksums:
 			if tag == 'head':
 				# Beh: we have to special-case the 'head' table.
-				checksum = calcChecksum(data[:8] + b'\0\0\0\0' + data[12:])
+				checksum = _calcHeadChecksum(data)
 			else:
 				checksum = calcChecksum(data)
 			if self.checkChecksums > 1:
@@ -124,15 +156,44 @@ class SFNTReader(object):
 			elif checksum != entry.checkSum:
 				# Be friendly, and just log a warning.
 				log.warning("bad checksum for '%s' table", tag)
-		return data
+
+	def mapFile(self):
+		"""Memory-map the font file, so that table data is read from
+		the map, and getView() returns views instead of copies. Only
+		plain (uncompressed) sfnt files on disk can be mapped. Returns
+		whether the file is mapped. The file must not be modified while
+		it is mapped.
+		"""
+		if self.mmap is not None:
+			return True
+		if self.flavor is not None:
+			return False
+		try:
+			fileno = self.file.fileno()
+		except (AttributeError, IOError, OSError, ValueError):
+			return False  # e.g. BytesIO, or a Mac resource
+		try:
+			self.mmap = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+		except (EnvironmentError, ValueError):
+			return False
+		return True
 
 	def __delitem__(self, tag):
 		del self.tables[Tag(tag)]
 
 	def close(self):
+		if self.mmap is not None:
+			try:
+				self.mmap.close()
+			except BufferError:
+				pass  # Views are still alive; the map goes away with them.
+			self.mmap = None
 		self.file.close()
 
 
+# amount of data SFNTWriter.writeChunks() collects before summing its checksum
+CHECKSUM_BLOCK_SIZE = 0x10000
+
 # default compression level for WOFF 1.0 tables and metadata
 ZLIB_COMPRESSION_LEVEL = 6
 
@@ -193,12 +254,20 @@ class SFNTWriter(object):
 		return object.__new__(cls)
 
 	def __init__(self, file, numTables, sfntVersion="\000\001\000\000",
-			flavor=None, flavorData=None):
+			flavor=None, flavorData=None, tableCache=None):
+		"""The font is written from the current position of 'file', which
+		is not the start of the file for the fonts of a collection. Those
+		also pass a 'tableCache' dict shared among them: a table whose data
+		has already been written for another font is not written again,
+		and the directory points to the existing copy instead.
+		"""
 		self.file = file
 		self.numTables = numTables
 		self.sfntVersion = Tag(sfntVersion)
 		self.flavor = flavor
 		self.flavorData = flavorData
+		self.tableCache = tableCache
+		self.directoryOffset = self.file.tell()
 
 		if self.flavor == "woff":
 			self.directoryFormat = woffDirectoryFormat
@@ -217,7 +286,7 @@ class SFNTWriter(object):
 
 			self.searchRange, self.entrySelector, self.rangeShift = getSearchRange(numTables, 16)
 
-		self.nextTableOffset = self.directorySize + numTables * self.DirectoryEntry.formatSize
+		self.nextTableOffset = self.directoryOffset + self.directorySize + numTables * self.DirectoryEntry.formatSize
 		# clear out directory area
 		self.file.seek(self.nextTableOffset)
 		# make sure we're actually where we want to be. (old cStringIO bug)
@@ -230,15 +299,20 @@ class SFNTWriter(object):
 			from fontTools import ttLib
 			raise ttLib.TTLibError("cannot rewrite '%s' table" % tag)
 
+		if tag == 'head':
+			checkSum = _calcHeadChecksum(data)
+		else:
+			checkSum = calcChecksum(data)
+			if self._reuseTable(tag, data, checkSum):
+				return
+
 		entry = self.DirectoryEntry()
 		entry.tag = tag
 		entry.offset = self.nextTableOffset
+		entry.checkSum = checkSum
 		if tag == 'head':
-			entry.checkSum = calcChecksum(data[:8] + b'\0\0\0\0' + data[12:])
 			self.headTable = data
 			entry.uncompressed = True
-		else:
-			entry.checkSum = calcChecksum(data)
 		entry.saveData(self.file, data)
 
 		if self.flavor == "woff":
@@ -254,6 +328,72 @@ class SFNTWriter(object):
 		assert self.nextTableOffset == self.file.tell()
 
 		self.tables[tag] = entry
+		self._cacheTable(tag, data, entry)
+
+	def writeChunks(self, tag, chunks):
+		"""Write raw table data given as a sequence of byte strings, one
+		after another without joining them. The checksum is summed over
+		blocks of the data as it goes out.
+		"""
+		if self.flavor or tag == 'head' or self.tableCache is not None:
+			self[tag] = bytesjoin(chunks)
+			return
+		if tag in self.tables:
+			from fontTools import ttLib
+			raise ttLib.TTLibError("cannot rewrite '%s' table" % tag)
+
+		entry = self.DirectoryEntry()
+		entry.tag = tag
+		entry.offset = self.nextTableOffset
+		entry.length = 0
+		checkSum = 0
+		pending = []
+		pendingSize = 0
+		self.file.seek(entry.offset)
+		for chunk in chunks:
+			chunk = tobytes(chunk)  # Empty glyphs compile to ""
+			self.file.write(chunk)
+			entry.length += len(chunk)
+			pending.append(chunk)
+			pendingSize += len(chunk)
+			if pendingSize >= CHECKSUM_BLOCK_SIZE:
+				# Sum whole longs only; the remainder goes with the next block.
+				block = bytesjoin(pending)
+				end = pendingSize & ~3
+				checkSum = calcChecksum(_sliceView(block, 0, end), checkSum)
+				pending = [block[end:]]
+				pendingSize -= end
+		entry.checkSum = calcChecksum(bytesjoin(pending), checkSum)
+
+		self.nextTableOffset = self.nextTableOffset + ((entry.length + 3) & ~3)
+		self.file.write(b'\0' * (self.nextTableOffset - self.file.tell()))
+		assert self.nextTableOffset == self.file.tell()
+
+		self.tables[tag] = entry
+
+	def _reuseTable(self, tag, data, checkSum):
+		"""Point the directory entry of 'tag' to a copy of the same data
+		written before, if any. Returns whether one was found. The 'head'
+		table is never shared, since the checksum adjustment of each font
+		is written into it.
+		"""
+		if self.tableCache is None or self.flavor:
+			return False
+		for cachedData, cachedEntry in self.tableCache.get((Tag(tag), checkSum, len(data)), []):
+			if cachedData is data or _sameData(cachedData, data):
+				entry = self.DirectoryEntry()
+				entry.tag = tag
+				entry.offset = cachedEntry.offset
+				entry.length = cachedEntry.length
+				entry.checkSum = cachedEntry.checkSum
+				self.tables[tag] = entry
+				return True
+		return False
+
+	def _cacheTable(self, tag, data, entry):
+		if self.tableCache is None or self.flavor or tag == 'head':
+			return
+		self.tableCache.setdefault((Tag(tag), entry.checkSum, len(data)), []).append((data, entry))
 
 	def close(self):
 		"""All tables must have been written to disk. Now write the
@@ -319,7 +459,7 @@ class SFNTWriter(object):
 			directory = directory + entry.toString()
 		if seenHead:
 			self.writeMasterChecksum(directory)
-		self.file.seek(0)
+		self.file.seek(self.directoryOffset)
 		self.file.write(directory)
 
 	def _calcMasterChecksum(self, directory):
@@ -376,6 +516,44 @@ ttcHeaderFormat = """
 
 ttcHeaderSize = sstruct.calcsize(ttcHeaderFormat)
 
+
+def readTTCHeader(file):
+	"""Read the header of a font collection from the start of 'file'.
+	The offsets of its fonts are returned in 'offsetTable'.
+	"""
+	file.seek(0)
+	data = file.read(ttcHeaderSize)
+	if len(data) != ttcHeaderSize:
+		from fontTools import ttLib
+		raise ttLib.TTLibError("Not a Font Collection (not enough data)")
+	header = SimpleNamespace()
+	sstruct.unpack(ttcHeaderFormat, data, header)
+	if Tag(header.TTCTag) != "ttcf":
+		from fontTools import ttLib
+		raise ttLib.TTLibError("Not a Font Collection")
+	assert header.Version == 0x00010000 or header.Version == 0x00020000, "unrecognized TTC version 0x%08x" % header.Version
+	data = file.read(header.numFonts * 4)
+	if len(data) != header.numFonts * 4:
+		from fontTools import ttLib
+		raise ttLib.TTLibError("Not a Font Collection (not enough data)")
+	header.offsetTable = struct.unpack(">%dL" % header.numFonts, data)
+	if header.Version == 0x00020000:
+		pass # ignoring version 2.0 signatures
+	return header
+
+
+def writeTTCHeader(file, numFonts):
+	"""Write a version 1.0 collection header at the start of 'file', with
+	the offsets of its fonts zeroed. Returns the position of the offsets,
+	to be filled in once the fonts have been written.
+	"""
+	header = SimpleNamespace(TTCTag=b"ttcf", Version=0x00010000, numFonts=numFonts)
+	file.seek(0)
+	file.write(sstruct.pack(ttcHeaderFormat, header))
+	offset = file.tell()
+	file.write(struct.pack(">%dL" % numFonts, *([0] * numFonts)))
+	return offset
+
 sfntDirectoryFormat = """
 		> # big endian
 		sfntVersion:    4s
@@ -540,32 +718,93 @@ class WOFFFlavorData():
 				self.privData = data
 
 
-def calcChecksum(data):
+def calcChecksum(data, start=0):
 	"""Calculate the checksum for an arbitrary block of data.
 	Optionally takes a 'start' argument, which allows you to
 	calculate a checksum in chunks by feeding it a previous
-	result.
+	result. Every chunk but the last one must then have a length
+	which is a multiple of four.
 
 	If the data length is not a multiple of four, it assumes
 	it is to be padded with null byte.
 
+	The data may be any bytes-like object, which is summed in
+	place with numpy. Only a memoryview is copied on Python 2,
+	where it can't be read as a buffer: pass a buffer instead.
+
 		>>> print(calcChecksum(b"abcd"))
 		1633837924
 		>>> print(calcChecksum(b"abcdxyz"))
 		3655064932
+		>>> print(calcChecksum(b"xyz", calcChecksum(b"abcd")))
+		3655064932
 	"""
+	if sys.version_info[0] < 3:
+		if isinstance(data, memoryview):
+			data = data.tobytes()  # Neither array nor numpy can read a Python 2 memoryview
+	else:
+		data = memoryview(data)
 	remainder = len(data) % 4
+	end = len(data) - remainder
+	value = start
+	if end:
+		value += _sumLongs(data, end // 4)
 	if remainder:
-		data += b"\0" * (4 - remainder)
-	value = 0
-	blockSize = 4096
-	assert blockSize % 4 == 0
-	for i in range(0, len(data), blockSize):
-		block = data[i:i+blockSize]
-		longs = struct.unpack(">%dL" % (len(block) // 4), block)
-		value = (value + sum(longs)) & 0xffffffff
-	return value
+		value += struct.unpack(">L", bytes(data[end:]) + b"\0" * (4 - remainder))[0]
+	return value & 0xffffffff
+
+
+def _calcHeadChecksum(data):
+	"""Calculate the checksum of a `head` table as if its
+	checkSumAdjustment were zero.
+	"""
+	return calcChecksum(_sliceView(data, 12, len(data)), calcChecksum(_sliceView(data, 0, 8)))
+
 
+def _sliceView(data, start, end):
+	"""Slice 'data' without copying it: into a buffer on Python 2,
+	which array and numpy can read, or else into a memoryview.
+	"""
+	if sys.version_info[0] < 3:
+		return buffer(data, start, end - start)
+	return memoryview(data)[start:end]
+
+
+# Array typecode of 32-bit integers. Python 2 returns unsigned items as longs,
+# which are much slower to sum than ints; signed items sum up to the same
+# value modulo 2**32.
+if sys.version_info[0] < 3:
+	_longTypeCode = "i" if array.array("i").itemsize == 4 else "l"
+else:
+	_longTypeCode = "I" if array.array("I").itemsize == 4 else "L"
+
+
+def _sumLongs(data, count):
+	"""Return a value congruent, modulo 2**32, to the sum of the first
+	'count' big-endian 32-bit integers in 'data'. NumPy reads them in
+	place; otherwise they are copied into an array once.
+	"""
+	if numpy is not None:
+		return int(numpy.frombuffer(data, dtype=">u4", count=count).sum(dtype=numpy.uint64))
+	longs = array.array(_longTypeCode)
+	if hasattr(longs, "frombytes"):
+		longs.frombytes(data[:count * 4])
+	else:
+		longs.fromstring(buffer(data, 0, count * 4))
+	if sys.byteorder == "little":
+		longs.byteswap()
+	return sum(longs)
+
+
+def _sameData(data1, data2):
+	"""Compare two blocks of table data, either of which may be a view."""
+	if sys.version_info[0] < 3:
+		# A Python 2 buffer never equals a string, so compare string copies
+		if isinstance(data1, buffer):
+			data1 = data1[:]
+		if isinstance(data2, buffer):
+			data2 = data2[:]
+	return data1 == data2
 
 if __name__ == "__main__":
 	import sys
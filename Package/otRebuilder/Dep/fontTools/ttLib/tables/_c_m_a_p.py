@@ -8,9 +8,16 @@ from . import DefaultTable
 import sys
 import struct
 import array
+import bisect
+import itertools
 import operator
 import logging
 
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
 
 log = logging.getLogger(__name__)
 
@@ -29,6 +36,98 @@ def _make_map(font, chars, gids):
 		cmap[char] = name
 	return cmap
 
+
+def _getGlyphIDs(ttFont, names):
+	nameMap = ttFont.getReverseGlyphMap()
+	try:
+		return list(map(nameMap.__getitem__, names))
+	except KeyError:
+		nameMap = ttFont.getReverseGlyphMap(rebuild=True)
+		try:
+			return list(map(nameMap.__getitem__, names))
+		except KeyError:
+			# allow virtual GIDs
+			gids = []
+			for name in names:
+				try:
+					gid = nameMap[name]
+				except KeyError:
+					try:
+						if (name[:3] == 'gid'):
+							gid = eval(name[3:])
+						else:
+							gid = ttFont.getGlyphID(name)
+					except:
+						raise KeyError(name)
+
+				gids.append(gid)
+			return gids
+
+
+class SortedMapping(object):
+	"""The character codes of a code:glyphName mapping in ascending order,
+	along with their glyph names and glyph IDs."""
+
+	def __init__(self, charCodes, names, gids):
+		self.charCodes = charCodes
+		self.names = names
+		self.gids = gids
+		self._bmp = None
+
+	@classmethod
+	def fromCmap(cls, cmap, ttFont):
+		charCodes = sorted(cmap.keys())
+		names = list(map(cmap.__getitem__, charCodes))
+		return cls(charCodes, names, _getGlyphIDs(ttFont, names))
+
+	def getBMP(self):
+		"""Returns the part of the mapping which a BMP subtable can hold,
+		i.e. without surrogates and supplementary planes."""
+		if self._bmp is None:
+			charCodes = self.charCodes
+			surrogateStart = bisect.bisect_left(charCodes, 0xD800)
+			surrogateEnd = bisect.bisect_right(charCodes, 0xDFFF)
+			end = bisect.bisect_left(charCodes, 0x10000)
+			if surrogateStart == surrogateEnd and end == len(charCodes):
+				self._bmp = self
+			else:
+				def cut(values):
+					return values[:surrogateStart] + values[surrogateEnd:end]
+				self._bmp = SortedMapping(cut(charCodes), cut(self.names), cut(self.gids))
+		return self._bmp
+
+	def matches(self, cmap):
+		return len(cmap) == len(self.charCodes) and list(map(cmap.get, self.charCodes)) == self.names
+
+
+class SortedMappingCache(object):
+	"""Sorted mappings of the subtables of one cmap table, so that subtables
+	sharing a mapping, or the BMP part of a full repertoire mapping, don't
+	sort and look it up again."""
+
+	def __init__(self, ttFont):
+		self.ttFont = ttFont
+		self.mappings = {}  # id(cmap): (cmap, SortedMapping)
+		self.fullMappings = []
+
+	def get(self, cmap):
+		try:
+			return self.mappings[id(cmap)][1]
+		except KeyError:
+			pass
+		for fullMapping in self.fullMappings:
+			mapping = fullMapping.getBMP()
+			if mapping.matches(cmap):
+				break
+		else:
+			mapping = SortedMapping.fromCmap(cmap, self.ttFont)
+		self.mappings[id(cmap)] = (cmap, mapping)  # Keep the cmap alive, so that its id stays unique
+		return mapping
+
+	def addFull(self, cmap):
+		self.fullMappings.append(self.get(cmap))
+
+
 class table__c_m_a_p(DefaultTable.DefaultTable):
 
 	def getcmap(self, platformID, platEncID):
@@ -111,11 +210,18 @@ class table__c_m_a_p(DefaultTable.DefaultTable):
 		tableData = b""
 		seen = {}  # Some tables are the same object reference. Don't compile them twice.
 		done = {}  # Some tables are different objects, but compile to the same data chunk
+		mappings = SortedMappingCache(ttFont)  # Sorted and looked up once for all subtables
+		for table in self.tables:
+			if isinstance(table, cmap_format_12_or_13):
+				mappings.addFull(table.cmap)
 		for table in self.tables:
 			try:
 				offset = seen[id(table.cmap)]
 			except KeyError:
-				chunk = table.compile(ttFont)
+				if isinstance(table, (cmap_format_4, cmap_format_6, cmap_format_12_or_13)):
+					chunk = table.compile(ttFont, mappings)
+				else:
+					chunk = table.compile(ttFont)
 				if chunk in done:
 					offset = done[chunk]
 				else:
@@ -682,6 +788,117 @@ def splitRange(startCode, endCode, cmap):
 	return start, end
 
 
+def buildSegments(charCodes, gids):
+	"""Splits sorted character codes and their glyph IDs into format 4 segments.
+
+	The segments are the same as those of splitRange() for each range of
+	consecutive character codes, but runs are found with operations on whole
+	lists instead of a loop over every code. Returns the startCode, endCode,
+	idDelta, idRangeOffset and glyphIndexArray lists, including the closing
+	0xFFFF segment.
+	"""
+	numCodes = len(charCodes)
+	if numCodes == 0:
+		return [0xffff], [0xffff], [1], [0], []
+	if numpy is not None:
+		return _buildSegmentsNumpy(charCodes, gids)
+	indices = list(range(1, numCodes))
+
+	# Codes in one range of consecutive codes have the same code - index, and
+	# codes in one run of consecutive glyph IDs have the same code - glyph ID.
+	rangeKeys = list(map(operator.sub, charCodes, range(numCodes)))
+	runKeys = list(map(operator.sub, charCodes, gids))
+	rangeStarts = [0]
+	rangeStarts.extend(itertools.compress(indices, map(operator.ne, rangeKeys[1:], rangeKeys[:-1])))
+	deltaStarts = list(itertools.compress(indices, map(operator.ne, runKeys[1:], runKeys[:-1])))
+	runStarts = sorted(set(rangeStarts).union(deltaStarts))
+	runEnds = runStarts[1:] + [numCodes]  # Exclusive, like all the ends below
+	rangeEnds = rangeStarts[1:] + [numCodes]
+
+	# A new segment costs 8 bytes, not using one costs 2 bytes per character,
+	# so only runs of more than 4 codes can get their own segment.
+	segmentStarts = set(rangeStarts)
+	runLengths = map(operator.sub, runEnds, runStarts)
+	for start, end in itertools.compress(zip(runStarts, runEnds), [length > 4 for length in runLengths]):
+		r = bisect.bisect_right(rangeStarts, start) - 1
+		rangeStart, rangeEnd = rangeStarts[r], rangeEnds[r]
+		if start == rangeStart and end == rangeEnd:
+			continue  # the whole range, we're fine
+		if start == rangeStart or end == rangeEnd:
+			threshold = 4  # split costs one more segment
+		else:
+			threshold = 8  # split costs two more segments
+		if end - start > threshold:
+			segmentStarts.add(start)
+			segmentStarts.add(end)
+	segmentStarts.discard(numCodes)
+	segmentStarts = sorted(segmentStarts)
+	segmentEnds = segmentStarts[1:] + [numCodes]
+
+	startCode = list(map(charCodes.__getitem__, segmentStarts))
+	endCode = [charCodes[end - 1] for end in segmentEnds]
+	segCount = len(startCode) + 1
+	idDelta = []
+	idRangeOffset = []
+	glyphIndexArray = []
+	for i, (start, end) in enumerate(zip(segmentStarts, segmentEnds)):
+		if bisect.bisect_right(deltaStarts, start) == bisect.bisect_left(deltaStarts, end):
+			# Consecutive glyph IDs
+			idDelta.append((gids[start] - charCodes[start]) % 0x10000)
+			idRangeOffset.append(0)
+		else:
+			idDelta.append(0)
+			idRangeOffset.append(2 * (segCount + len(glyphIndexArray) - i))
+			glyphIndexArray.extend(gids[start:end])
+	startCode.append(0xffff)
+	endCode.append(0xffff)
+	idDelta.append(1)  # 0xffff + 1 == (tadaa!) 0. So this end code maps to .notdef
+	idRangeOffset.append(0)
+	return startCode, endCode, idDelta, idRangeOffset, glyphIndexArray
+
+
+def _buildSegmentsNumpy(charCodes, gids):
+	codes = numpy.array(charCodes, dtype=numpy.int64)
+	gids = numpy.array(gids, dtype=numpy.int64)
+	numCodes = len(codes)
+	deltas = codes - gids
+	rangeBreaks = codes[1:] != codes[:-1] + 1
+	deltaBreaks = deltas[1:] != deltas[:-1]
+	rangeStarts = numpy.concatenate(([0], numpy.flatnonzero(rangeBreaks) + 1))
+	rangeEnds = numpy.append(rangeStarts[1:], numCodes)
+	runStarts = numpy.concatenate(([0], numpy.flatnonzero(rangeBreaks | deltaBreaks) + 1))
+	runEnds = numpy.append(runStarts[1:], numCodes)
+
+	# Same filter as splitRange()
+	r = numpy.searchsorted(rangeStarts, runStarts, side="right") - 1
+	atStart = runStarts == rangeStarts[r]
+	atEnd = runEnds == rangeEnds[r]
+	threshold = numpy.where(atStart | atEnd, 4, 8)
+	kept = ~(atStart & atEnd) & (runEnds - runStarts > threshold)
+	segmentStarts = numpy.union1d(rangeStarts, numpy.concatenate((runStarts[kept], runEnds[kept])))
+	segmentStarts = segmentStarts[segmentStarts < numCodes]
+	segmentEnds = numpy.append(segmentStarts[1:], numCodes)
+
+	# A segment has consecutive glyph IDs if no delta breaks between its codes.
+	breakCounts = numpy.concatenate(([0], numpy.cumsum(deltaBreaks)))
+	consecutive = breakCounts[segmentEnds - 1] == breakCounts[segmentStarts]
+	lengths = segmentEnds - segmentStarts
+	segCount = len(segmentStarts) + 1
+	arrayLengths = numpy.where(consecutive, 0, lengths)
+	arrayOffsets = numpy.cumsum(arrayLengths) - arrayLengths
+	idDelta = numpy.where(consecutive, (gids[segmentStarts] - codes[segmentStarts]) % 0x10000, 0)
+	idRangeOffset = numpy.where(
+		consecutive, 0, 2 * (segCount + arrayOffsets - numpy.arange(segCount - 1)))
+	glyphIndexArray = gids[numpy.repeat(~consecutive, lengths)]
+
+	return (
+		codes[segmentStarts].tolist() + [0xffff],
+		codes[segmentEnds - 1].tolist() + [0xffff],
+		idDelta.tolist() + [1],
+		idRangeOffset.tolist() + [0],
+		glyphIndexArray.tolist())
+
+
 class cmap_format_4(CmapSubtable):
 
 	def decompile(self, data, ttFont):
@@ -742,84 +959,15 @@ class cmap_format_4(CmapSubtable):
 
 		self.cmap = _make_map(self.ttFont, charCodes, gids)
 
-	def compile(self, ttFont):
+	def compile(self, ttFont, mappings=None):
 		if self.data:
 			return struct.pack(">HHH", self.format, self.length, self.language) + self.data
 
-		charCodes = list(self.cmap.keys())
-		lenCharCodes = len(charCodes)
-		if lenCharCodes == 0:
-			startCode = [0xffff]
-			endCode = [0xffff]
-		else:
-			charCodes.sort()
-			names = list(map(operator.getitem, [self.cmap]*lenCharCodes, charCodes))
-			nameMap = ttFont.getReverseGlyphMap()
-			try:
-				gids = list(map(operator.getitem, [nameMap]*lenCharCodes, names))
-			except KeyError:
-				nameMap = ttFont.getReverseGlyphMap(rebuild=True)
-				try:
-					gids = list(map(operator.getitem, [nameMap]*lenCharCodes, names))
-				except KeyError:
-					# allow virtual GIDs in format 4 tables
-					gids = []
-					for name in names:
-						try:
-							gid = nameMap[name]
-						except KeyError:
-							try:
-								if (name[:3] == 'gid'):
-									gid = eval(name[3:])
-								else:
-									gid = ttFont.getGlyphID(name)
-							except:
-								raise KeyError(name)
-
-						gids.append(gid)
-			cmap = {}  # code:glyphID mapping
-			list(map(operator.setitem, [cmap]*len(charCodes), charCodes, gids))
-
-			# Build startCode and endCode lists.
-			# Split the char codes in ranges of consecutive char codes, then split
-			# each range in more ranges of consecutive/not consecutive glyph IDs.
-			# See splitRange().
-			lastCode = charCodes[0]
-			endCode = []
-			startCode = [lastCode]
-			for charCode in charCodes[1:]:  # skip the first code, it's the first start code
-				if charCode == lastCode + 1:
-					lastCode = charCode
-					continue
-				start, end = splitRange(startCode[-1], lastCode, cmap)
-				startCode.extend(start)
-				endCode.extend(end)
-				startCode.append(charCode)
-				lastCode = charCode
-			start, end = splitRange(startCode[-1], lastCode, cmap)
-			startCode.extend(start)
-			endCode.extend(end)
-			startCode.append(0xffff)
-			endCode.append(0xffff)
-
-		# build up rest of cruft
-		idDelta = []
-		idRangeOffset = []
-		glyphIndexArray = []
-		for i in range(len(endCode)-1):  # skip the closing codes (0xffff)
-			indices = []
-			for charCode in range(startCode[i], endCode[i] + 1):
-				indices.append(cmap[charCode])
-			if  (indices == list(range(indices[0], indices[0] + len(indices)))):
-				idDelta.append((indices[0] - startCode[i]) % 0x10000)
-				idRangeOffset.append(0)
-			else:
-				# someone *definitely* needs to get killed.
-				idDelta.append(0)
-				idRangeOffset.append(2 * (len(endCode) + len(glyphIndexArray) - i))
-				glyphIndexArray.extend(indices)
-		idDelta.append(1)  # 0xffff + 1 == (tadaa!) 0. So this end code maps to .notdef
-		idRangeOffset.append(0)
+		if mappings is None:
+			mappings = SortedMappingCache(ttFont)
+		mapping = mappings.get(self.cmap)
+		startCode, endCode, idDelta, idRangeOffset, glyphIndexArray = \
+				buildSegments(mapping.charCodes, mapping.gids)
 
 		# Insane.
 		segCount = len(endCode)
@@ -879,16 +1027,19 @@ class cmap_format_6(CmapSubtable):
 		charCodes = list(range(firstCode, firstCode + len(gids)))
 		self.cmap = _make_map(self.ttFont, charCodes, gids)
 
-	def compile(self, ttFont):
+	def compile(self, ttFont, mappings=None):
 		if self.data:
 			return struct.pack(">HHH", self.format, self.length, self.language) + self.data
-		cmap = self.cmap
-		codes = sorted(cmap.keys())
+		if mappings is None:
+			mappings = SortedMappingCache(ttFont)
+		mapping = mappings.get(self.cmap)
+		codes = mapping.charCodes
 		if codes: # yes, there are empty cmap tables.
 			codes = list(range(codes[0], codes[-1] + 1))
 			firstCode = codes[0]
-			valueList = [cmap.get(code, ".notdef") for code in codes]
-			valueList = map(ttFont.getGlyphID, valueList)
+			valueList = [ttFont.getGlyphID(".notdef")] * len(codes)
+			for code, gid in zip(mapping.charCodes, mapping.gids):
+				valueList[code - firstCode] = gid
 			gids = array.array("H", valueList)
 			if sys.byteorder != "big":
 				gids.byteswap()
@@ -955,52 +1106,25 @@ class cmap_format_12_or_13(CmapSubtable):
 		self.data = data = None
 		self.cmap = _make_map(self.ttFont, charCodes, gids)
 
-	def compile(self, ttFont):
+	def compile(self, ttFont, mappings=None):
 		if self.data:
 			return struct.pack(">HHLLL", self.format, self.reserved, self.length, self.language, self.nGroups) + self.data
-		charCodes = list(self.cmap.keys())
-		lenCharCodes = len(charCodes)
-		names = list(self.cmap.values())
-		nameMap = ttFont.getReverseGlyphMap()
-		try:
-			gids = list(map(operator.getitem, [nameMap]*lenCharCodes, names))
-		except KeyError:
-			nameMap = ttFont.getReverseGlyphMap(rebuild=True)
-			try:
-				gids = list(map(operator.getitem, [nameMap]*lenCharCodes, names))
-			except KeyError:
-				# allow virtual GIDs in format 12 tables
-				gids = []
-				for name in names:
-					try:
-						gid = nameMap[name]
-					except KeyError:
-						try:
-							if (name[:3] == 'gid'):
-								gid = eval(name[3:])
-							else:
-								gid = ttFont.getGlyphID(name)
-						except:
-							raise KeyError(name)
-
-					gids.append(gid)
-
-		cmap = {}  # code:glyphID mapping
-		list(map(operator.setitem, [cmap]*len(charCodes), charCodes, gids))
-
-		charCodes.sort()
-		index = 0
+		if mappings is None:
+			mappings = SortedMappingCache(ttFont)
+		mapping = mappings.get(self.cmap)
+		charCodes = mapping.charCodes
+		gids = mapping.gids
+
+		# Same as _IsInSameRun(), without a call for every code.
+		step = self._format_step
 		startCharCode = charCodes[0]
-		startGlyphID = cmap[startCharCode]
-		lastGlyphID = startGlyphID - self._format_step
+		startGlyphID = gids[0]
+		lastGlyphID = startGlyphID - step
 		lastCharCode = startCharCode - 1
 		nGroups = 0
 		dataList =  []
-		maxIndex = len(charCodes)
-		for index in range(maxIndex):
-			charCode = charCodes[index]
-			glyphID = cmap[charCode]
-			if not self._IsInSameRun(glyphID, lastGlyphID, charCode, lastCharCode):
+		for charCode, glyphID in zip(charCodes, gids):
+			if glyphID != lastGlyphID + step or charCode != lastCharCode + 1:
 				dataList.append(struct.pack(">LLL", startCharCode, lastCharCode, startGlyphID))
 				startCharCode = charCode
 				startGlyphID = glyphID
@@ -6,7 +6,7 @@ from fontTools.misc.py23 import *
 from fontTools.misc import sstruct
 from fontTools import ttLib
 from fontTools.misc.textTools import safeEval, pad
-from fontTools.misc.arrayTools import calcBounds, calcIntBounds, pointInRect
+from fontTools.misc.arrayTools import calcBounds, calcIntBounds, pointInRect, unionRect
 from fontTools.misc.bezierTools import calcQuadraticBounds
 from fontTools.misc.fixedTools import fixedToFloat as fi2fl, floatToFixed as fl2fi
 from numbers import Number
@@ -16,6 +16,14 @@ import sys
 import struct
 import array
 import logging
+try:
+	from itertools import accumulate
+except ImportError:  # Python 2
+	def accumulate(iterable):
+		total = 0
+		for value in iterable:
+			total += value
+			yield total
 
 
 log = logging.getLogger(__name__)
@@ -41,6 +49,10 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 	# no padding, except for when padding would allow to use short loca offsets.
 	padding = 1
 
+	# decompile() copies each glyph out of 'data', so it may be given a read-only
+	# view of a memory-mapped font file (see SFNTReader.getView()).
+	decompilesViews = True
+
 	def decompile(self, data, ttFont):
 		loca = ttFont['loca']
 		last = int(loca[0])
@@ -54,7 +66,7 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 				noname = noname + 1
 				glyphName = 'ttxautoglyph%s' % i
 			next = int(loca[i+1])
-			glyphdata = data[last:next]
+			glyphdata = bytes(data[last:next])
 			if len(glyphdata) != (next - last):
 				raise ttLib.TTLibError("not enough 'glyf' table data")
 			glyph = Glyph(glyphdata)
@@ -71,6 +83,12 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 				glyph.expand(self)
 
 	def compile(self, ttFont):
+		return bytesjoin(self.compileChunks(ttFont))
+
+	def compileChunks(self, ttFont):
+		"""Same as compile(), but returns the table data as a list of byte
+		strings, one or two per glyph, so that the whole table need not be
+		joined in memory before it is written."""
 		if not hasattr(self, "glyphOrder"):
 			self.glyphOrder = ttFont.getGlyphOrder()
 		padding = self.padding
@@ -79,9 +97,10 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 		currentLocation = 0
 		dataList = []
 		recalcBBoxes = ttFont.recalcBBoxes
+		boundsCache = {}  # Bounds of components, shared among composite glyphs
 		for glyphName in self.glyphOrder:
 			glyph = self.glyphs[glyphName]
-			glyphData = glyph.compile(self, recalcBBoxes)
+			glyphData = glyph.compile(self, recalcBBoxes, boundsCache)
 			if padding > 1:
 				glyphData = pad(glyphData, size=padding)
 			locations.append(currentLocation)
@@ -89,26 +108,29 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 			dataList.append(glyphData)
 		locations.append(currentLocation)
 
+		chunks = dataList
 		if padding == 1 and currentLocation < 0x20000:
 			# See if we can pad any odd-lengthed glyphs to allow loca
 			# table to use the short offsets.
 			indices = [i for i,glyphData in enumerate(dataList) if len(glyphData) % 2 == 1]
 			if indices and currentLocation + len(indices) < 0x20000:
-				# It fits.  Do it.
-				for i in indices:
-					dataList[i] += b'\0'
+				# It fits.  Do it, with a separate NUL chunk rather than a copy of the glyph.
+				chunks = []
 				currentLocation = 0
 				for i,glyphData in enumerate(dataList):
 					locations[i] = currentLocation
+					chunks.append(glyphData)
 					currentLocation += len(glyphData)
+					if len(glyphData) % 2 == 1:
+						chunks.append(b'\0')
+						currentLocation += 1
 				locations[len(dataList)] = currentLocation
 
-		data = bytesjoin(dataList)
 		if 'loca' in ttFont:
 			ttFont['loca'].set(locations)
 		if 'maxp' in ttFont:
 			ttFont['maxp'].numGlyphs = len(self.glyphs)
-		return data
+		return chunks
 
 	def toXML(self, writer, ttFont, progress=None):
 		writer.newline()
@@ -204,6 +226,21 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 		assert len(self.glyphOrder) == len(self.glyphs)
 		return len(self.glyphs)
 
+	def getGlyphBounds(self, glyphName, boundsCache):
+		"""Return the bounds of a glyph's coordinate data without expanding
+		it, None if it has no points, or False if the glyph has to be expanded
+		to tell. Results are memoized in the boundsCache dict."""
+		if glyphName in boundsCache:
+			return boundsCache[glyphName]
+		glyph = self.glyphs[glyphName]
+		if hasattr(glyph, "data"):
+			bounds = glyph.calcCompactBounds(self, boundsCache)
+		else:
+			coords, endPts, flags = glyph.getCoordinates(self)
+			bounds = calcIntBounds(coords) if len(coords) else None
+		boundsCache[glyphName] = bounds
+		return bounds
+
 
 glyphHeaderFormat = """
 		>	# big endian
@@ -234,6 +271,38 @@ _flagSignBytes = {
 	flagYShort: -1,
 }
 
+def _buildFlagCodes(shortFlag, sameFlag):
+	"""For each flag byte, returns the struct format of the coordinate it
+	describes and the sign to apply, 0 meaning that the delta is zero."""
+	formats = []
+	signs = []
+	for flag in range(256):
+		if flag & shortFlag:
+			formats.append("B")
+			signs.append(1 if flag & sameFlag else -1)
+		elif flag & sameFlag:
+			formats.append("")
+			signs.append(0)
+		else:
+			formats.append("h")
+			signs.append(1)
+	return formats, signs
+
+_xFlagFormats, _xFlagSigns = _buildFlagCodes(flagXShort, flagXsame)
+_yFlagFormats, _yFlagSigns = _buildFlagCodes(flagYShort, flagYsame)
+
+def _calcDeltaBounds(flags, values, signs):
+	"""Returns min and max of the absolute coordinates, given the flags and
+	the unpacked coordinate data. Zero deltas cannot yield a new extreme,
+	except for leading ones, which stay at the origin."""
+	deltaSigns = [signs[flag] for flag in flags if signs[flag]]
+	coords = list(accumulate([sign * value for sign, value in zip(deltaSigns, values)]))
+	if not signs[flags[0]]:
+		coords.append(0)
+	if not coords:
+		return 0, 0
+	return min(coords), max(coords)
+
 def flagBest(x, y, onCurve):
 	"""For a given x,y delta pair, returns the flag that packs this pair
 	most efficiently, as well as the number of byte cost of such flag."""
@@ -340,13 +409,14 @@ class Glyph(object):
 		else:
 			self.decompileCoordinates(data)
 
-	def compile(self, glyfTable, recalcBBoxes=True):
+	def compile(self, glyfTable, recalcBBoxes=True, boundsCache=None):
 		if hasattr(self, "data"):
-			if recalcBBoxes:
-				# must unpack glyph in order to recalculate bounding box
-				self.expand(glyfTable)
-			else:
+			if not recalcBBoxes:
 				return self.data
+			if glyfTable is not None and self.patchBounds(glyfTable, boundsCache):
+				return self.data
+			# must unpack glyph in order to recalculate bounding box
+			self.expand(glyfTable)
 		if self.numberOfContours == 0:
 			return ""
 		if recalcBBoxes:
@@ -433,11 +503,12 @@ class Glyph(object):
 		assert self.isComposite()
 		nContours = 0
 		nPoints = 0
-		for compo in self.components:
-			baseGlyph = glyfTable[compo.glyphName]
-			if baseGlyph.numberOfContours == 0:
+		for glyphName in self.getComponentNames(glyfTable):
+			baseGlyph = glyfTable.glyphs[glyphName]
+			numberOfContours = baseGlyph.getHeader()[0]
+			if numberOfContours == 0:
 				continue
-			elif baseGlyph.numberOfContours > 0:
+			elif numberOfContours > 0:
 				nP, nC = baseGlyph.getMaxpValues()
 			else:
 				nP, nC, maxComponentDepth = baseGlyph.getCompositeMaxpValues(
@@ -447,6 +518,13 @@ class Glyph(object):
 		return CompositeMaxpValues(nPoints, nContours, maxComponentDepth)
 
 	def getMaxpValues(self):
+		"""Can be called on compact or expanded glyph."""
+		if hasattr(self, "data"):
+			numberOfContours, = struct.unpack(">h", self.data[:2])
+			assert numberOfContours > 0
+			i = 10 + 2 * numberOfContours
+			lastEndPt, = struct.unpack(">h", self.data[i-2:i])
+			return lastEndPt + 1, numberOfContours
 		assert self.numberOfContours > 0
 		return len(self.coordinates), len(self.endPtsOfContours)
 
@@ -771,6 +849,110 @@ class Glyph(object):
 		else:
 			self.xMin, self.yMin, self.xMax, self.yMax = (0, 0, 0, 0)
 
+	def patchBounds(self, glyfTable, boundsCache=None):
+		"""Recalculate the bounding box of a compact glyph and write it into
+		the glyph header, leaving the rest of the data as it is. Returns False
+		if the glyph has to be expanded instead."""
+		if not self.data:
+			return True
+		if boundsCache is None:
+			boundsCache = {}
+		numberOfContours, = struct.unpack(">h", self.data[:2])
+		if numberOfContours == 0:
+			return False
+		bounds = self.calcCompactBounds(glyfTable, boundsCache)
+		if bounds is False:
+			return False
+		if bounds is None:
+			bounds = (0, 0, 0, 0)
+		self.data = self.data[:2] + struct.pack(">hhhh", *bounds) + self.data[10:]
+		return True
+
+	def calcCompactBounds(self, glyfTable, boundsCache):
+		"""Return the bounds of a compact glyph's coordinate data, None if it
+		has no points, or False if it has to be expanded to tell: composites
+		with scaled or point-matched components, and malformed glyphs. These
+		are the same bounds as recalcBounds() would give."""
+		data = self.data
+		if not data:
+			return None
+		numberOfContours, = struct.unpack(">h", data[:2])
+		if numberOfContours < 0:
+			return self._calcCompositeBounds(glyfTable, boundsCache)
+		if numberOfContours == 0:
+			return None
+		i = 10 + 2 * numberOfContours
+		nCoordinates, instructionLength = struct.unpack(">hh", data[i-2:i+2])
+		nCoordinates += 1
+		if nCoordinates <= 0:
+			return None
+		i += 2 + instructionLength
+		flags = bytearray(data[i:i+nCoordinates])
+		if len(flags) < nCoordinates:
+			return False
+		if any(flag & flagRepeat for flag in flags):
+			flags = bytearray()
+			while len(flags) < nCoordinates:
+				flag = byteord(data[i])
+				i += 1
+				if flag & flagRepeat:
+					flags.extend([flag] * (byteord(data[i]) + 1))
+					i += 1
+				else:
+					flags.append(flag)
+			if len(flags) != nCoordinates:
+				return False
+		else:
+			i += nCoordinates
+		xFormat = ">" + "".join([_xFlagFormats[flag] for flag in flags])
+		yFormat = ">" + "".join([_yFlagFormats[flag] for flag in flags])
+		xDataLen = struct.calcsize(xFormat)
+		yDataLen = struct.calcsize(yFormat)
+		if len(data) < i + xDataLen + yDataLen:
+			return False
+		xCoordinates = struct.unpack(xFormat, data[i:i+xDataLen])
+		yCoordinates = struct.unpack(yFormat, data[i+xDataLen:i+xDataLen+yDataLen])
+		xMin, xMax = _calcDeltaBounds(flags, xCoordinates, _xFlagSigns)
+		yMin, yMax = _calcDeltaBounds(flags, yCoordinates, _yFlagSigns)
+		return xMin, yMin, xMax, yMax
+
+	def _calcCompositeBounds(self, glyfTable, boundsCache):
+		data = self.data
+		bounds = None
+		i = 10
+		more = 1
+		while more:
+			flags, glyphID = struct.unpack(">HH", data[i:i+4])
+			i += 4
+			if not flags & ARGS_ARE_XY_VALUES or flags & (
+					WE_HAVE_A_SCALE | WE_HAVE_AN_X_AND_Y_SCALE | WE_HAVE_A_TWO_BY_TWO):
+				return False
+			if flags & ARG_1_AND_2_ARE_WORDS:
+				x, y = struct.unpack(">hh", data[i:i+4])
+				i += 4
+			else:
+				x, y = struct.unpack(">bb", data[i:i+2])
+				i += 2
+			baseBounds = glyfTable.getGlyphBounds(glyfTable.getGlyphName(glyphID), boundsCache)
+			if baseBounds is False:
+				return False
+			if baseBounds is not None:
+				baseBounds = (baseBounds[0] + x, baseBounds[1] + y, baseBounds[2] + x, baseBounds[3] + y)
+				bounds = unionRect(bounds, baseBounds) if bounds else baseBounds
+			more = flags & MORE_COMPONENTS
+		return bounds
+
+	def getHeader(self):
+		"""Return numberOfContours, xMin, yMin, xMax and yMax.
+		Can be called on compact or expanded glyph."""
+		if hasattr(self, "data"):
+			if not self.data:
+				return 0, 0, 0, 0, 0
+			return struct.unpack(">hhhhh", self.data[:10])
+		if self.numberOfContours == 0:
+			return 0, 0, 0, 0, 0
+		return self.numberOfContours, self.xMin, self.yMin, self.xMax, self.yMax
+
 	def isComposite(self):
 		"""Can be called on compact or expanded glyph."""
 		if hasattr(self, "data") and self.data:
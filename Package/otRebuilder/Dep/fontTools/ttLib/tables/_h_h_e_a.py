@@ -54,14 +54,15 @@ class table__h_h_e_a(DefaultTable.DefaultTable):
 		if 'glyf' in ttFont:
 			glyfTable = ttFont['glyf']
 			for name in ttFont.getGlyphOrder():
-				g = glyfTable[name]
-				if g.numberOfContours == 0:
-					continue
-				if g.numberOfContours < 0 and not hasattr(g, "xMax"):
+				g = glyfTable.glyphs[name]  # Compact glyphs are not expanded.
+				if not hasattr(g, "data") and g.numberOfContours < 0 and not hasattr(g, "xMax"):
 					# Composite glyph without extents set.
 					# Calculate those.
 					g.recalcBounds(glyfTable)
-				boundsWidthDict[name] = g.xMax - g.xMin
+				numberOfContours, xMin, yMin, xMax, yMax = g.getHeader()
+				if numberOfContours == 0:
+					continue
+				boundsWidthDict[name] = xMax - xMin
 		elif 'CFF ' in ttFont:
 			topDict = ttFont['CFF '].cff.topDictIndex[0]
 			for name in ttFont.getGlyphOrder():
@@ -1,5 +1,6 @@
 from __future__ import print_function, division, absolute_import
 from fontTools.misc.py23 import *
+from fontTools.misc.py23 import PY3, round2, round3
 from fontTools import ttLib
 from fontTools.misc.textTools import safeEval
 from . import DefaultTable
@@ -7,6 +8,15 @@ import sys
 import struct
 import array
 import logging
+try:
+	from collections.abc import MutableMapping
+except ImportError:
+	from UserDict import DictMixin as MutableMapping
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 
 log = logging.getLogger(__name__)
@@ -43,23 +53,23 @@ class table__h_m_t_x(DefaultTable.DefaultTable):
 			sideBearings.byteswap()
 		if data:
 			log.warning("too much '%s' table data" % self.tableTag)
-		self.metrics = {}
-		glyphOrder = ttFont.getGlyphOrder()
-		for i in range(numberOfMetrics):
-			glyphName = glyphOrder[i]
-			advanceWidth, lsb = metrics[i*2:i*2+2]
-			if advanceWidth > 32767:
-				log.warning(
-					"Glyph %r has a huge advance %s (%d); is it intentional or "
-					"an (invalid) negative value?", glyphName, self.advanceName,
-					advanceWidth)
-			self.metrics[glyphName] = (advanceWidth, lsb)
+		glyphOrder = ttFont.getGlyphOrder()[:numGlyphs]
+		advances = array.array("i", metrics[0::2])
+		if numberOfMetrics and max(advances) > 32767:
+			for glyphName, advanceWidth in zip(glyphOrder, advances):
+				if advanceWidth > 32767:
+					log.warning(
+						"Glyph %r has a huge advance %s (%d); is it intentional or "
+						"an (invalid) negative value?", glyphName, self.advanceName,
+						advanceWidth)
 		lastAdvance = metrics[-2]
-		for i in range(numberOfSideBearings):
-			glyphName = glyphOrder[i + numberOfMetrics]
-			self.metrics[glyphName] = (lastAdvance, sideBearings[i])
+		advances.extend([lastAdvance] * numberOfSideBearings)
+		sideBearings = array.array("i", metrics[1::2]) + array.array("i", sideBearings.tolist())
+		self.metrics = GlyphMetrics(glyphOrder, advances, sideBearings)
 
 	def compile(self, ttFont):
+		if isinstance(self.metrics, GlyphMetrics) and self.metrics.glyphOrder == ttFont.getGlyphOrder():
+			return self._compileArrays(ttFont)
 		metrics = []
 		hasNegativeAdvances = False
 		for glyphName in ttFont.getGlyphOrder():
@@ -102,6 +112,37 @@ class table__h_m_t_x(DefaultTable.DefaultTable):
 		data = data + additionalMetrics.tostring()
 		return data
 
+	# Same as compile(), but straight from the arrays of GlyphMetrics
+	def _compileArrays(self, ttFont):
+		advances = self.metrics.advances
+		sideBearings = self.metrics.sideBearings
+		if min(advances) < 0:
+			for glyphName, advanceWidth in zip(self.metrics.glyphOrder, advances):
+				if advanceWidth < 0:
+					log.error("Glyph %r has negative advance %s" % (
+						glyphName, self.advanceName))
+			raise ttLib.TTLibError(
+				"'%s' table can't contain negative advance %ss"
+				% (self.tableTag, self.advanceName))
+		lastAdvance = advances[-1]
+		lastIndex = len(advances)
+		while advances[lastIndex-2] == lastAdvance:
+			lastIndex -= 1
+			if lastIndex <= 1:
+				# all advances are equal
+				lastIndex = 1
+				break
+		setattr(ttFont[self.headerTag], self.numberOfMetricsName, lastIndex)
+
+		allMetrics = [0] * (2 * lastIndex)
+		allMetrics[0::2] = advances[:lastIndex]
+		allMetrics[1::2] = sideBearings[:lastIndex]
+		data = struct.pack(">" + self.longMetricFormat * lastIndex, *allMetrics)
+		additionalMetrics = array.array("h", sideBearings[lastIndex:].tolist())
+		if sys.byteorder != "big":
+			additionalMetrics.byteswap()
+		return data + additionalMetrics.tostring()
+
 	def toXML(self, writer, ttFont):
 		names = sorted(self.metrics.keys())
 		for glyphName in names:
@@ -128,3 +169,126 @@ class table__h_m_t_x(DefaultTable.DefaultTable):
 
 	def __setitem__(self, glyphName, advance_sb_pair):
 		self.metrics[glyphName] = tuple(advance_sb_pair)
+
+
+# The built-in round(), which takes halves away from zero on Python 2;
+# py23 shadows it with round3().
+_builtinRound = round3 if PY3 else round2
+
+
+def _scaleArray(values, factor):
+	"""Returns an array of int(round(value * factor)) for the given array("i"),
+	rounded by the built-in round().
+	"""
+	if numpy is None or not values:
+		return array.array("i", [int(_builtinRound(value * factor)) for value in values])
+	scaled = numpy.frombuffer(values, dtype=numpy.intc) * float(factor)
+	rounded = numpy.round(scaled)  # Halves to even, like round() of Python 3
+	if sys.version_info[0] < 3:
+		# round() of Python 2 takes halves away from zero.
+		truncated = numpy.trunc(scaled)
+		halves = numpy.abs(scaled - truncated) == 0.5
+		rounded[halves] = truncated[halves] + numpy.sign(scaled[halves])
+	return array.array("i", rounded.astype(numpy.intc).tobytes())
+
+
+class GlyphMetrics(MutableMapping):
+
+	"""Maps glyph names to (advance, sideBearing) tuples like a dict, but keeps
+	the values in two parallel integer arrays indexed by glyph ID, so that all
+	metrics can be scaled or summed at once. Values are rounded to integers
+	when they are set.
+	"""
+
+	def __init__(self, glyphOrder, advances, sideBearings):
+		assert len(glyphOrder) == len(advances) == len(sideBearings)
+		self.glyphOrder = list(glyphOrder)
+		self.advances = array.array("i", advances)
+		self.sideBearings = array.array("i", sideBearings)
+		self._indices = None
+
+	@classmethod
+	def fromDict(cls, metrics, glyphOrder=None):
+		"""Glyphs are put in glyphOrder, followed by the ones not listed there."""
+		if glyphOrder is None:
+			glyphNames = list(metrics.keys())
+		else:
+			glyphNames = [glyphName for glyphName in glyphOrder if glyphName in metrics]
+			if len(glyphNames) < len(metrics):
+				listed = set(glyphNames)
+				glyphNames.extend(sorted(glyphName for glyphName in metrics if glyphName not in listed))
+		values = [metrics[glyphName] for glyphName in glyphNames]
+		return cls(
+			glyphNames,
+			[int(round(advance)) for advance, _ in values],
+			[int(round(sideBearing)) for _, sideBearing in values])
+
+	def toDict(self):
+		return dict(zip(self.glyphOrder, zip(self.advances, self.sideBearings)))
+
+	def _getIndices(self):
+		if self._indices is None:
+			self._indices = dict(zip(self.glyphOrder, range(len(self.glyphOrder))))
+		return self._indices
+
+	def __getitem__(self, glyphName):
+		i = self._getIndices()[glyphName]
+		return (self.advances[i], self.sideBearings[i])
+
+	def __setitem__(self, glyphName, advance_sb_pair):
+		advance, sideBearing = advance_sb_pair
+		advance, sideBearing = int(round(advance)), int(round(sideBearing))
+		indices = self._getIndices()
+		i = indices.get(glyphName)
+		if i is None:
+			indices[glyphName] = len(self.glyphOrder)
+			self.glyphOrder.append(glyphName)
+			self.advances.append(advance)
+			self.sideBearings.append(sideBearing)
+		else:
+			self.advances[i] = advance
+			self.sideBearings[i] = sideBearing
+
+	def __delitem__(self, glyphName):
+		i = self._getIndices()[glyphName]
+		del self.glyphOrder[i]
+		del self.advances[i]
+		del self.sideBearings[i]
+		self._indices = None
+
+	def __contains__(self, glyphName):
+		return glyphName in self._getIndices()
+
+	def __iter__(self):
+		return iter(self.glyphOrder)
+
+	def __len__(self):
+		return len(self.glyphOrder)
+
+	def keys(self):
+		return list(self.glyphOrder)
+
+	def values(self):
+		return list(zip(self.advances, self.sideBearings))
+
+	def items(self):
+		return list(zip(self.glyphOrder, zip(self.advances, self.sideBearings)))
+
+	def copy(self):
+		return self.__class__(self.glyphOrder, self.advances, self.sideBearings)
+
+	def scale(self, factor):
+		"""Multiplies all advances and side bearings, rounding them like
+		int(round(value * factor)).
+		"""
+		self.advances = _scaleArray(self.advances, factor)
+		self.sideBearings = _scaleArray(self.sideBearings, factor)
+
+	def sumAdvances(self, skipZero=False):
+		"""Returns the sum and the number of advances, leaving out the zero ones
+		if skipZero is true.
+		"""
+		count = len(self.advances)
+		if skipZero:
+			count -= self.advances.count(0)
+		return sum(self.advances), count
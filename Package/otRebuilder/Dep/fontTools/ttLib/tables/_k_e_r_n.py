@@ -6,10 +6,15 @@ from fontTools.misc.fixedTools import (
 	fixedToFloat as fi2fl,
 	floatToFixed as fl2fi)
 from . import DefaultTable
+from ._h_m_t_x import _scaleArray
 import struct
 import sys
 import array
 import logging
+try:
+	from collections.abc import MutableMapping
+except ImportError:
+	from UserDict import DictMixin as MutableMapping
 
 
 log = logging.getLogger(__name__)
@@ -122,30 +127,35 @@ class KernTable_format_0(object):
 		self.coverage = coverage
 		self.tupleIndex = tupleIndex
 
-		self.kernTable = kernTable = {}
-
 		nPairs, searchRange, entrySelector, rangeShift = struct.unpack(
 			">HHHH", data[:8])
 		data = data[8:]
 
 		nPairs = min(nPairs, len(data) // 6)
 		datas = array.array("H", data[:6 * nPairs])
+		values = array.array("h", data[:6 * nPairs])
 		if sys.byteorder != "big":  # pragma: no cover
 			datas.byteswap()
-		it = iter(datas)
+			values.byteswap()
 		glyphOrder = ttFont.getGlyphOrder()
-		for k in range(nPairs):
-			left, right, value = next(it), next(it), next(it)
-			if value >= 32768:
-				value -= 65536
-			try:
-				kernTable[(glyphOrder[left], glyphOrder[right])] = value
-			except IndexError:
-				# Slower, but will not throw an IndexError on an invalid
-				# glyph id.
-				kernTable[(
-					ttFont.getGlyphName(left),
-					ttFont.getGlyphName(right))] = value
+		lefts = datas[0::3]
+		rights = datas[1::3]
+		values = values[2::3]
+		pairs = KernPairs(glyphOrder, lefts, rights, values)
+		if pairs.isValid():
+			self.kernTable = pairs
+		else:
+			# Unsorted or duplicate pairs, or invalid glyph ids
+			self.kernTable = kernTable = {}
+			for left, right, value in zip(lefts, rights, values):
+				try:
+					kernTable[(glyphOrder[left], glyphOrder[right])] = value
+				except IndexError:
+					# Slower, but will not throw an IndexError on an invalid
+					# glyph id.
+					kernTable[(
+						ttFont.getGlyphName(left),
+						ttFont.getGlyphName(right))] = value
 		if len(data) > 6 * nPairs + 4:  # Ignore up to 4 bytes excess
 			log.warning(
 				"excess data in 'kern' subtable: %d bytes",
@@ -157,21 +167,29 @@ class KernTable_format_0(object):
 		data = struct.pack(
 			">HHHH", nPairs, searchRange, entrySelector, rangeShift)
 
-		# yeehee! (I mean, turn names into indices)
-		try:
-			reverseOrder = ttFont.getReverseGlyphMap()
-			kernTable = sorted(
-				(reverseOrder[left], reverseOrder[right], value)
-				for ((left, right), value) in self.kernTable.items())
-		except KeyError:
-			# Slower, but will not throw KeyError on invalid glyph id.
-			getGlyphID = ttFont.getGlyphID
-			kernTable = sorted(
-				(getGlyphID(left), getGlyphID(right), value)
-				for ((left, right), value) in self.kernTable.items())
-
-		for left, right, value in kernTable:
-			data = data + struct.pack(">HHh", left, right, value)
+		if isinstance(self.kernTable, KernPairs) and self.kernTable.isValid(ttFont.getGlyphOrder()):
+			# Already sorted by glyph ids
+			allPairs = [0] * (3 * nPairs)
+			allPairs[0::3] = self.kernTable.lefts
+			allPairs[1::3] = self.kernTable.rights
+			allPairs[2::3] = self.kernTable.kernValues
+			data = data + struct.pack(">" + "HHh" * nPairs, *allPairs)
+		else:
+			# yeehee! (I mean, turn names into indices)
+			try:
+				reverseOrder = ttFont.getReverseGlyphMap()
+				kernTable = sorted(
+					(reverseOrder[left], reverseOrder[right], value)
+					for ((left, right), value) in self.kernTable.items())
+			except KeyError:
+				# Slower, but will not throw KeyError on invalid glyph id.
+				getGlyphID = ttFont.getGlyphID
+				kernTable = sorted(
+					(getGlyphID(left), getGlyphID(right), value)
+					for ((left, right), value) in self.kernTable.items())
+
+			for left, right, value in kernTable:
+				data = data + struct.pack(">HHh", left, right, value)
 
 		if not self.apple:
 			version = 0
@@ -267,4 +285,117 @@ class KernTable_format_unkown(object):
 		self.decompile(readHex(content), ttFont)
 
 
+class KernPairs(MutableMapping):
+
+	"""Maps (left, right) glyph name pairs to kerning values like a dict, but
+	keeps the pairs in three parallel integer arrays of left glyph ids, right
+	glyph ids and values, so that all values can be scaled at once. Values are
+	rounded to integers when they are set.
+	"""
+
+	def __init__(self, glyphOrder, lefts, rights, kernValues):
+		assert len(lefts) == len(rights) == len(kernValues)
+		self.glyphOrder = list(glyphOrder)
+		self.lefts = array.array("H", lefts)
+		self.rights = array.array("H", rights)
+		self.kernValues = array.array("i", kernValues)
+		self._indices = None
+		self._glyphIDs = None
+
+	@classmethod
+	def fromDict(cls, kernTable, glyphOrder):
+		"""Glyphs not in glyphOrder are given ids after the last one."""
+		kernPairs = cls(glyphOrder, [], [], [])
+		pairs = sorted(
+			(kernPairs._getGlyphID(left), kernPairs._getGlyphID(right), int(round(value)))
+			for (left, right), value in kernTable.items())
+		kernPairs.lefts = array.array("H", [left for left, _, _ in pairs])
+		kernPairs.rights = array.array("H", [right for _, right, _ in pairs])
+		kernPairs.kernValues = array.array("i", [value for _, _, value in pairs])
+		return kernPairs
+
+	def toDict(self):
+		return dict(self.items())
+
+	def isValid(self, glyphOrder=None):
+		"""Returns True if the pairs are sorted by glyph ids without duplicates,
+		and all glyph ids are in glyphOrder, or in the own one if it is None.
+		"""
+		if glyphOrder is not None and glyphOrder != self.glyphOrder:
+			return False
+		if not self.lefts:
+			return True
+		if max(max(self.lefts), max(self.rights)) >= len(self.glyphOrder):
+			return False
+		keys = [(left << 16) | right for left, right in zip(self.lefts, self.rights)]
+		return all(a < b for a, b in zip(keys, keys[1:]))
+
+	def _getIndices(self):
+		if self._indices is None:
+			glyphOrder = self.glyphOrder
+			self._indices = dict(
+				((glyphOrder[left], glyphOrder[right]), i)
+				for i, (left, right) in enumerate(zip(self.lefts, self.rights)))
+		return self._indices
+
+	def _getGlyphID(self, glyphName):
+		if self._glyphIDs is None:
+			self._glyphIDs = dict(zip(self.glyphOrder, range(len(self.glyphOrder))))
+		glyphID = self._glyphIDs.get(glyphName)
+		if glyphID is None:
+			glyphID = self._glyphIDs[glyphName] = len(self.glyphOrder)
+			self.glyphOrder.append(glyphName)
+		return glyphID
+
+	def __getitem__(self, pair):
+		return self.kernValues[self._getIndices()[pair]]
+
+	def __setitem__(self, pair, value):
+		value = int(round(value))
+		indices = self._getIndices()
+		i = indices.get(pair)
+		if i is None:
+			# Appended, so the pairs are sorted again upon compile.
+			left, right = pair
+			indices[pair] = len(self.kernValues)
+			self.lefts.append(self._getGlyphID(left))
+			self.rights.append(self._getGlyphID(right))
+			self.kernValues.append(value)
+		else:
+			self.kernValues[i] = value
+
+	def __delitem__(self, pair):
+		i = self._getIndices()[pair]
+		del self.lefts[i]
+		del self.rights[i]
+		del self.kernValues[i]
+		self._indices = None
+
+	def __contains__(self, pair):
+		return pair in self._getIndices()
+
+	def __iter__(self):
+		return iter(self.keys())
+
+	def __len__(self):
+		return len(self.kernValues)
+
+	def keys(self):
+		glyphOrder = self.glyphOrder
+		return [(glyphOrder[left], glyphOrder[right]) for left, right in zip(self.lefts, self.rights)]
+
+	def values(self):
+		return list(self.kernValues)
+
+	def items(self):
+		return list(zip(self.keys(), self.kernValues))
+
+	def copy(self):
+		return self.__class__(self.glyphOrder, self.lefts, self.rights, self.kernValues)
+
+	def scale(self, factor):
+		"""Multiplies all values, rounding them like int(round(value * factor))."""
+		self.kernValues = _scaleArray(self.kernValues, factor)
+
+
 kern_classes = {0: KernTable_format_0}
@@ -75,15 +75,16 @@ class table__m_a_x_p(DefaultTable.DefaultTable):
 		maxComponentDepth = 0
 		allXMinIsLsb = 1
 		for glyphName in ttFont.getGlyphOrder():
-			g = glyfTable[glyphName]
-			if g.numberOfContours:
-				if hmtxTable[glyphName][1] != g.xMin:
+			g = glyfTable.glyphs[glyphName]  # Compact glyphs are not expanded.
+			numberOfContours, gXMin, gYMin, gXMax, gYMax = g.getHeader()
+			if numberOfContours:
+				if hmtxTable[glyphName][1] != gXMin:
 					allXMinIsLsb = 0
-				xMin = min(xMin, g.xMin)
-				yMin = min(yMin, g.yMin)
-				xMax = max(xMax, g.xMax)
-				yMax = max(yMax, g.yMax)
-				if g.numberOfContours > 0:
+				xMin = min(xMin, gXMin)
+				yMin = min(yMin, gYMin)
+				xMax = max(xMax, gXMax)
+				yMax = max(yMax, gYMax)
+				if numberOfContours > 0:
 					nPoints, nContours = g.getMaxpValues()
 					maxPoints = max(maxPoints, nPoints)
 					maxContours = max(maxContours, nContours)
@@ -91,7 +92,7 @@ class table__m_a_x_p(DefaultTable.DefaultTable):
 					nPoints, nContours, componentDepth = g.getCompositeMaxpValues(glyfTable)
 					maxCompositePoints = max(maxCompositePoints, nPoints)
 					maxCompositeContours = max(maxCompositeContours, nContours)
-					maxComponentElements = max(maxComponentElements, len(g.components))
+					maxComponentElements = max(maxComponentElements, len(g.getComponentNames(glyfTable)))
 					maxComponentDepth = max(maxComponentDepth, componentDepth)
 		if xMin == +INFINITY:
 			headTable.xMin = 0
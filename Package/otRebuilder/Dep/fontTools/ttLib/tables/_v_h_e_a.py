@@ -53,14 +53,15 @@ class table__v_h_e_a(DefaultTable.DefaultTable):
 		if 'glyf' in ttFont:
 			glyfTable = ttFont['glyf']
 			for name in ttFont.getGlyphOrder():
-				g = glyfTable[name]
-				if g.numberOfContours == 0:
-					continue
-				if g.numberOfContours < 0 and not hasattr(g, "yMax"):
+				g = glyfTable.glyphs[name]  # Compact glyphs are not expanded.
+				if not hasattr(g, "data") and g.numberOfContours < 0 and not hasattr(g, "yMax"):
 					# Composite glyph without extents set.
 					# Calculate those.
 					g.recalcBounds(glyfTable)
-				boundsHeightDict[name] = g.yMax - g.yMin
+				numberOfContours, xMin, yMin, xMax, yMax = g.getHeader()
+				if numberOfContours == 0:
+					continue
+				boundsHeightDict[name] = yMax - yMin
 		elif 'CFF ' in ttFont:
 			topDict = ttFont['CFF '].cff.topDictIndex[0]
 			for name in ttFont.getGlyphOrder():
@@ -8,7 +8,7 @@ converter objects from otConverters.py.
 from __future__ import print_function, division, absolute_import, unicode_literals
 from fontTools.misc.py23 import *
 from fontTools.misc.textTools import safeEval
-from .otBase import BaseTable, FormatSwitchingBaseTable
+from .otBase import BaseTable, FormatSwitchingBaseTable, OverflowErrorRecord
 import operator
 import logging
 import struct
@@ -1115,25 +1115,12 @@ def fixLookupOverFlows(ttf, overflowRecord):
 		to an Extension Lookup type.
 	"""
 	ok = 0
-	lookupIndex = overflowRecord.LookupListIndex
-	if (overflowRecord.SubTableIndex is None):
-		lookupIndex = lookupIndex - 1
+	lookupIndex = _getLookupToPromote(ttf, overflowRecord)
 	if lookupIndex < 0:
 		return ok
-	if overflowRecord.tableType == 'GSUB':
-		extType = 7
-	elif overflowRecord.tableType == 'GPOS':
-		extType = 9
-
-	lookups = ttf[overflowRecord.tableType].table.LookupList.Lookup
-	lookup = lookups[lookupIndex]
-	# If the previous lookup is an extType, look further back. Very unlikely, but possible.
-	while lookup.SubTable[0].__class__.LookupType == extType:
-		lookupIndex = lookupIndex -1
-		if lookupIndex < 0:
-			return ok
-		lookup = lookups[lookupIndex]
+	extType = _extensionTypes[overflowRecord.tableType]
 
+	lookup = ttf[overflowRecord.tableType].table.LookupList.Lookup[lookupIndex]
 	lookup.LookupType = extType
 	for si in range(len(lookup.SubTable)):
 		subTable = lookup.SubTable[si]
@@ -1145,6 +1132,123 @@ def fixLookupOverFlows(ttf, overflowRecord):
 	ok = 1
 	return ok
 
+_extensionTypes = {'GSUB': 7, 'GPOS': 9}
+
+def _getLookupToPromote(ttf, overflowRecord):
+	""" Return the index of the lookup that fixLookupOverFlows() promotes
+	for overflowRecord, or -1 if there is none.
+	"""
+	lookupIndex = overflowRecord.LookupListIndex
+	if (overflowRecord.SubTableIndex is None):
+		lookupIndex = lookupIndex - 1
+	if lookupIndex < 0:
+		return lookupIndex
+	extType = _extensionTypes[overflowRecord.tableType]
+
+	lookups = ttf[overflowRecord.tableType].table.LookupList.Lookup
+	lookup = lookups[lookupIndex]
+	# If the previous lookup is an extType, look further back. Very unlikely, but possible.
+	while lookup.SubTable[0].__class__.LookupType == extType:
+		lookupIndex = lookupIndex -1
+		if lookupIndex < 0:
+			return lookupIndex
+		lookup = lookups[lookupIndex]
+	return lookupIndex
+
+def fixLookupListOverFlows(ttf, overflowRecords, tables):
+	""" Fix all the overflowed offsets from the LookupList to lookups, found in
+	one layout of the table, by promoting lookups to Extension lookups the same
+	way as fixLookupOverFlows() does, one overflow at a time.
+	Instead of compiling the table again after each promotion, the offsets to
+	the following lookups are moved back by the size of the subtables that leave
+	for the end of the table. 'tables' are the laid out OTTableWriter objects,
+	without Extension subtables. Return the number of promoted lookups, or 0
+	if one of them cannot be promoted.
+	"""
+	tableType = overflowRecords[0].tableType
+	lookupListWriter = None
+	for table in tables:
+		if getattr(table, "name", None) == "LookupList":
+			lookupListWriter = table
+			break
+	if lookupListWriter is None:
+		return 0
+	lookupWriters = {}
+	for item in lookupListWriter.items:
+		if hasattr(item, "getData"):
+			lookupWriters[item.repeatIndex] = item
+
+	# The subtables of a lookup are laid out after it, up to the next lookup.
+	positions = sorted(set(writer.pos for writer in lookupWriters.values()))
+	tablesEnd = tables[-1].pos + tables[-1].getDataLength()
+	nextPositions = dict(zip(positions, positions[1:] + [tablesEnd]))
+	offsets = {}
+	savings = {}  # Bytes before the following lookups which promoting a lookup saves
+	for lookupIndex, writer in lookupWriters.items():
+		offsets[lookupIndex] = writer.pos - lookupListWriter.pos
+		subTableCount = len([item for item in writer.items if hasattr(item, "getData")])
+		extSubTablesSize = 8 * subTableCount  # Format, ExtensionLookupType and a 32-bit offset
+		savings[lookupIndex] = nextPositions[writer.pos] - writer.pos - writer.getDataLength() - extSubTablesSize
+
+	fixes = 0
+	while True:
+		overflowed = [lookupIndex for lookupIndex, offset in offsets.items() if offset >= 0x10000]
+		if not overflowed:
+			break
+		overflowRecord = OverflowErrorRecord((tableType, min(overflowed), None, None, None))
+		promotedIndex = _getLookupToPromote(ttf, overflowRecord)
+		if not fixLookupOverFlows(ttf, overflowRecord):
+			return 0
+		fixes += 1
+		promotedPos = lookupWriters[promotedIndex].pos
+		for lookupIndex, writer in lookupWriters.items():
+			if writer.pos > promotedPos:
+				offsets[lookupIndex] -= savings[promotedIndex]
+		savings[promotedIndex] = 0
+	return fixes
+
+def fixOverFlows(ttf, overflowRecords, tables):
+	""" Fix the overflowed offsets found in one layout of a GSUB/GPOS table.
+	The offsets from the LookupList overflow before any others, so they are
+	fixed first, with fixLookupListOverFlows(). Otherwise every lookup with
+	overflowed offsets to subtables is promoted to an Extension lookup, or
+	else every subtable with overflowed offsets is fixed; from the last one,
+	so that the indices of the others stay valid.
+	Return the number of fixes, each of which used to take a compile of its own,
+	or 0 as soon as one fails, as the table may be left half fixed.
+	"""
+	overflowRecords = [record for record in overflowRecords if record.LookupListIndex is not None]
+	if not overflowRecords or overflowRecords[0].tableType not in _extensionTypes:
+		return 0
+
+	lookupListRecords = [record for record in overflowRecords
+			if record.itemName is None and record.SubTableIndex is None]
+	if lookupListRecords:
+		return fixLookupListOverFlows(ttf, lookupListRecords, tables)
+
+	fixes = 0
+	lookupRecords = [record for record in overflowRecords if record.itemName is None]
+	if lookupRecords:
+		done = set()
+		for record in lookupRecords:
+			if record.LookupListIndex not in done:
+				done.add(record.LookupListIndex)
+				if not fixLookupOverFlows(ttf, record):
+					return 0
+				fixes += 1
+		return fixes
+
+	done = set()
+	overflowRecords.sort(key=lambda record: (record.LookupListIndex, record.SubTableIndex), reverse=True)
+	for record in overflowRecords:
+		key = (record.LookupListIndex, record.SubTableIndex)
+		if key not in done:
+			done.add(key)
+			if not fixSubTableOverFlows(ttf, record):
+				return 0  # An empty subtable may have been added
+			fixes += 1
+	return fixes
+
 def splitAlternateSubst(oldSubTable, newSubTable, overflowRecord):
 	ok = 1
 	newSubTable.Format = oldSubTable.Format
@@ -0,0 +1,130 @@
+"""ttLib.ttCollection -- reading and writing TrueType/OpenType Collections.
+
+The fonts of a collection are ttLib.TTFont objects, which can share the
+tables that they have in common, so that those are decompiled and compiled
+only once, and written only once as well.
+"""
+
+from __future__ import print_function, division, absolute_import
+from fontTools.misc.py23 import *
+from fontTools.ttLib import TTFont, TTLibError, _isSameFile, _isSeekable
+from fontTools.ttLib.sfnt import readTTCHeader, writeTTCHeader
+import struct
+import logging
+
+
+log = logging.getLogger(__name__)
+
+
+class TTCollection(object):
+
+	"""Object representing a TrueType Collection / OpenType Collection.
+	The main API is self.fonts being a list of TTFont instances.
+
+	If shareTables is True, fonts of the collection pointing to the same
+	table data in the file also share the same table object, which is
+	decompiled only once. Editing a shared table thus edits it for all
+	of them. Such tables are compiled only once upon save() as well.
+	"""
+
+	def __init__(self, file=None, shareTables=False, fontClass=TTFont, **kwargs):
+		"""The 'file' argument is a pathname or a readable file object.
+		Other keyword arguments are passed to the constructor of every
+		font, which is 'fontClass', a TTFont subclass if not TTFont itself.
+		"""
+		fonts = self.fonts = []
+		if file is None:
+			return
+		assert 'fontNumber' not in kwargs, kwargs
+		if not hasattr(file, "read"):
+			file = open(file, "rb")
+		tableCache = {} if shareTables else None
+		header = readTTCHeader(file)
+		for i in range(header.numFonts):
+			font = fontClass(file, fontNumber=i, _tableCache=tableCache, **kwargs)
+			fonts.append(font)
+
+	def save(self, file, shareTables=True):
+		"""Save the collection to disk. The 'file' argument can be either a
+		pathname or a writable file object.
+
+		If shareTables is True, a table whose data is the same as one
+		written before, for another font of the collection, is not written
+		again. Shared table objects are then compiled only once as well.
+		"""
+		if not hasattr(file, "write"):
+			for font in self.fonts:
+				if font.reader is None:
+					continue
+				if font.lazy and font.reader.file.name == file:
+					raise TTLibError(
+						"Can't overwrite TTCollection when 'lazy' attribute is True")
+				if font.useMmap and _isSameFile(font.reader.file, file):
+					raise TTLibError(
+						"Can't overwrite TTCollection when 'useMmap' attribute is True")
+			closeStream = True
+			file = open(file, "wb")
+		else:
+			# assume "file" is a writable file object
+			closeStream = False
+
+		if _isSeekable(file):
+			final = file
+		else:
+			final = BytesIO()  # Table directories are written after their tables
+		tableCache = {} if shareTables else None
+		compileCache = {} if shareTables else None
+		self._loadSharedTables()
+		offsetsOffset = writeTTCHeader(final, len(self.fonts))
+		offsets = []
+		for font in self.fonts:
+			offsets.append(final.tell())
+			if font.flavor is not None:
+				raise TTLibError("Can't save a '%s' font in a collection" % font.flavor)
+			if font.recalcTimestamp and 'head' in font:
+				font['head']  # make sure 'head' is loaded so the recalculation is actually done
+			tags = [tag for tag in font.keys() if tag != "GlyphOrder"]
+			font._saveDirect(final, tags, True, tableCache, compileCache)
+			final.seek(0, 2)
+		final.seek(offsetsOffset)
+		final.write(struct.pack(">%dL" % len(self.fonts), *offsets))
+
+		if final is not file:
+			file.write(final.getvalue())
+		if closeStream:
+			file.close()
+
+	def _loadSharedTables(self):
+		"""A shared table which has been loaded, and maybe edited, by some
+		of the fonts is loaded by all fonts sharing it, so that they are
+		saved alike. Those which are loaded by none are copied as they are.
+		"""
+		loaded = set(id(table) for font in self.fonts for table in font.tables.values())
+		for font in self.fonts:
+			if font.reader is None or font._tableCache is None:
+				continue
+			for tag, entry in font.reader.tables.items():
+				if tag in font.tables:
+					continue
+				table = font._tableCache.get((tag, entry.offset, entry.length))
+				if table is not None and id(table) in loaded:
+					font.tables[tag] = table
+
+	def close(self):
+		for font in self.fonts:
+			font.close()
+
+	def __getitem__(self, item):
+		return self.fonts[item]
+
+	def __setitem__(self, item, value):
+		self.fonts[item] = value
+
+	def __delitem__(self, item):
+		del self.fonts[item]
+
+	def __len__(self):
+		return len(self.fonts)
+
+	def __iter__(self):
+		return iter(self.fonts)
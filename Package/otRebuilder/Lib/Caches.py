@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+from __future__ import print_function, division, absolute_import
+import os.path
+import sys
+
+dependencyDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../Dep")
+sys.path.insert(0, dependencyDir)
+
+import hashlib
+import sqlite3
+import time
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import fontTools
+from fontTools.misc.py23 import BytesIO, basestring, Tag
+from otRebuilder.Lib import Constants
+
+
+# A persistent key-value store of binary blobs, kept in a single SQLite file.
+# When the total size exceeds maxSize (in bytes), least recently used entries are evicted.
+# SQLite handles locking, so several processes may share one cache file. Writes are committed
+# at once, as an open transaction would keep the others waiting for the whole run.
+class DiskCache(object):
+
+    def __init__(self, path, maxSize, timeout = 60):
+        self.path = path
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.__touched = {}  # key -> last used time, flushed upon close()
+        self.__db = sqlite3.connect(path, timeout = timeout)
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key TEXT PRIMARY KEY, value BLOB, size INTEGER, lastUsed REAL)"
+            )
+        self.__db.commit()
+
+    @staticmethod
+    def makeKey(*parts):
+        digest = hashlib.sha1()
+        for part in parts:
+            if not isinstance(part, bytes):
+                part = repr(part).encode("utf-8")
+            digest.update(part)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key):
+        row = self.__db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__touched[key] = time.time()
+        return bytes(row[0])
+
+    def put(self, key, value):
+        self.putMany([(key, value)])
+        return
+
+    # Writes the (key, value) pairs in one short transaction.
+    def putMany(self, items):
+        now = time.time()
+        rows = [(key, sqlite3.Binary(value), len(value), now) for key, value in items]
+        with self.__db:  # Committed upon exit
+            self.__db.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, lastUsed) VALUES (?, ?, ?, ?)", rows
+                )
+        for row in rows:
+            self.__touched.pop(row[0], None)
+        return
+
+    def hitRate(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+    def evict(self):
+        totalSize = self.__db.execute("SELECT TOTAL(size) FROM entries").fetchone()[0]
+        if totalSize <= self.maxSize:
+            return
+        staleKeys = []
+        for key, size in self.__db.execute("SELECT key, size FROM entries ORDER BY lastUsed"):
+            if totalSize <= self.maxSize:
+                break
+            staleKeys.append((key,))
+            totalSize -= size
+        self.__db.executemany("DELETE FROM entries WHERE key = ?", staleKeys)
+        return
+
+    def close(self):
+        if self.__db is None:
+            return
+        self.__db.executemany(
+            "UPDATE entries SET lastUsed = ? WHERE key = ?",
+            [(lastUsed, key) for key, lastUsed in self.__touched.items()]
+            )
+        self.__touched = {}
+        self.evict()
+        self.__db.commit()
+        self.__db.close()
+        self.__db = None
+        return
+
+
+# Digest of the whole fontTools source, which the pickles of its table objects depend on.
+_sourceDigest = None
+
+
+def getSourceDigest():
+    global _sourceDigest
+    if _sourceDigest is None:
+        digest = hashlib.sha1()
+        sourceDir = os.path.dirname(os.path.realpath(fontTools.__file__))
+        for dirPath, dirNames, fileNames in os.walk(sourceDir):
+            dirNames.sort()
+            for fileName in sorted(fileNames):
+                if not fileName.endswith(".py"):
+                    continue
+                filePath = os.path.join(dirPath, fileName)
+                digest.update(os.path.relpath(filePath, sourceDir).replace(os.sep, "/").encode("utf-8"))
+                with open(filePath, "rb") as sourceFile:
+                    digest.update(sourceFile.read())
+        _sourceDigest = digest.hexdigest()
+    return _sourceDigest
+
+
+# Keeps decompiled tables of fonts read from disk among runs, as the `tableStore` of TTFont.
+# Tables are pickled into a DiskCache, keyed by the path and mtime of the font file, their
+# place and checksum in it, the Python version and the fontTools source. Pickles made by other
+# table code are thus never loaded. A reference to the font itself is pickled as such, and
+# loads as the font loading the table. Tables which cannot be pickled are simply not kept.
+class TableCache(object):
+
+    def __init__(self, diskCache, tags = Constants.TABLE_CACHE_TAGS):
+        self.diskCache = diskCache
+        self.tags = frozenset(Tag(tag) for tag in tags)
+        self.__pid = os.getpid()  # The SQLite connection must not be used by forked processes.
+
+    def load(self, ttFont, tag):
+        key = self.__makeKey(ttFont, tag)
+        if key is None:
+            return None
+        data = self.diskCache.get(key)
+        if data is None:
+            return None
+        unpickler = pickle.Unpickler(BytesIO(data))
+        unpickler.persistent_load = lambda persistentID: ttFont
+        try:
+            return unpickler.load()
+        except Exception:  # Decompiled again, and stored anew
+            return None
+
+    def store(self, ttFont, tag, table):
+        key = self.__makeKey(ttFont, tag)
+        if key is None:
+            return
+        file = BytesIO()
+        pickler = pickle.Pickler(file, 2)
+        pickler.persistent_id = lambda obj: "ttFont" if obj is ttFont else None
+        try:
+            pickler.dump(table)
+        except Exception:  # e.g. tables referring to open files
+            return
+        self.diskCache.put(key, file.getvalue())
+        return
+
+    def close(self):
+        self.diskCache.close()
+        return
+
+    def __makeKey(self, ttFont, tag):
+        tag = Tag(tag)
+        if tag not in self.tags or os.getpid() != self.__pid:
+            return None
+        path = getattr(ttFont.reader.file, "name", None)
+        if not isinstance(path, basestring):
+            return None
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        entry = ttFont.reader.tables[tag]
+        return DiskCache.makeKey(
+            getSourceDigest(), sys.version_info[:2], os.path.realpath(path), mtime,
+            tag, entry.offset, entry.length, entry.checkSum
+            )
@@ -9,6 +9,8 @@ dependencyDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../De
 sys.path.insert(0, dependencyDir)
 
 
+VERSION = "1.5.6"
+
 REQUIRED_TABLES = ("cmap", "head", "hhea", "hmtx", "maxp")
 
 # Default values
@@ -30,6 +32,12 @@ OS2f2_LEGACY_LWRCASE_WGHTFCTR = (
 OTF2TTF_DFLT_MAX_ERR = 1.0  # Measured in UPM
 OTF2TTF_DFLT_POST_FORMAT = 2.0
 OTF2TTF_DFLT_REVERSE = True
+OTF2TTF_DFLT_CACHE_SIZE = 512  # Measured in MiB
+OTF2TTF_CACHE_FILE = "otf2ttf.sqlite"
+
+# Decompiled tables kept by --cacheTables, only those whose decompile takes longer than unpickling
+TABLE_CACHE_TAGS = ("BASE", "CFF ", "GDEF", "GPOS", "GSUB", "JSTF", "MATH")
+TABLE_CACHE_FILE = "tables.sqlite"
 
 # Embedding Restriction Codes
 EMBED_INSTALLABLE = 0
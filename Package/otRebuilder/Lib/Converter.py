@@ -2,65 +2,178 @@
 # -*- coding:utf-8 -*-
 
 from __future__ import print_function, division, absolute_import
+import array
+import multiprocessing
 import os.path
 import sys
 
 dependencyDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../Dep")
 sys.path.insert(0, dependencyDir)
 
-from fontTools.ttLib import newTable
-from fontTools.misc.transform import Scale
+from fontTools.misc.psCharStrings import T2CharString
+from fontTools.ttLib import TTFont, newTable
+from fontTools.pens.recordingPen import RecordingPen
 from fontTools.pens.ttGlyphPen import TTGlyphPen
-from fontTools.pens.transformPen import TransformPen
 from fontTools.ttLib.tables.ttProgram import Program
-from cu2qu.pens import Cu2QuPen
-
+from fontTools.ttLib.tables.DefaultTable import DefaultTable
+from fontTools.ttLib.tables._h_m_t_x import GlyphMetrics
+from fontTools.ttLib.tables._k_e_r_n import KernPairs
+from fontTools.ttLib.tables._g_l_y_f import Glyph, GlyphCoordinates
+from cu2qu.pens import Cu2QuPen, Cu2QuCollectPen
+from cu2qu.batch import batch_curve_to_quadratic
+import cu2qu
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from otRebuilder.Lib import Caches
+from otRebuilder.Lib import Outlines
+from otRebuilder.Lib import Scalers
 from otRebuilder.Lib import Workers
 
 
 class Converter(Workers.Worker):
 
-    def __init__(self, ttfontObj, jobsObj):
+    # The faces of a collection may share table objects, which must be converted only once.
+    # They share `convertedTables` as well, which keeps the results of the first face for the others.
+    def __init__(self, ttfontObj, jobsObj, convertedTables = None):
         super(Converter, self).__init__(ttfontObj, jobsObj)
+        if convertedTables is None:
+            convertedTables = {}
+        self.convertedTables = convertedTables
 
-    def otf2ttf(self, maxErr = 1.0, postFormat = 2.0, reverseDirection = True):
+    def otf2ttf(self, maxErr = 1.0, postFormat = 2.0, reverseDirection = True, workers = 1, cache = None, vectorize = False,
+                composeDuplicates = False):
         # maxErr = 1.0, approximation error, measured in units per em (UPM).
         # postFormat = 2.0, default `post` table format.
         # reverseDirection = True, assuming the input contours' direction is correctly set (counter-clockwise), we just flip it to clockwise.
+        # workers = 1, number of processes converting glyphs; 1 means no parallelism.
+        # cache = None, a Caches.DiskCache keeping converted glyphs among runs.
+        # vectorize = False, whether to convert the curves of all glyphs together with NumPy.
+        # composeDuplicates = False, whether glyphs duplicating another one's outline, maybe moved, become composites of it.
         if self.font.sfntVersion != "OTTO" or not self.font.has_key("CFF ") or not self.font.has_key("post"):
             print("WARNING: Invalid CFF-based font. --otf2ttf is now ignored.", file = sys.stderr)
             self.jobs.convert_otf2ttf = False
             return
 
-        # Convert cubic to quadratic
-        quadGlyphs = {}
         glyphOrder = self.font.getGlyphOrder()
+        cff = self.font["CFF "]
+        newTables = self.__getConverted("otf2ttf", cff)
+        if newTables is None:
+            newTables = self.__otf2ttf_makeTables(
+                glyphOrder, maxErr, reverseDirection, workers, cache, vectorize, composeDuplicates
+                )
+            self.__setConverted("otf2ttf", cff, newTables)
+        for tag in ("glyf", "prep", "gasp", "maxp", "loca"):
+            self.font[tag] = newTables[tag]
+
+        # Modify `post` table
+        post = self.font["post"]
+        post.formatType = postFormat
+        post.extraNames = []
+        post.mapping = {}
+        post.glyphOrder = glyphOrder
+
+        # Change sfntVersion from CFF to TrueType
+        self.font.sfntVersion = "\x00\x01\x00\x00"
+
+        # Recalculate missing properties in `head`, `glyf`, `maxp` upon compile
+        self.font.recalcBBoxes = True
+
+        # Clean-ups
+        del self.font["CFF "]
+        if self.font.has_key("VORG"):
+            del self.font["VORG"]
+        return
+
+    # Returns what `table` has been converted into by `action` through another face, or None.
+    def __getConverted(self, action, table):
+        converted = self.convertedTables.get((action, id(table)))
+        if converted is None:
+            return None
+        return converted[1]
+
+    # Also keeps the table itself, so that its id is never reused by another table.
+    def __setConverted(self, action, table, result = True):
+        self.convertedTables[(action, id(table))] = (table, result)
+        return
+
+    # Returns whether the table is yet to be converted by `action`, and marks it as converted.
+    def __convertOnce(self, action, table):
+        if self.__getConverted(action, table) is not None:
+            return False
+        self.__setConverted(action, table)
+        return True
+
+    # Returns the new `glyf`, `prep`, `gasp`, `maxp` and `loca` tables.
+    def __otf2ttf_makeTables(self, glyphOrder, maxErr, reverseDirection, workers, cache, vectorize, composeDuplicates):
+        # Convert cubic to quadratic
         glyphSet = self.font.getGlyphSet()
-        for glyphName in glyphSet.keys():
-            glyph = glyphSet[glyphName]
-            ttPen = TTGlyphPen(glyphSet)
-            cu2quPen = Cu2QuPen(ttPen, maxErr, reverseDirection)
-            glyph.draw(cu2quPen)
-            quadGlyphs[glyphName] = ttPen.glyph()
+        glyphNames = [glyphName for glyphName in glyphOrder if glyphSet.has_key(glyphName)]
+        # Daemonic processes (e.g. batch mode workers) cannot have children.
+        parallel = workers and workers > 1 and not multiprocessing.current_process().daemon
+
+        # Outlines are recorded once to key the cache and find duplicates by, then converted from
+        # the recordings. Worker processes draw them from `CFF ` instead, so that the charstrings
+        # are only interpreted here when needed.
+        recordings = {}
+        if cache or composeDuplicates or not parallel:
+            charStrings = list(self.font["CFF "].cff.values())[0].CharStrings
+            for glyphName in glyphNames:
+                recordings[glyphName] = recPen = _RecordedGlyph()
+                try:
+                    recPen.value = Outlines.recordCharString(charStrings[glyphName])
+                except Outlines.UnsupportedOutline:
+                    glyphSet[glyphName].draw(recPen)
+        duplicates = self.__otf2ttf_findDuplicates(glyphNames, recordings, composeDuplicates)
+        glyphNames = [glyphName for glyphName in glyphNames if glyphName not in duplicates]
+
+        quadGlyphs = {}
+        cacheKeys = {}
+        if cache:
+            for glyphName in glyphNames:
+                cacheKeys[glyphName] = self.__otf2ttf_makeCacheKey(recordings[glyphName], maxErr, reverseDirection)
+                glyphData = cache.get(cacheKeys[glyphName])
+                if glyphData is not None:
+                    quadGlyphs[glyphName] = Glyph(glyphData)
+        glyphNames = [glyphName for glyphName in glyphNames if glyphName not in quadGlyphs]
+        if not glyphNames:
+            newGlyphs = {}
+        elif parallel:
+            newGlyphs = self.__otf2ttf_convertParallel(glyphNames, maxErr, reverseDirection, workers, vectorize)
+        else:
+            newGlyphs = dict(_otf2ttfDrawGlyphs(
+                [(glyphName, recordings[glyphName]) for glyphName in glyphNames],
+                maxErr, reverseDirection, vectorize, glyphSet
+                ))
+        if cache:
+            # CFF glyphs have no components, so no `glyf` table is needed to compile them.
+            cache.putMany(
+                (cacheKeys[glyphName], glyph.compile(None, recalcBBoxes = True)) for glyphName, glyph in newGlyphs.items()
+                )
+            print("otf2ttf cache: %d/%d glyphs reused (%.1f%%)." % (
+                cache.hits, cache.hits + cache.misses, cache.hitRate() * 100
+                ))
+        quadGlyphs.update(newGlyphs)
+        self.__otf2ttf_addDuplicates(quadGlyphs, duplicates, composeDuplicates)
 
         # Create quadratic `glyf` table
         glyf = newTable("glyf")
         glyf.glyphOrder = glyphOrder
         glyf.glyphs = quadGlyphs
-        self.font["glyf"] = glyf
 
         # Create global instruction table `prep` with basic rendering settings
         hintProg = Program()
         hintProg.fromBytecode([184, 1, 255, 133, 184, 0, 4, 141])
         prep = newTable("prep")
         prep.program = hintProg
-        self.font["prep"] = prep
 
         # Create `gasp` table
         gasp = newTable("gasp")
         gasp.version = 1
         gasp.gaspRange = {65535: 10}
-        self.font["gasp"] = gasp
 
         # Create partial TrueType `maxp` table (v1.0)
         maxp = newTable("maxp")
@@ -75,33 +188,94 @@ class Converter(Workers.Worker):
         maxp.maxComponentElements = max(
             len(g.components if hasattr(g, "components") else [])
             for g in glyf.glyphs.values())
-        self.font["maxp"] = maxp
 
         # Create an empty `loca` table, which will be automatically generated upon compile
-        self.font["loca"] = newTable("loca")
-
-        # Modify `post` table
-        post = self.font["post"]
-        post.formatType = postFormat
-        post.extraNames = []
-        post.mapping = {}
-        post.glyphOrder = glyphOrder
-
-        # Change sfntVersion from CFF to TrueType
-        self.font.sfntVersion = "\x00\x01\x00\x00"
-
-        # Recalculate missing properties in `head`, `glyf`, `maxp` upon compile
-        self.font.recalcBBoxes = True
-
-        # Clean-ups
-        del self.font["CFF "]
-        if self.font.has_key("VORG"):
-            del self.font["VORG"]
+        loca = newTable("loca")
+        return {"glyf": glyf, "prep": prep, "gasp": gasp, "maxp": maxp, "loca": loca}
+
+    # Converted glyphs are keyed by their drawing commands instead of the raw charstring bytes,
+    # since the latter call subroutines whose numbering changes whenever the font is re-subroutinized.
+    def __otf2ttf_makeCacheKey(self, recPen, maxErr, reverseDirection):
+        return Caches.DiskCache.makeKey(cu2qu.__version__, maxErr, bool(reverseDirection), recPen.value)
+
+    # Returns the glyphs whose recorded outline is the same as a former glyph's, so need not be
+    # converted again, mapped to the name of that glyph and the offset from it. Outlines are compared
+    # with their start point moved to the origin, so that glyphs moved by whole units are found too
+    # when they can be composites of the former. Otherwise only those at the same place are found.
+    def __otf2ttf_findDuplicates(self, glyphNames, recordings, composeDuplicates):
+        duplicates = {}
+        shapes = {}  # {shape: (first glyph name, start x, start y)}
+        places = {}  # {(shape, start x, start y): first glyph name}
+        for glyphName in glyphNames:
+            recPen = recordings.get(glyphName)
+            if recPen is None or not recPen.value or recPen.value[0][0] != "moveTo":
+                continue
+            x0, y0 = recPen.value[0][1][0]
+            shape = tuple(
+                (operator, tuple((x - x0, y - y0) for x, y in operands))
+                for operator, operands in recPen.value
+                )
+            baseName, baseX, baseY = shapes.setdefault(shape, (glyphName, x0, y0))
+            dx, dy = x0 - baseX, y0 - baseY
+            if composeDuplicates and baseName != glyphName and dx == int(dx) and dy == int(dy):
+                duplicates[glyphName] = (baseName, int(dx), int(dy))
+                continue
+            baseName = places.setdefault((shape, x0, y0), glyphName)
+            if baseName != glyphName:
+                duplicates[glyphName] = (baseName, 0, 0)
+        return duplicates
+
+    # Exact duplicates get a copy of their converted glyph, or a composite of it like moved ones.
+    # Glyphs left without any contour after conversion (e.g. lone points) are always copied.
+    def __otf2ttf_addDuplicates(self, quadGlyphs, duplicates, composeDuplicates):
+        glyphData = {}
+        for glyphName, (baseName, dx, dy) in duplicates.items():
+            if baseName not in glyphData:
+                # CFF glyphs have no components, so no `glyf` table is needed to compile them.
+                glyphData[baseName] = quadGlyphs[baseName].compile(None, recalcBBoxes = True)
+            if composeDuplicates and glyphData[baseName]:
+                ttPen = TTGlyphPen(None)
+                ttPen.addComponent(baseName, (1, 0, 0, 1, dx, dy))
+                quadGlyphs[glyphName] = ttPen.glyph()
+            else:
+                quadGlyphs[glyphName] = Glyph(glyphData[baseName])
         return
 
+    # Glyph names are split into chunks which are converted in worker processes.
+    # Every worker decompiles its own copy of `CFF ` and sends back compiled glyph data,
+    # which is kept compact here; the output is identical to the serial conversion.
+    def __otf2ttf_convertParallel(self, glyphNames, maxErr, reverseDirection, workers, vectorize):
+        if self.font.reader and self.font.reader.has_key("CFF "):
+            # Outlines are never edited before conversion, so the source data serves the workers
+            # without recompiling (and re-bounding) the whole `CFF ` table.
+            cffData = self.font.reader["CFF "]
+        else:
+            cffData = self.font.getTableData("CFF ")
+        chunkCount = workers * 4  # Smaller chunks balance the load between workers.
+        chunkSize = max(1, -(-len(glyphNames) // chunkCount))
+        chunks = [glyphNames[i:i + chunkSize] for i in range(0, len(glyphNames), chunkSize)]
+        quadGlyphs = {}
+        pool = multiprocessing.Pool(
+            min(workers, len(chunks)),
+            _otf2ttfWorkerInit,
+            (cffData, maxErr, reverseDirection, vectorize)
+            )
+        try:
+            for chunkResult in pool.imap(_otf2ttfWorkerConvert, chunks):
+                for glyphName, glyphData in chunkResult:
+                    quadGlyphs[glyphName] = Glyph(glyphData)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        return quadGlyphs
+
     def changeUPM(self, targetUPM):
         # Calculate scaling factor between old and new UPM
-        upmOld = self.font["head"].unitsPerEm
+        head = self.font["head"]
+        upmOld = self.__getConverted("changeUPM", head) or head.unitsPerEm  # Shared `head` keeps the old UPM here
         upmNew = int(targetUPM)
         isCubic = self.font.has_key("CFF ")
         if upmOld == upmNew:
@@ -109,9 +283,6 @@ class Converter(Workers.Worker):
         elif upmNew < 16 or upmNew > 16384:
             print("WARNING: Invalid UPM value. --UPM is now ignored.", file = sys.stderr)
             return
-        elif isCubic:
-            print("WARNING: CFF-based font detected. Unfortunately it is currently not supported.", file = sys.stderr)
-            return
         elif upmNew > 5000:
             print("WARNING: UPM > 5000 will cause problems in Adobe InDesign and Illustrator.", file = sys.stderr)
         else:
@@ -119,45 +290,89 @@ class Converter(Workers.Worker):
         scaleFactor = upmNew / upmOld  # Get float because __future__.division has been imported
 
         # Conversion: re-scale all glyphs
-        scaledGlyphs = {}
-        glyphOrder = self.font.getGlyphOrder()
-        glyphSet = self.font.getGlyphSet()
-        for glyphName in glyphSet.keys():
-            glyph = glyphSet[glyphName]
-            if isCubic:  # TODO: `CFF `
-                # basePen = OTGlyphPen(glyphSet)
-                pass
-            else:  # `glyf`
-                basePen = TTGlyphPen(glyphSet)
-            scalePen = TransformPen(basePen, Scale(scaleFactor, scaleFactor))
-            # Deal with quad composites (all cubics are not affected)
-            if not isCubic and glyph._glyph.isComposite():  # Scale each component's xy offset
-                glyph.draw(basePen)
-                for i in range(len(basePen.components)):
-                    componentName, oldTrans = basePen.components[i]
-                    newTrans = (oldTrans[0], oldTrans[1], oldTrans[2], oldTrans[3], oldTrans[4] * scaleFactor, oldTrans[5] * scaleFactor)
-                    basePen.components[i] = (componentName, newTrans)
-            else:  # Scale all cubics or base quads so that their composites will not be scaled multiple times
-                glyph.draw(scalePen)
-            # Glyph-specific hinting will be removed upon TTGlyphPen.glyph() call.
-            scaledGlyphs[glyphName] = basePen.glyph()
-
-        # Apply `glyf` table with scaled glyphs
-        glyf = newTable("glyf")
-        glyf.glyphOrder = glyphOrder
-        glyf.glyphs = scaledGlyphs
-        self.font["glyf"] = glyf
+        scaledTopDict = None
+        if isCubic:
+            cff = self.font["CFF "]
+            if self.__getConverted("changeUPM", cff) is not None:
+                # Already scaled by another face of a collection, before Fixer.fixFromCFF() of this face
+                # copied its values into `head` and `post`.
+                scaledTopDict = cff.cff.topDictIndex[0]
+            elif not self.__changeUPM_scaleCFF(scaleFactor):
+                return
+        else:
+            self.__changeUPM_scaleGlyf(scaleFactor)
 
         # Update tables to apply the new UPM
-        self.__applyNewUPM(upmOld, upmNew)
+        self.__applyNewUPM(upmOld, upmNew, scaledTopDict)
 
         # Recalculate `head`, `glyf`, `maxp` upon compile
-        self.font.recalcBBoxes = True
+        # `CFF ` has its FontBBox scaled along, rather than drawing every glyph again.
+        if not isCubic:
+            self.font.recalcBBoxes = True
+        return
+
+    # Scale the charstrings and subroutines of `CFF ` in place, without desubroutinizing them.
+    # Returns False if the font cannot be scaled, leaving it as it is.
+    def __changeUPM_scaleCFF(self, scaleFactor):
+        cff = self.font["CFF "]
+        try:
+            Scalers.CFFScaler(cff.cff, scaleFactor).scale()
+        except ValueError as e:
+            print("WARNING: %s. --UPM is now ignored." % e, file = sys.stderr)
+            return False
+        self.__setConverted("changeUPM", cff)
+        return True
+
+    # Scale the `glyf` table in place instead of redrawing every glyph through pens.
+    # The result is the same as TransformPen -> TTGlyphPen, but the packed coordinate
+    # arrays are multiplied in bulk, and components keep their flags and point anchors.
+    def __changeUPM_scaleGlyf(self, scaleFactor):
+        glyf = self.font["glyf"]
+        hmtx = self.font["hmtx"]
+        if not self.__convertOnce("changeUPM", glyf):
+            return
+        for glyphName in glyf.keys():
+            glyph = glyf[glyphName]  # Expanded on access
+            if glyph.isComposite():
+                for component in glyph.components:
+                    if hasattr(component, "firstPt"):  # Aligned by point numbers, so no offset to scale
+                        continue
+                    component.x = component.x * scaleFactor
+                    component.y = component.y * scaleFactor
+                # Glyph-specific hinting is no longer valid after scaling.
+                if hasattr(glyph, "program"):
+                    del glyph.program
+            elif glyph.numberOfContours > 0:
+                # Same as _TTGlyphGlyf.draw(): outlines are drawn at lsb rather than xMin.
+                offset = hmtx[glyphName][1] - glyph.xMin if hasattr(glyph, "xMin") else 0
+                glyph.coordinates = self.__changeUPM_scaleCoordinates(glyph.coordinates, scaleFactor, offset)
+                glyph.program = Program()
+                glyph.program.fromBytecode(b"")
+            else:
+                pass
         return
 
-    # Affected tables: `head`, `hhea`, `hmtx`, `kern`, `maxp`, `post`, `vhea`, `vmtx`, `OS/2`, `BASE`, `GPOS`, `JSTF`
-    # ---- TODO: OpenType layout tables: `MATH` ----
-    def __applyNewUPM(self, upmOld, upmNew):
+    # Coordinates are left in float, so that they are rounded upon compile just like TTGlyphPen's.
+    def __changeUPM_scaleCoordinates(self, coordinates, scaleFactor, offset):
+        if numpy is not None:
+            values = numpy.array(coordinates.array, dtype = numpy.float64)
+            if offset:
+                values[0::2] += offset
+            values *= scaleFactor
+            scaledValues = array.array("d", values.tolist())
+        else:
+            values = coordinates.array
+            if offset:
+                values = array.array(values.typecode, values)
+                values[0::2] = array.array(values.typecode, [x + offset for x in values[0::2]])
+            scaledValues = array.array("d", [value * scaleFactor for value in values])
+        scaledCoordinates = GlyphCoordinates(typecode = "d")
+        scaledCoordinates.array.extend(scaledValues)
+        return scaledCoordinates
+
+    # Affected tables: `head`, `hhea`, `hmtx`, `kern`, `maxp`, `post`, `vhea`, `vmtx`, `VORG`, `OS/2`, `BASE`, `GPOS`, `JSTF`, `MATH`
+    # Values that `scaledTopDict`, the top dict of an already scaled `CFF `, gave to `head` and `post` are not scaled again.
+    def __applyNewUPM(self, upmOld, upmNew, scaledTopDict = None):
         scaleFactor = upmNew / upmOld
         
         # Get font tables
@@ -169,24 +384,29 @@ class Converter(Workers.Worker):
         post = self.font.get("post")
         vhea = self.font.get("vhea")
         vmtx = self.font.get("vmtx")
+        VORG = self.font.get("VORG")
         OS2f2 = self.font.get("OS/2")
-        BASE = self.font.get("BASE")
-        GPOS = self.font.get("GPOS")
-        JSTF = self.font.get("JSTF")
-        # MATH = self.font.get("MATH")
 
         # Deal with tables
-        if head:
+        # Those shared with another face of a collection are only scaled by the first one.
+        if head and self.__getConverted("changeUPM", head) is None:
+            self.__setConverted("changeUPM", head, upmOld)
             head.unitsPerEm = upmNew
-            head.xMin = int(round(head.xMin * scaleFactor))
-            head.yMin = int(round(head.yMin * scaleFactor))
-            head.xMax = int(round(head.xMax * scaleFactor))
-            head.yMax = int(round(head.yMax * scaleFactor))
-        if kern:
+            if scaledTopDict is not None:
+                head.xMin, head.yMin, head.xMax, head.yMax = [int(value) for value in scaledTopDict.FontBBox]
+            else:
+                head.xMin = int(round(head.xMin * scaleFactor))
+                head.yMin = int(round(head.yMin * scaleFactor))
+                head.xMax = int(round(head.xMax * scaleFactor))
+                head.yMax = int(round(head.yMax * scaleFactor))
+        if kern and self.__convertOnce("changeUPM", kern):
             for subtable in kern.kernTables:
-                for pair in subtable.kernTable.keys():
-                    subtable.kernTable[pair] = int(round(subtable.kernTable[pair] * scaleFactor))
-        if hhea:
+                if not hasattr(subtable, "kernTable"):  # Unknown formats are kept as they are.
+                    continue
+                if not isinstance(subtable.kernTable, KernPairs):  # Built from scratch or from XML
+                    subtable.kernTable = KernPairs.fromDict(subtable.kernTable, self.font.getGlyphOrder())
+                subtable.kernTable.scale(scaleFactor)
+        if hhea and self.__convertOnce("changeUPM", hhea):
             hhea.ascent = int(round(hhea.ascent * scaleFactor))
             hhea.descent = int(round(hhea.descent * scaleFactor))
             hhea.lineGap = int(round(hhea.lineGap * scaleFactor))
@@ -197,7 +417,7 @@ class Converter(Workers.Worker):
             # caretSlopeRise and caretSlopeRun are used to get the cursor slope.
             # The slope doesn't change no matter what the scale factor changes.
             hhea.caretOffset = int(round(hhea.caretOffset * scaleFactor))
-        if vhea:
+        if vhea and self.__convertOnce("changeUPM", vhea):
             vhea.ascent = int(round(vhea.ascent * scaleFactor))
             vhea.descent = int(round(vhea.descent * scaleFactor))
             vhea.lineGap = int(round(vhea.lineGap * scaleFactor))
@@ -208,22 +428,26 @@ class Converter(Workers.Worker):
             # caretSlopeRise and caretSlopeRun are used to get the cursor slope.
             # The slope doesn't change no matter what the scale factor changes.
             vhea.caretOffset = int(round(vhea.caretOffset * scaleFactor))
-        if hmtx:
-            for glyfName in hmtx.metrics.keys():
-                # Type tuple; [0]: advance width; [1]: lsb
-                tempVal0 = int(round(hmtx.metrics[glyfName][0] * scaleFactor))
-                tempVal1 = int(round(hmtx.metrics[glyfName][1] * scaleFactor))
-                hmtx.metrics[glyfName] = (tempVal0, tempVal1)
-        if vmtx:
-            for glyfName in vmtx.metrics.keys():
-                # Type tuple; [0]: advance width; [1]: lsb
-                tempVal0 = int(round(vmtx.metrics[glyfName][0] * scaleFactor))
-                tempVal1 = int(round(vmtx.metrics[glyfName][1] * scaleFactor))
-                vmtx.metrics[glyfName] = (tempVal0, tempVal1)
-        if post:
+        # Metrics are kept in arrays, and are scaled all at once.
+        for mtx in (hmtx, vmtx):
+            if mtx and self.__convertOnce("changeUPM", mtx):
+                if not isinstance(mtx.metrics, GlyphMetrics):  # Built from scratch or from XML
+                    mtx.metrics = GlyphMetrics.fromDict(mtx.metrics, self.font.getGlyphOrder())
+                mtx.metrics.scale(scaleFactor)
+        if post and self.__convertOnce("changeUPM", post):
             post.underlinePosition = int(round(post.underlinePosition * scaleFactor))
             post.underlineThickness = int(round(post.underlineThickness * scaleFactor))
-        if OS2f2:
+            if scaledTopDict is not None:
+                # The same as Fixer.fixFromCFF()
+                if scaledTopDict.UnderlineThickness != scaledTopDict.defaults["UnderlineThickness"]:
+                    post.underlineThickness = int(scaledTopDict.UnderlineThickness)
+                if hasattr(scaledTopDict, "UnderlinePosition"):
+                    post.underlinePosition = int(scaledTopDict.UnderlinePosition)
+        if VORG and self.__convertOnce("changeUPM", VORG):
+            VORG.defaultVertOriginY = int(round(VORG.defaultVertOriginY * scaleFactor))
+            for glyphName, vertOriginY in VORG.VOriginRecords.items():
+                VORG.VOriginRecords[glyphName] = int(round(vertOriginY * scaleFactor))
+        if OS2f2 and self.__convertOnce("changeUPM", OS2f2):
             OS2f2.xAvgCharWidth = int(round(OS2f2.xAvgCharWidth * scaleFactor))
             OS2f2.ySubscriptXSize = int(round(OS2f2.ySubscriptXSize * scaleFactor))
             OS2f2.ySubscriptYSize = int(round(OS2f2.ySubscriptYSize * scaleFactor))
@@ -245,164 +469,107 @@ class Converter(Workers.Worker):
                 OS2f2.sCapHeight = int(round(OS2f2.sCapHeight * scaleFactor))
 
         # Deal with OpenType layout tables
-        # Every otTable is an otBase.BaseTTXConverter object, which must have the 'table' attr.
-        if BASE and BASE.table:
-            # Both HorizAxis and VertAxis must exist.
-            self.__applyNewUPM_handleBASEaxis(BASE.table.HorizAxis, scaleFactor)
-            self.__applyNewUPM_handleBASEaxis(BASE.table.VertAxis, scaleFactor)
-        if GPOS and GPOS.table:
-            if GPOS.table.LookupList:
-                self.__applyNewUPM_handleGPOSlookups(GPOS.table.LookupList.Lookup, scaleFactor)
-        if JSTF and JSTF.table:
-            for record in JSTF.table.JstfScriptRecord:
-                if record.JstfScript:
-                    if record.JstfScript.DefJstfLangSys:
-                        self.__applyNewUPM_handleJstfLangSys(record.JstfScript.DefJstfLangSys, scaleFactor)
-                    for sysRecord in record.JstfScript.JstfLangSysRecord:
-                        self.__applyNewUPM_handleJstfLangSys(sysRecord.JstfLangSys, scaleFactor)
+        # They are scaled in their binary data, without being decompiled and compiled again.
+        for tag in ("BASE", "GPOS", "JSTF", "MATH"):
+            if self.font.has_key(tag):
+                self.__applyNewUPM_scaleLayoutTable(tag, scaleFactor)
         return
 
-    def __applyNewUPM_handleBASEaxis(self, axis, scaleFactor):
-        if not axis:  # Axis might be None
-            return
-        for record in axis.BaseScriptList.BaseScriptRecord:
-            if record.BaseScript:
-                if record.BaseScript.BaseValues:
-                    for coord in record.BaseScript.BaseValues.BaseCoord:
-                        coord.Coordinate = int(round(coord.Coordinate * scaleFactor))
-                if record.BaseScript.DefaultMinMax:
-                    if record.BaseScript.DefaultMinMax.MinCoord:  # BaseCoord
-                        oldCoordValue = record.BaseScript.DefaultMinMax.MinCoord.Coordinate
-                        newCoordValue = int(round(oldCoordValue * scaleFactor))
-                        record.BaseScript.DefaultMinMax.MinCoord.Coordinate = newCoordValue
-                    if record.BaseScript.DefaultMinMax.MaxCoord:  # BaseCoord
-                        oldCoordValue = record.BaseScript.DefaultMinMax.MaxCoord.Coordinate
-                        newCoordValue = int(round(oldCoordValue * scaleFactor))
-                        record.BaseScript.DefaultMinMax.MaxCoord.Coordinate = newCoordValue
-                    for featRecord in record.BaseScript.DefaultMinMax.FeatMinMaxRecord:
-                        if featRecord.MinCoord:  # BaseCoord
-                            oldCoordValue = featRecord.MinCoord.Coordinate
-                            newCoordValue = int(round(oldCoordValue * scaleFactor))
-                            featRecord.MinCoord.Coordinate = newCoordValue
-                        if featRecord.MaxCoord:  # BaseCoord
-                            oldCoordValue = featRecord.MaxCoord.Coordinate
-                            newCoordValue = int(round(oldCoordValue * scaleFactor))
-                            featRecord.MaxCoord.Coordinate = newCoordValue
+    # Layout tables are mostly left undecompiled, so the faces of a collection share them by data.
+    def __applyNewUPM_scaleLayoutTable(self, tag, scaleFactor):
+        data = self.font.getTableData(tag)  # Compiled if it has been decompiled
+        key = ("changeUPM", tag, scaleFactor, data)
+        table = self.convertedTables.get(key)
+        if table is None:
+            table = DefaultTable(tag)
+            table.data = Scalers.LayoutScaler(data, tag, scaleFactor).scale()
+            self.convertedTables[key] = table
+        self.font[tag] = table
         return
 
-    def __applyNewUPM_handleJstfLangSys(self, jstfLangSys, scaleFactor):
-        if not jstfLangSys:  # JstfLangSys might be None
-            return
-        for priority in jstfLangSys.JstfPriority:
-            # Other attrs are just references to `GSUB` or `GPOS` table.
-            if hasattr(priority, "ShrinkageJstfMax") and priority.ShrinkageJstfMax:
-                self.__applyNewUPM_handleGPOSlookups(priority.ShrinkageJstfMax.Lookup, scaleFactor)
-            if hasattr(priority, "ExtensionJstfMax") and priority.ExtensionJstfMax:
-                self.__applyNewUPM_handleGPOSlookups(priority.ExtensionJstfMax.Lookup, scaleFactor)
-        return
-
-    def __applyNewUPM_handleGPOSlookups(self, gsubLookups, scaleFactor):
-        if not gsubLookups:
-            return
-        for lookup in gsubLookups:
-            for sub in lookup.SubTable:
-                if lookup.LookupType in range(1, 9):
-                    self.__applyNewUPM_handleGPOSsubTable(
-                        lookup.LookupType,
-                        sub,
-                        scaleFactor
-                        )
-                elif lookup.LookupType == 9:  # ExtensionPos, format 1
-                    if sub.Format == 1:  # sub.ExtensionLookupType, sub.ExtSubTable
-                        self.__applyNewUPM_handleGPOSsubTable(
-                            sub.ExtensionLookupType,
-                            sub.ExtSubTable,
-                            scaleFactor
-                            )
-                else:
-                    pass
-        return
 
-    def __applyNewUPM_handleGPOSsubTable(self, lookupType, subTable, scaleFactor):
-        if not subTable or not lookupType:
-            return
-        if lookupType == 1:  # SinglePos, format 1, 2
-            # Attr here is 'Format', not 'PosFormat'
-            if subTable.Format == 1:  # subTable.Value == ValueRecord
-                self.__applyNewUPM_handleValueRecord(subTable.Value, scaleFactor)
-            elif subTable.Format == 2:  # subTable.Value == ValueRecord[]
-                for valRecord in subTable.Value:
-                    self.__applyNewUPM_handleValueRecord(valRecord, scaleFactor)
-            else:
-                pass
-        elif lookupType == 2:  # PairPos, format 1, 2
-            if subTable.Format == 1:  # subTable.PairSet[].PairValueRecord[]
-                for pair in subTable.PairSet:
-                    for pairValRec in pair.PairValueRecord:
-                        self.__applyNewUPM_handleValueRecord(pairValRec.Value1, scaleFactor)
-                        self.__applyNewUPM_handleValueRecord(pairValRec.Value2, scaleFactor)
-            elif subTable.Format == 2:  # subTable.Class1Record[].Class2Record[]
-                for cls1Rec in subTable.Class1Record:
-                    for cls2Rec in cls1Rec.Class2Record:
-                        self.__applyNewUPM_handleValueRecord(cls2Rec.Value1, scaleFactor)
-                        self.__applyNewUPM_handleValueRecord(cls2Rec.Value2, scaleFactor)
-            else:
-                pass
-        elif lookupType == 3:  # CursivePos, format 1
-            if subTable.Format == 1:  # subTable.EntryExitRecord[]
-                for eeRec in subTable.EntryExitRecord:
-                    self.__applyNewUPM_handleAnchor(eeRec.EntryAnchor, scaleFactor)
-                    self.__applyNewUPM_handleAnchor(eeRec.ExitAnchor, scaleFactor)
-        elif lookupType == 4:  # MarkBasePos, format 1
-            if subTable.Format == 1:  # subTable.MarkArray, subTable.BaseArray
-                for markRec in subTable.MarkArray.MarkRecord:
-                    self.__applyNewUPM_handleAnchor(markRec.MarkAnchor, scaleFactor)
-                for baseRec in subTable.BaseArray.BaseRecord:
-                    for anchor in baseRec.BaseAnchor:
-                        self.__applyNewUPM_handleAnchor(anchor, scaleFactor)
-        elif lookupType == 5:  # MarkLigPos, format 1
-            if subTable.Format == 1:  # subTable.MarkArray, subTable.LigatureArray
-                for markRec in subTable.MarkArray.MarkRecord:
-                    self.__applyNewUPM_handleAnchor(markRec.MarkAnchor, scaleFactor)
-                for ligAttach in subTable.LigatureArray.LigatureAttach:
-                    for cmpntRec in ligAttach.ComponentRecord:
-                        for anchor in cmpntRec.LigatureAnchor:
-                            self.__applyNewUPM_handleAnchor(anchor, scaleFactor)
-        elif lookupType == 6:  # MarkMarkPos, format 1
-            if subTable.Format == 1:  # subTable.Mark1Array == MarkArray, subTable.Mark2Array
-                for markRec in subTable.Mark1Array.MarkRecord:
-                    self.__applyNewUPM_handleAnchor(markRec.MarkAnchor, scaleFactor)
-                for mark2Rec in subTable.Mark2Array.Mark2Record:
-                    for anchor in mark2Rec.Mark2Anchor:
-                        self.__applyNewUPM_handleAnchor(anchor, scaleFactor)
-        elif lookupType == 7:  # ContextPos, format 1, 2, 3
-            pass  # It will eventually reference to another lookup, type 1-6.
-        elif lookupType == 8:  # ChainContextPos, format 1, 2, 3
-            pass  # It will eventually reference to another lookup, type 1-6.
+# Yields the names and quadratic `glyf` glyphs of the given (name, CFF glyph) pairs.
+# They are converted by Outlines.CharStringConverter without pens, from the charstrings or from
+# recordings of the other glyphs, except those it does not support (e.g. `seac` accented glyphs),
+# which are drawn with pens instead.
+def _otf2ttfDrawGlyphs(glyphs, maxErr, reverseDirection, vectorize, glyphSet = None):
+    converter = Outlines.CharStringConverter(maxErr, reverseDirection, vectorize)
+    for glyphName, glyph in glyphs:
+        if isinstance(glyph, T2CharString):
+            converter.addCharString(glyphName, glyph)
+            continue
+        if not isinstance(glyph, _RecordedGlyph):
+            recPen = _RecordedGlyph()
+            glyph.draw(recPen)
+            glyph = recPen
+        converter.addRecording(glyphName, glyph.value)
+    quadGlyphs = dict(converter.glyphs())
+    if converter.unsupported:
+        unsupported = set(converter.unsupported)
+        quadGlyphs.update(_otf2ttfDrawGlyphsWithPens(
+            [(glyphName, glyph) for glyphName, glyph in glyphs if glyphName in unsupported],
+            maxErr, reverseDirection, vectorize, glyphSet
+            ))
+    for glyphName, glyph in glyphs:
+        yield glyphName, quadGlyphs[glyphName]
+
+
+# Yields the same as above through Cu2QuPen and TTGlyphPen.
+# With `vectorize`, the curves of all glyphs are collected first and converted at once by
+# cu2qu.batch, which gives the same splines as converting them one by one.
+def _otf2ttfDrawGlyphsWithPens(glyphs, maxErr, reverseDirection, vectorize, glyphSet = None):
+    splines = None
+    if vectorize:
+        recordings = []
+        curves = []
+        for glyphName, glyph in glyphs:
+            collectPen = Cu2QuCollectPen(curves)
+            glyph.draw(collectPen)
+            recordings.append((glyphName, collectPen))
+        glyphs = recordings
+        splines = iter(batch_curve_to_quadratic(curves, maxErr))
+    for glyphName, glyph in glyphs:
+        ttPen = TTGlyphPen(glyphSet)
+        cu2quPen = Cu2QuPen(ttPen, maxErr, reverseDirection, splines = splines)
+        if vectorize:
+            glyph.replay(cu2quPen)
         else:
-            pass
-        return
+            glyph.draw(cu2quPen)
+        yield glyphName, ttPen.glyph()
 
-    def __applyNewUPM_handleAnchor(self, anchor, scaleFactor):
-        if not anchor:
-            return
-        if hasattr(anchor, "XCoordinate") and anchor.XCoordinate:
-            anchor.XCoordinate = int(round(anchor.XCoordinate * scaleFactor))
-        if hasattr(anchor, "YCoordinate") and anchor.YCoordinate:
-            anchor.YCoordinate = int(round(anchor.YCoordinate * scaleFactor))
-        return
 
-    # The ValueRecord here is otBase.ValueRecord class, not the one presented in otData.
-    def __applyNewUPM_handleValueRecord(self, valueRecord, scaleFactor):
-        if not valueRecord:
-            return
-        if hasattr(valueRecord, "XPlacement") and valueRecord.XPlacement:
-            valueRecord.XPlacement = int(round(valueRecord.XPlacement * scaleFactor))
-        if hasattr(valueRecord, "YPlacement") and valueRecord.YPlacement:
-            valueRecord.YPlacement = int(round(valueRecord.YPlacement * scaleFactor))
-        if hasattr(valueRecord, "XAdvance") and valueRecord.XAdvance:
-            valueRecord.XAdvance = int(round(valueRecord.XAdvance * scaleFactor))
-        if hasattr(valueRecord, "YAdvance") and valueRecord.YAdvance:
-            valueRecord.YAdvance = int(round(valueRecord.YAdvance * scaleFactor))
-        return
+# An outline recorded from a CFF glyph, which draws again without interpreting the charstring.
+class _RecordedGlyph(RecordingPen):
+
+    def draw(self, pen):
+        self.replay(pen)
+
+
+# ---- otf2ttf worker processes ----
+# They must live on module level to be picklable.
+
+_otf2ttfWorkerState = {}
+
+
+def _otf2ttfWorkerInit(cffData, maxErr, reverseDirection, vectorize):
+    cffT = newTable("CFF ")
+    cffT.decompile(cffData, TTFont())
+    _otf2ttfWorkerState["charStrings"] = list(cffT.cff.values())[0].CharStrings
+    _otf2ttfWorkerState["maxErr"] = maxErr
+    _otf2ttfWorkerState["reverseDirection"] = reverseDirection
+    _otf2ttfWorkerState["vectorize"] = vectorize
+    return
+
 
+def _otf2ttfWorkerConvert(glyphNames):
+    charStrings = _otf2ttfWorkerState["charStrings"]
+    maxErr = _otf2ttfWorkerState["maxErr"]
+    reverseDirection = _otf2ttfWorkerState["reverseDirection"]
+    vectorize = _otf2ttfWorkerState["vectorize"]
+    results = []
+    # CFF glyphs have no components to decompose, so no glyph set is needed.
+    glyphs = [(glyphName, charStrings[glyphName]) for glyphName in glyphNames]
+    for glyphName, glyph in _otf2ttfDrawGlyphs(glyphs, maxErr, reverseDirection, vectorize):
+        # Bounding boxes are recalculated upon save anyway.
+        results.append((glyphName, glyph.compile(None, recalcBBoxes = True)))
+    return results
@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+from __future__ import print_function, division, absolute_import
+import array
+import os.path
+import sys
+from itertools import chain
+
+dependencyDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../Dep")
+sys.path.insert(0, dependencyDir)
+
+from fontTools.misc.py23 import basestring
+from fontTools.misc.psCharStrings import calcSubrBias
+from fontTools.ttLib.tables.ttProgram import Program
+from fontTools.ttLib.tables._g_l_y_f import Glyph, GlyphCoordinates
+from cu2qu import curve_to_quadratic, MAX_N
+from cu2qu.batch import batch_curve_to_quadratic
+
+
+# The flags of the points following the start point of a quadratic spline, by the spline's length.
+_SPLINE_FLAGS = [[0] * (length - 2) + [1] for length in range(MAX_N + 3)]
+
+
+# Raised for outlines which are left to the pens, e.g. `seac` accented glyphs.
+class UnsupportedOutline(Exception):
+    pass
+
+
+# Returns the value of a RecordingPen which the Type 2 charstring would be drawn onto, i.e. the same
+# moveTo, lineTo, curveTo and closePath calls as T2OutlineExtractor makes, with the same numbers.
+# Subroutines are called with a stack of token iterators instead of recursion; the hint mask bytes
+# following `hintmask` and `cntrmask` in the decompiled programs are skipped, as hints are not
+# needed. Raises UnsupportedOutline for `seac` and arithmetic operators, among others.
+def recordCharString(charString):
+    if charString.needsDecompilation():
+        try:
+            charString.decompile()
+        except NotImplementedError:
+            raise UnsupportedOutline("arithmetic operator")
+    localSubrs = getattr(charString.private, "Subrs", [])
+    globalSubrs = charString.globalSubrs
+    localBias = calcSubrBias(localSubrs)
+    globalBias = calcSubrBias(globalSubrs)
+    value = []
+    sawMoveTo = False
+    x = y = 0
+    stack = []
+    gotWidth = False  # Whether the width has been popped, if there is one
+    hintMasked = False
+    callStack = []
+    tokens = iter(charString.program)
+    while True:
+        for token in tokens:
+            if not isinstance(token, basestring):
+                stack.append(token)
+                continue
+
+            # Operators drawing lines and curves give their relative points as `deltas`.
+            if token == "rrcurveto":
+                deltas = [stack[i:i+6] for i in range(0, len(stack), 6)]
+            elif token == "rlineto":
+                deltas = [stack[i:i+2] for i in range(0, len(stack), 2)]
+            elif token == "hlineto" or token == "vlineto":
+                isHorizontal = token == "hlineto"
+                deltas = []
+                for arg in stack:
+                    deltas.append((arg, 0) if isHorizontal else (0, arg))
+                    isHorizontal = not isHorizontal
+            elif token == "hvcurveto" or token == "vhcurveto":
+                deltas = _alternatingCurves(stack, token == "hvcurveto")
+            elif token == "callsubr" or token == "callgsubr":
+                if token == "callsubr":
+                    subr = localSubrs[stack.pop() + localBias]
+                else:
+                    subr = globalSubrs[stack.pop() + globalBias]
+                if subr.program is None:
+                    raise UnsupportedOutline("subroutine not decompiled")
+                callStack.append(tokens)
+                tokens = iter(subr.program)
+                break
+            elif token == "return":
+                tokens = callStack.pop()
+                break
+            elif token == "rmoveto" or token == "hmoveto" or token == "vmoveto":
+                if sawMoveTo:
+                    value.append(("closePath", ()))
+                if not gotWidth:
+                    if len(stack) % 2 == (1 if token == "rmoveto" else 0):
+                        del stack[0]
+                    gotWidth = True
+                if token == "rmoveto":
+                    dx, dy = stack[0], stack[1]
+                elif token == "hmoveto":
+                    dx, dy = stack[0], 0
+                else:
+                    dx, dy = 0, stack[0]
+                point = x, y = x + dx, y + dy
+                value.append(("moveTo", (point,)))
+                sawMoveTo = True
+                del stack[:]
+                continue
+            elif token in ("hstem", "vstem", "hstemhm", "vstemhm", "hintmask", "cntrmask"):
+                if token == "hintmask" or token == "cntrmask":
+                    next(tokens)
+                    if hintMasked:
+                        continue  # Only the first mask takes the remaining vstem hints.
+                    hintMasked = True
+                gotWidth = True
+                del stack[:]
+                continue
+            elif token == "rcurveline":
+                deltas = [stack[i:i+6] for i in range(0, len(stack) - 2, 6)] + [stack[-2:]]
+            elif token == "rlinecurve":
+                lineArgs = stack[:-6]
+                deltas = [lineArgs[i:i+2] for i in range(0, len(lineArgs), 2)] + [stack[-6:]]
+            elif token == "vvcurveto" or token == "hhcurveto":
+                d1 = 0
+                if len(stack) % 2:
+                    d1 = stack.pop(0)
+                deltas = []
+                for i in range(0, len(stack), 4):
+                    da, dxb, dyb, dc = stack[i:i+4]
+                    if token == "vvcurveto":
+                        deltas.append((d1, da, dxb, dyb, 0, dc))
+                    else:
+                        deltas.append((da, d1, dxb, dyb, dc, 0))
+                    d1 = 0
+            elif token == "flex":
+                dx1, dy1, dx2, dy2, dx3, dy3, dx4, dy4, dx5, dy5, dx6, dy6, fd = stack
+                deltas = [(dx1, dy1, dx2, dy2, dx3, dy3), (dx4, dy4, dx5, dy5, dx6, dy6)]
+            elif token == "hflex":
+                dx1, dx2, dy2, dx3, dx4, dx5, dx6 = stack
+                deltas = [(dx1, 0, dx2, dy2, dx3, 0), (dx4, 0, dx5, -dy2, dx6, 0)]
+            elif token == "hflex1":
+                dx1, dy1, dx2, dy2, dx3, dx4, dx5, dy5, dx6 = stack
+                deltas = [(dx1, dy1, dx2, dy2, dx3, 0), (dx4, 0, dx5, dy5, dx6, -(dy1 + dy2 + dy5))]
+            elif token == "flex1":
+                dx1, dy1, dx2, dy2, dx3, dy3, dx4, dy4, dx5, dy5, d6 = stack
+                dx = dx1 + dx2 + dx3 + dx4 + dx5
+                dy = dy1 + dy2 + dy3 + dy4 + dy5
+                if abs(dx) > abs(dy):
+                    dx6, dy6 = d6, -dy
+                else:
+                    dx6, dy6 = -dx, d6
+                deltas = [(dx1, dy1, dx2, dy2, dx3, dy3), (dx4, dy4, dx5, dy5, dx6, dy6)]
+            elif token == "endchar":
+                if sawMoveTo:
+                    value.append(("closePath", ()))
+                if not gotWidth and len(stack) % 2:
+                    del stack[0]
+                if stack:
+                    raise UnsupportedOutline("seac")
+                return value
+            else:
+                raise UnsupportedOutline(token)
+            del stack[:]
+
+            for delta in deltas:
+                if not sawMoveTo:
+                    # Like T2OutlineExtractor, move to the current point first.
+                    x, y = x + 0, y + 0
+                    value.append(("moveTo", ((x, y),)))
+                    sawMoveTo = True
+                if len(delta) == 6:
+                    dxa, dya, dxb, dyb, dxc, dyc = delta
+                    point1 = x, y = x + dxa, y + dya
+                    point2 = x, y = x + dxb, y + dyb
+                    point3 = x, y = x + dxc, y + dyc
+                    value.append(("curveTo", (point1, point2, point3)))
+                elif len(delta) == 2:
+                    dx, dy = delta
+                    point = x, y = x + dx, y + dy
+                    value.append(("lineTo", (point,)))
+                else:
+                    raise UnsupportedOutline("malformed %s" % token)
+        else:
+            # A subroutine may end without `return`.
+            if not callStack:
+                raise UnsupportedOutline("no endchar")
+            tokens = callStack.pop()
+
+
+# The arguments of `hvcurveto` and `vhcurveto`, whose curves start horizontally and
+# vertically by turns, given as relative points of rrcurveto.
+def _alternatingCurves(args, isHorizontal):
+    deltas = []
+    while args:
+        d1, dxb, dyb, d3 = args[:4]
+        args = args[4:]
+        dLast = 0
+        if len(args) == 1:
+            dLast = args[0]
+            args = []
+        if isHorizontal:
+            deltas.append((d1, 0, dxb, dyb, dLast, d3))
+        else:
+            deltas.append((0, d1, dxb, dyb, d3, dLast))
+        isHorizontal = not isHorizontal
+    return deltas
+
+
+# Converts CFF glyphs into quadratic `glyf` glyphs without the pen protocol.
+# Outlines recorded from Type 2 charstrings are read into contours of lines and cubic curves,
+# whose points are plain tuples. The curves of all glyphs added are then approximated by cu2qu
+# at once, and the glyphs are built right from the spline points.
+# The glyphs are the same, point for point, as Cu2QuPen drawing onto TTGlyphPen gives.
+# Glyphs that cannot be converted this way are listed in `unsupported` instead.
+class CharStringConverter(object):
+
+    def __init__(self, maxErr, reverseDirection = True, vectorize = False):
+        self.maxErr = maxErr
+        self.reverseDirection = reverseDirection
+        self.vectorize = vectorize
+        self.unsupported = []
+        self.__glyphs = []  # [(glyph name, contours)]
+        self.__curves = []  # [(p0, p1, p2, p3)] of all glyphs
+
+    def addCharString(self, glyphName, charString):
+        try:
+            value = recordCharString(charString)
+        except UnsupportedOutline:
+            self.unsupported.append(glyphName)
+            return
+        self.addRecording(glyphName, value)
+        return
+
+    # `value` is that of a RecordingPen which a CFF glyph has been drawn onto.
+    def addRecording(self, glyphName, value):
+        try:
+            contours = self.__readRecording(value)
+        except UnsupportedOutline:
+            self.unsupported.append(glyphName)
+            return
+        self.__glyphs.append((glyphName, contours))
+        return
+
+    # Returns the (name, quadratic glyph) pairs of the glyphs added, except unsupported ones.
+    def glyphs(self):
+        if self.vectorize:
+            splines = batch_curve_to_quadratic(self.__curves, self.maxErr)
+        else:
+            maxErr = self.maxErr
+            splines = [curve_to_quadratic(curve, maxErr) for curve in self.__curves]
+        return [(glyphName, self.__makeGlyph(contours, splines)) for glyphName, contours in self.__glyphs]
+
+    # A contour is a list of its start point, followed by the end points of lines
+    # and the indices of curves in self.__curves, as in [(x, y), (x, y), 0, 1, (x, y)].
+
+    def __readRecording(self, value):
+        curves = self.__curves
+        contours = []
+        segments = None
+        for operator, operands in value:
+            if operator == "curveTo" and len(operands) == 3 and segments is not None:
+                curves.append((current,) + tuple(operands))
+                segments.append(len(curves) - 1)
+                current = operands[-1]
+            elif operator == "lineTo" and segments is not None:
+                current, = operands
+                segments.append(current)
+            elif operator == "moveTo" and segments is None:
+                current, = operands
+                segments = [current]
+                contours.append(segments)
+            elif operator == "closePath" and segments is not None:
+                segments = None
+            else:
+                raise UnsupportedOutline(operator)
+        if segments is not None:
+            raise UnsupportedOutline("open contour")
+        return contours
+
+    # ---- Glyphs ----
+
+    def __makeGlyph(self, contours, splines):
+        reverseDirection = self.reverseDirection
+        points = []
+        flags = []
+        endPts = []
+        for segments in contours:
+            start = len(points)
+            points.append(segments[0])
+            flags.append(1)
+            for segment in segments[1:]:
+                if segment.__class__ is int:
+                    spline = splines[segment]
+                    points.extend(spline[1:])
+                    flags.extend(_SPLINE_FLAGS[len(spline)])
+                else:
+                    points.append(segment)
+                    flags.append(1)
+            if reverseDirection:
+                startsWithLine = len(segments) > 1 and segments[1].__class__ is not int
+                self.__reverseContour(points, flags, start, startsWithLine)
+            elif len(points) - start == 1:
+                # TTGlyphPen drops lone points, and the last point of closed contours.
+                del points[start:], flags[start:]
+            elif points[start] == points[-1]:
+                del points[-1], flags[-1]
+            if len(points) > start:
+                endPts.append(len(points) - 1)
+
+        glyph = Glyph()
+        glyph.coordinates = GlyphCoordinates(typecode = "d")
+        glyph.coordinates.array.extend(array.array("d", chain.from_iterable(points)))
+        glyph.endPtsOfContours = endPts
+        glyph.flags = array.array("B", flags)
+        glyph.numberOfContours = len(endPts)
+        glyph.program = Program()
+        glyph.program.fromBytecode(b"")
+        return glyph
+
+    # Reverses the closed contour from `start` to the end of `points` in place, keeping its start point,
+    # as ReverseContourPen does before TTGlyphPen: the last point is dropped if it is the start point
+    # again, then the others are reversed. When the contour starts with a line, whose end point comes
+    # last now, that point is dropped as well if it is the start point again. Lone points are dropped.
+    def __reverseContour(self, points, flags, start, startsWithLine):
+        if len(points) - start > 1 and points[start] == points[-1]:
+            del points[-1], flags[-1]
+        if len(points) - start == 1:
+            del points[start:], flags[start:]
+            return
+        points[start+1:] = points[:start:-1]
+        flags[start+1:] = flags[:start:-1]
+        if startsWithLine and points[-1] == points[start]:
+            del points[-1], flags[-1]
+        return
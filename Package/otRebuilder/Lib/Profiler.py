@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+from __future__ import print_function, division, absolute_import
+import os.path
+import sys
+
+dependencyDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../Dep")
+sys.path.insert(0, dependencyDir)
+
+import contextlib
+import functools
+import inspect
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from fontTools.ttLib import TTFont
+
+
+# Peak resident set size of this process so far, in KiB, or None if unknown.
+def getMaxRSS():
+    if resource is None:
+        return None
+    maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":  # Measured in bytes instead of KiB
+        maxRSS //= 1024
+    return maxRSS
+
+
+# Records wall time and peak memory of otrebuild stages and worker methods,
+# as well as the time spent on decompiling and compiling each font table.
+# The peak is that of the whole process so far: maxRSS is the peak at the end of
+# a stage, and maxRSSGrowth how much the stage raised it, which is 0 for a stage
+# staying below an earlier peak. Child processes, such as --saveWorkers, are
+# left out of both the memory and the table times.
+class Profiler(object):
+
+    def __init__(self):
+        self.stages = []
+        self.methods = []
+        self.tables = {}
+        self.__tableTimes = []  # Stack of time spent in nested table loads
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        with self.__measure(self.stages, name):
+            yield
+
+    # Times all public methods of a Worker object. Returns the object itself.
+    def instrument(self, workerObj):
+        className = workerObj.__class__.__name__
+        for methodName, method in inspect.getmembers(workerObj, inspect.ismethod):
+            if methodName.startswith("_"):
+                continue
+            setattr(workerObj, methodName, self.__wrapMethod(className + "." + methodName, method))
+        return workerObj
+
+    # Returns a TTFont subclass which reports its table decompiles and compiles.
+    def getTTFontClass(self):
+        profiler = self
+
+        class ProfiledTTFont(TTFont):
+
+            def __getitem__(self, tag):
+                if tag in self.tables:
+                    return TTFont.__getitem__(self, tag)
+                return profiler.timeTable(tag, "decompile", TTFont.__getitem__, self, tag)
+
+            def getTableData(self, tag):
+                if self.isLoaded(tag):
+                    return profiler.timeCompile(self, tag, TTFont.getTableData)
+                return TTFont.getTableData(self, tag)
+
+            def getTableChunks(self, tag):
+                if self.isLoaded(tag):
+                    return profiler.timeCompile(self, tag, TTFont.getTableChunks)
+                return TTFont.getTableChunks(self, tag)
+
+        return ProfiledTTFont
+
+    # Tables may load other tables, e.g. `glyf` loads `loca`; only the exclusive time is counted.
+    def timeTable(self, tag, action, function, *args):
+        startTime = time.time()
+        self.__tableTimes.append(0.0)
+        succeeded = False
+        try:
+            result = function(*args)
+            succeeded = True
+            return result
+        finally:
+            elapsed = time.time() - startTime
+            nestedTime = self.__tableTimes.pop()
+            if self.__tableTimes:
+                self.__tableTimes[-1] += elapsed
+            if succeeded:  # Not for missing tables
+                times = self.tables.setdefault(str(tag), {})
+                times[action] = times.get(action, 0.0) + elapsed - nestedTime
+
+    # Also records how the offset overflows of GSUB, GPOS and the like were fixed.
+    def timeCompile(self, ttFont, tag, function):
+        result = self.timeTable(tag, "compile", function, ttFont, tag)
+        overflowStats = getattr(ttFont.tables[tag], "overflowStats", None)
+        if overflowStats and overflowStats["fixes"]:
+            self.tables[str(tag)]["overflowStats"] = dict(overflowStats)
+        return result
+
+    def getReport(self):
+        return {
+            "stages": self.stages,
+            "methods": self.methods,
+            "tables": self.tables,
+            "totalTime": sum(stage["time"] for stage in self.stages),
+            "maxRSS": getMaxRSS(),
+            }
+
+    def __wrapMethod(self, name, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with self.__measure(self.methods, name):
+                return method(*args, **kwargs)
+        return wrapper
+
+    @contextlib.contextmanager
+    def __measure(self, records, name):
+        record = {"name": name}
+        records.append(record)
+        startRSS = getMaxRSS()
+        startTime = time.time()
+        try:
+            yield
+        finally:
+            record["time"] = time.time() - startTime
+            record["maxRSS"] = getMaxRSS()
+            if startRSS is None:
+                record["maxRSSGrowth"] = None
+            else:
+                record["maxRSSGrowth"] = record["maxRSS"] - startRSS
+
+
+# Stands in for Profiler when profiling is off.
+class NullProfiler(object):
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        yield
+
+    def instrument(self, workerObj):
+        return workerObj
+
+    def getTTFontClass(self):
+        return TTFont
+
+    def getReport(self):
+        return None
@@ -0,0 +1,575 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+from __future__ import print_function, division, absolute_import
+import os.path
+import struct
+import sys
+
+dependencyDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../Dep")
+sys.path.insert(0, dependencyDir)
+
+from fontTools.misc.py23 import basestring
+from fontTools.ttLib.tables.otBase import OTTableReader
+
+
+# Bits of ValueFormat for XPlacement, YPlacement, XAdvance and YAdvance;
+# the device table offsets follow them, and are left as they are.
+VALUE_FORMAT_COORDS = (0x0001, 0x0002, 0x0004, 0x0008)
+VALUE_FORMAT_DEVICES = (0x0010, 0x0020, 0x0040, 0x0080)
+MATH_CONSTANTS_VALUE_COUNT = 51  # MathValueRecords from MathLeading to RadicalKernAfterDegree
+
+# Charstring operands are scaled along the x or y positions of the points they move,
+# or on their own (e.g. operands left on the stack for a subroutine), or not at all.
+AXIS_X, AXIS_Y, AXIS_FREE, AXIS_NONE = range(4)
+# The first of these operators in a charstring has a width operand if its operand count has this parity.
+WIDTH_OPERAND_PARITIES = {
+    "hstem": 1, "hstemhm": 1, "vstem": 1, "vstemhm": 1, "hintmask": 1, "cntrmask": 1,
+    "rmoveto": 1, "hmoveto": 0, "vmoveto": 0, "endchar": 1,
+    }
+STEM_OPERATORS = ("hstem", "hstemhm", "vstem", "vstemhm", "hintmask", "cntrmask")
+ARITHMETIC_OPERATORS = (
+    "and", "or", "not", "store", "abs", "add", "sub", "div", "load", "neg", "eq", "drop",
+    "put", "get", "ifelse", "random", "mul", "sqrt", "dup", "exch", "index", "roll",
+    )
+GHOST_HINT_WIDTHS = (-20, -21)
+# Dict values in design units; BlueScale is not one.
+CFF_TOP_DICT_VALUES = ("FontBBox", "UnderlinePosition", "UnderlineThickness", "StrokeWidth")
+CFF_PRIVATE_DICT_VALUES = (
+    "BlueValues", "OtherBlues", "FamilyBlues", "FamilyOtherBlues", "BlueShift", "BlueFuzz",
+    "StdHW", "StdVW", "StemSnapH", "StemSnapV", "defaultWidthX", "nominalWidthX",
+    )
+
+
+# Scales the design units of a `BASE`, `GPOS`, `JSTF` or `MATH` table in a copy of its binary data.
+# It follows the offsets with OTTableReader and rewrites the coordinate fields in place,
+# so the layout of the table, including the subtables shared by several offsets, stays
+# the same and there is nothing to compile again.
+# Values are rounded like int(round(value * scaleFactor)) just as before.
+class LayoutScaler(object):
+
+    def __init__(self, data, tableTag, scaleFactor):
+        self.tableTag = tableTag
+        self.scaleFactor = scaleFactor
+        self.reader = OTTableReader(data, tableTag = tableTag)
+        self.data = bytearray(data)
+        self.__visited = set()  # (kind, position) of the tables walked so far
+
+    def scale(self):
+        if self.tableTag == "GPOS":
+            self.__scaleGPOS(0)
+        elif self.tableTag == "BASE":
+            self.__scaleBASE(0)
+        elif self.tableTag == "JSTF":
+            self.__scaleJSTF(0)
+        elif self.tableTag == "MATH":
+            self.__scaleMATH(0)
+        else:
+            raise ValueError("Unsupported table: %s" % self.tableTag)
+        return bytes(self.data)
+
+    # ---- Reading and writing ----
+
+    def __readUShort(self, pos):
+        self.reader.seek(pos)
+        return self.reader.readUShort()
+
+    # Returns the absolute position of the table at `base` + offset, or None for a NULL offset.
+    def __readOffset(self, base, pos):
+        offset = self.__readUShort(pos)
+        if not offset:
+            return None
+        return base + offset
+
+    def __readLOffset(self, base, pos):
+        self.reader.seek(pos)
+        offset = self.reader.readULong()
+        if not offset:
+            return None
+        return base + offset
+
+    # Returns True only the first time a table is met, so that shared tables are walked once.
+    # Walking them again would do no harm, as values are always read from the original data.
+    def __visit(self, kind, pos):
+        if pos is None or (kind, pos) in self.__visited:
+            return False
+        self.__visited.add((kind, pos))
+        return True
+
+    def __scaleValue(self, pos, fmt):
+        self.reader.seek(pos)
+        value = self.reader.readShort() if fmt == ">h" else self.reader.readUShort()
+        if value:
+            struct.pack_into(fmt, self.data, pos, int(round(value * self.scaleFactor)))
+        return
+
+    def __scaleShort(self, pos):
+        self.__scaleValue(pos, ">h")
+        return
+
+    def __scaleUShort(self, pos):
+        self.__scaleValue(pos, ">H")
+        return
+
+    # ---- GPOS ----
+
+    def __scaleGPOS(self, pos):
+        lookupList = self.__readOffset(pos, pos + 8)
+        if lookupList is None:
+            return
+        lookupCount = self.__readUShort(lookupList)
+        for i in range(lookupCount):
+            self.__scaleLookup(self.__readOffset(lookupList, lookupList + 2 + i * 2))
+        return
+
+    def __scaleLookup(self, pos):
+        if not self.__visit("Lookup", pos):
+            return
+        lookupType = self.__readUShort(pos)
+        subTableCount = self.__readUShort(pos + 4)
+        for i in range(subTableCount):
+            self.__scaleSubTable(lookupType, self.__readOffset(pos, pos + 6 + i * 2))
+        return
+
+    def __scaleSubTable(self, lookupType, pos):
+        if not self.__visit(("SubTable", lookupType), pos):
+            return
+        fmt = self.__readUShort(pos)
+        if lookupType == 1:  # SinglePos, format 1, 2
+            valueFormat = self.__readUShort(pos + 4)
+            if fmt == 1:
+                self.__scaleValueRecords(pos + 6, valueFormat, 1)
+            elif fmt == 2:
+                self.__scaleValueRecords(pos + 8, valueFormat, self.__readUShort(pos + 6))
+        elif lookupType == 2:  # PairPos, format 1, 2
+            valueFormat1 = self.__readUShort(pos + 4)
+            valueFormat2 = self.__readUShort(pos + 6)
+            size1 = self.__getValueRecordSize(valueFormat1)
+            size2 = self.__getValueRecordSize(valueFormat2)
+            if fmt == 1:  # PairSet[].PairValueRecord[]
+                for i in range(self.__readUShort(pos + 8)):
+                    pairSet = self.__readOffset(pos, pos + 10 + i * 2)
+                    if not self.__visit("PairSet", pairSet):
+                        continue
+                    recordPos = pairSet + 2
+                    for j in range(self.__readUShort(pairSet)):
+                        recordPos += 2  # SecondGlyph
+                        self.__scaleValueRecords(recordPos, valueFormat1, 1)
+                        self.__scaleValueRecords(recordPos + size1, valueFormat2, 1)
+                        recordPos += size1 + size2
+            elif fmt == 2:  # Class1Record[].Class2Record[]
+                recordCount = self.__readUShort(pos + 12) * self.__readUShort(pos + 14)
+                recordPos = pos + 16
+                for i in range(recordCount):
+                    self.__scaleValueRecords(recordPos, valueFormat1, 1)
+                    self.__scaleValueRecords(recordPos + size1, valueFormat2, 1)
+                    recordPos += size1 + size2
+        elif lookupType == 3:  # CursivePos, format 1
+            if fmt == 1:  # EntryExitRecord[]
+                for i in range(self.__readUShort(pos + 4)):
+                    self.__scaleAnchor(self.__readOffset(pos, pos + 6 + i * 4))
+                    self.__scaleAnchor(self.__readOffset(pos, pos + 8 + i * 4))
+        elif lookupType in (4, 5, 6):  # MarkBasePos, MarkLigPos, MarkMarkPos, format 1
+            if fmt == 1:
+                classCount = self.__readUShort(pos + 6)
+                self.__scaleMarkArray(self.__readOffset(pos, pos + 8))
+                if lookupType == 5:
+                    self.__scaleLigatureArray(self.__readOffset(pos, pos + 10), classCount)
+                else:  # BaseArray and Mark2Array are the same
+                    self.__scaleAnchorMatrix(self.__readOffset(pos, pos + 10), classCount)
+        elif lookupType in (7, 8):  # ContextPos, ChainContextPos
+            pass  # It will eventually reference to another lookup, type 1-6.
+        elif lookupType == 9:  # ExtensionPos, format 1
+            if fmt == 1:
+                self.__scaleSubTable(self.__readUShort(pos + 2), self.__readLOffset(pos, pos + 4))
+        else:
+            pass
+        return
+
+    def __getValueRecordSize(self, valueFormat):
+        return 2 * sum(1 for bit in VALUE_FORMAT_COORDS + VALUE_FORMAT_DEVICES if valueFormat & bit)
+
+    def __scaleValueRecords(self, pos, valueFormat, count):
+        if not valueFormat & 0x000F:
+            return
+        fieldPositions = []
+        size = 0
+        for bit in VALUE_FORMAT_COORDS:
+            if valueFormat & bit:
+                fieldPositions.append(size)
+                size += 2
+        size = self.__getValueRecordSize(valueFormat)
+        for i in range(count):
+            for fieldPos in fieldPositions:
+                self.__scaleShort(pos + fieldPos)
+            pos += size
+        return
+
+    def __scaleAnchor(self, pos):
+        if not self.__visit("Anchor", pos):
+            return
+        # All formats begin with XCoordinate and YCoordinate.
+        # Device tables of format 3 and contour points of format 2 are left as they are.
+        self.__scaleShort(pos + 2)
+        self.__scaleShort(pos + 4)
+        return
+
+    def __scaleMarkArray(self, pos):
+        if not self.__visit("MarkArray", pos):
+            return
+        for i in range(self.__readUShort(pos)):
+            self.__scaleAnchor(self.__readOffset(pos, pos + 4 + i * 4))
+        return
+
+    # BaseArray, Mark2Array and LigatureAttach: records of `classCount` anchor offsets
+    def __scaleAnchorMatrix(self, pos, classCount):
+        if not self.__visit(("AnchorMatrix", classCount), pos):
+            return
+        for i in range(self.__readUShort(pos) * classCount):
+            self.__scaleAnchor(self.__readOffset(pos, pos + 2 + i * 2))
+        return
+
+    def __scaleLigatureArray(self, pos, classCount):
+        if not self.__visit("LigatureArray", pos):
+            return
+        for i in range(self.__readUShort(pos)):
+            self.__scaleAnchorMatrix(self.__readOffset(pos, pos + 2 + i * 2), classCount)
+        return
+
+    # ---- BASE ----
+
+    def __scaleBASE(self, pos):
+        self.__scaleBASEaxis(self.__readOffset(pos, pos + 4))  # HorizAxis
+        self.__scaleBASEaxis(self.__readOffset(pos, pos + 6))  # VertAxis
+        return
+
+    def __scaleBASEaxis(self, pos):
+        if pos is None:  # Axis might be NULL
+            return
+        scriptList = self.__readOffset(pos, pos + 2)
+        if scriptList is None:
+            return
+        for i in range(self.__readUShort(scriptList)):
+            script = self.__readOffset(scriptList, scriptList + 2 + i * 6 + 4)
+            if not self.__visit("BaseScript", script):
+                continue
+            baseValues = self.__readOffset(script, script)
+            if self.__visit("BaseValues", baseValues):
+                for j in range(self.__readUShort(baseValues + 2)):
+                    self.__scaleBaseCoord(self.__readOffset(baseValues, baseValues + 4 + j * 2))
+            self.__scaleMinMax(self.__readOffset(script, script + 2))  # DefaultMinMax
+            for j in range(self.__readUShort(script + 4)):  # BaseLangSysRecord[].MinMax
+                self.__scaleMinMax(self.__readOffset(script, script + 6 + j * 6 + 4))
+        return
+
+    def __scaleMinMax(self, pos):
+        if not self.__visit("MinMax", pos):
+            return
+        self.__scaleBaseCoord(self.__readOffset(pos, pos))
+        self.__scaleBaseCoord(self.__readOffset(pos, pos + 2))
+        for i in range(self.__readUShort(pos + 4)):  # FeatMinMaxRecord[]
+            recordPos = pos + 6 + i * 8
+            self.__scaleBaseCoord(self.__readOffset(pos, recordPos + 4))
+            self.__scaleBaseCoord(self.__readOffset(pos, recordPos + 6))
+        return
+
+    def __scaleBaseCoord(self, pos):
+        if not self.__visit("BaseCoord", pos):
+            return
+        self.__scaleShort(pos + 2)  # Coordinate, in all formats
+        return
+
+    # ---- JSTF ----
+
+    def __scaleJSTF(self, pos):
+        for i in range(self.__readUShort(pos + 4)):
+            script = self.__readOffset(pos, pos + 6 + i * 6 + 4)
+            if not self.__visit("JstfScript", script):
+                continue
+            self.__scaleJstfLangSys(self.__readOffset(script, script + 2))  # DefJstfLangSys
+            for j in range(self.__readUShort(script + 4)):
+                self.__scaleJstfLangSys(self.__readOffset(script, script + 6 + j * 6 + 4))
+        return
+
+    def __scaleJstfLangSys(self, pos):
+        if not self.__visit("JstfLangSys", pos):
+            return
+        for i in range(self.__readUShort(pos)):
+            priority = self.__readOffset(pos, pos + 2 + i * 2)
+            if not self.__visit("JstfPriority", priority):
+                continue
+            # Other offsets are just references to `GSUB` or `GPOS` lookups.
+            self.__scaleJstfMax(self.__readOffset(priority, priority + 8))  # ShrinkageJstfMax
+            self.__scaleJstfMax(self.__readOffset(priority, priority + 18))  # ExtensionJstfMax
+        return
+
+    def __scaleJstfMax(self, pos):
+        if not self.__visit("JstfMax", pos):
+            return
+        for i in range(self.__readUShort(pos)):
+            self.__scaleLookup(self.__readOffset(pos, pos + 2 + i * 2))
+        return
+
+    # ---- MATH ----
+
+    def __scaleMATH(self, pos):
+        self.__scaleMathConstants(self.__readOffset(pos, pos + 4))
+        self.__scaleMathGlyphInfo(self.__readOffset(pos, pos + 6))
+        self.__scaleMathVariants(self.__readOffset(pos, pos + 8))
+        return
+
+    # MathValueRecord: Value followed by an offset to its device table
+    def __scaleMathValueRecords(self, pos, count):
+        for i in range(count):
+            self.__scaleShort(pos + i * 4)
+        return
+
+    def __scaleMathConstants(self, pos):
+        if pos is None:
+            return
+        # ScriptPercentScaleDown, ScriptScriptPercentScaleDown and RadicalDegreeBottomRaisePercent are percentages.
+        self.__scaleUShort(pos + 4)  # DelimitedSubFormulaMinHeight
+        self.__scaleUShort(pos + 6)  # DisplayOperatorMinHeight
+        self.__scaleMathValueRecords(pos + 8, MATH_CONSTANTS_VALUE_COUNT)
+        return
+
+    def __scaleMathGlyphInfo(self, pos):
+        if pos is None:
+            return
+        # MathItalicsCorrectionInfo and MathTopAccentAttachment are the same
+        for infoPos in (pos, pos + 2):
+            info = self.__readOffset(pos, infoPos)
+            if self.__visit("MathValueRecordList", info):
+                self.__scaleMathValueRecords(info + 4, self.__readUShort(info + 2))
+        kernInfo = self.__readOffset(pos, pos + 6)
+        if kernInfo is not None:
+            # MathKernInfoRecord[]: offsets to the MathKern tables of the four corners
+            for i in range(self.__readUShort(kernInfo + 2) * 4):
+                kern = self.__readOffset(kernInfo, kernInfo + 4 + i * 2)
+                if self.__visit("MathKern", kern):
+                    # CorrectionHeight[HeightCount] and KernValue[HeightCount + 1]
+                    self.__scaleMathValueRecords(kern + 2, self.__readUShort(kern) * 2 + 1)
+        return
+
+    def __scaleMathVariants(self, pos):
+        if pos is None:
+            return
+        self.__scaleUShort(pos)  # MinConnectorOverlap
+        constructionCount = self.__readUShort(pos + 6) + self.__readUShort(pos + 8)
+        for i in range(constructionCount):
+            construction = self.__readOffset(pos, pos + 10 + i * 2)
+            if not self.__visit("MathGlyphConstruction", construction):
+                continue
+            self.__scaleGlyphAssembly(self.__readOffset(construction, construction))
+            for j in range(self.__readUShort(construction + 2)):
+                self.__scaleUShort(construction + 4 + j * 4 + 2)  # AdvanceMeasurement
+        return
+
+    def __scaleGlyphAssembly(self, pos):
+        if not self.__visit("GlyphAssembly", pos):
+            return
+        self.__scaleMathValueRecords(pos, 1)  # ItalicsCorrection
+        for i in range(self.__readUShort(pos + 4)):
+            recordPos = pos + 6 + i * 10
+            self.__scaleUShort(recordPos + 2)  # StartConnectorLength
+            self.__scaleUShort(recordPos + 4)  # EndConnectorLength
+            self.__scaleUShort(recordPos + 6)  # FullAdvance
+        return
+
+
+# Scales the glyphs of a `CFF ` table by rewriting the operands of their decompiled charstrings,
+# and of the subroutines, which stay shared instead of being expanded into every glyph.
+# The positions of points and stem edges are rounded like int(round(value * scaleFactor)),
+# rather than the deltas between them, so that contours still close onto their start points.
+# Subroutines are scaled once each, from their own origin, as they are drawn at many places.
+# Charstrings using arithmetic operators cannot be scaled so, and raise ValueError before
+# anything is changed.
+class CFFScaler(object):
+
+    def __init__(self, cff, scaleFactor):
+        self.cff = cff
+        self.scaleFactor = scaleFactor
+
+    def scale(self):
+        programs = []
+        privates = []
+        for topDict in self.cff.topDictIndex:
+            charStrings = [topDict.CharStrings[glyphName] for glyphName in topDict.CharStrings.keys()]
+            for charString in charStrings:  # Also decompiles the subroutines they call
+                try:
+                    charString.decompile()
+                except NotImplementedError:  # Arithmetic operators
+                    raise ValueError("Unsupported charstring operator")
+            for charString in charStrings:
+                programs.append((charString, self.__scaleProgram(charString.program, charString.private)))
+            if hasattr(topDict, "FDArray"):
+                privates.extend(fontDict.Private for fontDict in topDict.FDArray)
+            else:
+                privates.append(topDict.Private)
+        privates = list(dict((id(private), private) for private in privates).values())
+        subrs = {}
+        for subrsIndex in [self.cff.GlobalSubrs] + [getattr(private, "Subrs", []) for private in privates]:
+            for i in range(len(subrsIndex)):
+                subr = subrsIndex[i]
+                if not subr.needsDecompilation():  # Otherwise never called by any glyph
+                    subrs[id(subr)] = subr
+        for subr in subrs.values():
+            programs.append((subr, self.__scaleProgram(subr.program, None)))
+
+        # Nothing has been changed so far.
+        for charString, program in programs:
+            charString.program = program
+        for topDict in self.cff.topDictIndex:
+            # The matrix maps the scaled units onto the same em as before.
+            fontMatrix = topDict.FontMatrix
+            topDict.FontMatrix = [value / self.scaleFactor for value in fontMatrix[:4]] + list(fontMatrix[4:])
+            self.__scaleDict(topDict, CFF_TOP_DICT_VALUES)
+        for private in privates:
+            self.__scaleDict(private, CFF_PRIVATE_DICT_VALUES)
+        return
+
+    def __scaleValue(self, value):
+        return int(round(value * self.scaleFactor))
+
+    def __scaleDict(self, dictObj, names):
+        for name in names:
+            value = getattr(dictObj, name, None)
+            if value is None:
+                continue
+            if isinstance(value, list):
+                setattr(dictObj, name, [self.__scaleValue(v) for v in value])
+            else:
+                setattr(dictObj, name, self.__scaleValue(value))
+        return
+
+    # Returns the scaled copy of a program. `private` is given for charstrings, whose width
+    # operand, if any, is scaled to match `hmtx` and the new nominalWidthX.
+    def __scaleProgram(self, program, private):
+        scaled = []
+        operands = []
+        positions = [[0, 0], [0, 0]]  # Old and new x, y of the current point
+        hasWidth = private is not None
+        i = 0
+        while i < len(program):
+            token = program[i]
+            i += 1
+            if not isinstance(token, basestring):
+                operands.append(token)
+                continue
+            if hasWidth and token in WIDTH_OPERAND_PARITIES:
+                hasWidth = False
+                if len(operands) % 2 == WIDTH_OPERAND_PARITIES[token]:
+                    nominalWidthX = private.nominalWidthX
+                    scaled.append(self.__scaleValue(operands[0] + nominalWidthX) - self.__scaleValue(nominalWidthX))
+                    del operands[0]
+            token, operands = self.__scaleOperands(token, operands, positions)
+            scaled.extend(operands)
+            scaled.append(token)
+            if token in ("hintmask", "cntrmask"):
+                scaled.append(program[i])  # The mask
+                i += 1
+            operands = []
+        scaled.extend(self.__scaleAlong([AXIS_FREE] * len(operands), operands, positions))  # Left for the caller
+        return scaled
+
+    # Returns the operator, which only flex1 may change, and its scaled operands.
+    def __scaleOperands(self, token, operands, positions):
+        count = len(operands)
+        if token in STEM_OPERATORS and count % 2 == 0:
+            return token, self.__scaleStems(operands, token.startswith("h"))
+        elif token in ("rmoveto", "rlineto", "rrcurveto", "rcurveline", "rlinecurve") and count % 2 == 0:
+            axes = [AXIS_X, AXIS_Y] * (count // 2)
+        elif token in ("hmoveto", "vmoveto") and count == 1:
+            axes = [AXIS_X if token == "hmoveto" else AXIS_Y]
+        elif token in ("hlineto", "vlineto"):
+            axes = [AXIS_X, AXIS_Y] * (count // 2 + 1) if token == "hlineto" else [AXIS_Y, AXIS_X] * (count // 2 + 1)
+        elif token in ("hhcurveto", "vvcurveto") and count % 4 in (0, 1):
+            along, across = (AXIS_X, AXIS_Y) if token == "hhcurveto" else (AXIS_Y, AXIS_X)
+            axes = [across] * (count % 4) + [along, AXIS_X, AXIS_Y, along] * (count // 4)
+        elif token in ("hvcurveto", "vhcurveto") and count % 4 in (0, 1):
+            axes = _alternatingCurveAxes(count, token == "hvcurveto")
+        elif token in ("hflex", "hflex1", "flex1"):
+            return self.__scaleFlex(token, operands, positions)
+        elif token == "flex" and count == 13:
+            axes = [AXIS_X, AXIS_Y] * 6 + [AXIS_NONE]  # The flex depth
+        elif token in ("callsubr", "callgsubr") and count:
+            axes = [AXIS_FREE] * (count - 1) + [AXIS_NONE]  # The subroutine number
+        elif token == "endchar" and count == 4:  # seac: adx ady bchar achar
+            axes = [AXIS_FREE, AXIS_FREE, AXIS_NONE, AXIS_NONE]
+        elif token in ARITHMETIC_OPERATORS:
+            raise ValueError("Unsupported charstring operator: %s" % token)
+        else:
+            # Operands pushed by the caller of a subroutine are not all here.
+            axes = [AXIS_FREE] * count
+        return token, self.__scaleAlong(axes, operands, positions)
+
+    # Edges are given from 0 on, every operator anew, except the widths of ghost hints.
+    def __scaleStems(self, operands, isHorizontal):
+        scaled = []
+        old = new = 0
+        for j, value in enumerate(operands):
+            old += value
+            if j % 2 and isHorizontal and value in GHOST_HINT_WIDTHS:
+                delta = value
+            else:
+                delta = self.__scaleValue(old) - new
+            new += delta
+            scaled.append(delta)
+        return scaled
+
+    # Flexes end at the height they start at (flex1 either at the height or at the abscissa),
+    # which is implied rather than given.
+    def __scaleFlex(self, token, operands, positions):
+        count = len(operands)
+        if token == "hflex" and count == 7:
+            axes = [AXIS_X, AXIS_X, AXIS_Y, AXIS_X, AXIS_X, AXIS_X, AXIS_X]
+            returningAxis = AXIS_Y
+        elif token == "hflex1" and count == 9:
+            axes = [AXIS_X, AXIS_Y, AXIS_X, AXIS_Y, AXIS_X, AXIS_X, AXIS_X, AXIS_Y, AXIS_X]
+            returningAxis = AXIS_Y
+        elif token == "flex1" and count == 11:
+            isHorizontal = abs(sum(operands[0:10:2])) > abs(sum(operands[1:10:2]))
+            axes = [AXIS_X, AXIS_Y] * 5 + [AXIS_X if isHorizontal else AXIS_Y]
+            returningAxis = AXIS_Y if isHorizontal else AXIS_X
+        else:
+            return token, self.__scaleAlong([AXIS_FREE] * count, operands, positions)
+        start = list(positions[returningAxis])
+        scaled = self.__scaleAlong(axes, operands, positions)
+        if token == "flex1" and (abs(sum(scaled[0:10:2])) > abs(sum(scaled[1:10:2]))) != isHorizontal:
+            # Rounding has turned the flex the other way; give its last point in full instead.
+            back = start[1] - positions[returningAxis][1]
+            scaled[10:] = [scaled[10], back] if isHorizontal else [back, scaled[10]]
+            scaled.append(50)  # The flex depth implied by flex1
+            token = "flex"
+        positions[returningAxis] = start
+        return token, scaled
+
+    # Same as __scaleValue() for every operand, as this is where most of the time goes.
+    def __scaleAlong(self, axes, operands, positions):
+        scaleFactor = self.scaleFactor
+        scaled = []
+        for axis, value in zip(axes, operands):
+            if axis == AXIS_NONE:
+                scaled.append(value)
+            elif axis == AXIS_FREE:
+                scaled.append(int(round(value * scaleFactor)))
+            else:
+                position = positions[axis]
+                old = position[0] = position[0] + value
+                delta = int(round(old * scaleFactor)) - position[1]
+                position[1] += delta
+                scaled.append(delta)
+        return scaled
+
+
+# Axes of the operands of hvcurveto (or vhcurveto), whose curves start horizontally
+# (or vertically) and then vertically and horizontally by turns.
+def _alternatingCurveAxes(count, startsHorizontally):
+    axes = []
+    isHorizontal = startsHorizontally
+    for j in range(count // 4):
+        axes += [AXIS_X, AXIS_X, AXIS_Y, AXIS_Y] if isHorizontal else [AXIS_Y, AXIS_X, AXIS_Y, AXIS_X]
+        isHorizontal = not isHorizontal
+    if count % 4:  # The last point moves across as well
+        axes.append(AXIS_Y if isHorizontal else AXIS_X)
+    return axes
@@ -9,6 +9,7 @@ dependencyDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../De
 sys.path.insert(0, dependencyDir)
 
 from fontTools.ttLib.tables import _c_m_a_p
+from fontTools.ttLib.tables._h_m_t_x import GlyphMetrics
 from fontTools.ttLib.tables import _n_a_m_e
 
 from otRebuilder.Lib import Constants
@@ -48,15 +49,10 @@ class OS2f2Worker(Worker):
             return 0
         if isMonospaced:
             return hmtx.metrics["space"][0]
-        count = 0
-        sumWidth = 0
-        for glyfName in hmtx.metrics.keys():
-            # [0]: advance width; [1]: lsb
-            if hmtx.metrics[glyfName][0] == 0:
-                continue
-            else:            
-                sumWidth += hmtx.metrics[glyfName][0]
-                count += 1
+        metrics = hmtx.metrics
+        if not isinstance(metrics, GlyphMetrics):  # Built from scratch or from XML
+            metrics = GlyphMetrics.fromDict(metrics)
+        sumWidth, count = metrics.sumAdvances(skipZero = True)
         return sumWidth // count
 
 
@@ -112,11 +108,8 @@ class CmapWorker(Worker):
 
     @staticmethod
     def makeTruncatedDict(fullDict):
-        truncatedDict = {}
-        for code in fullDict.keys():
-            if (code < 0xD800) or (code > 0xDFFF and code < 0x10000):
-                truncatedDict[code] = fullDict[code]
-        return truncatedDict
+        # The cmap table compiles it from the sorted codes of fullDict, without sorting it again.
+        return {code: fullDict[code] for code in fullDict if code < 0xD800 or 0xDFFF < code < 0x10000}
 
     # It does not check whether the mappingDict size fits the corresponding subtable format.
     @staticmethod
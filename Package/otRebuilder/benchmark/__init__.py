@@ -0,0 +1,5 @@
+import os
+import sys
+
+dependencyDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../Dep")
+sys.path.insert(0, dependencyDir)
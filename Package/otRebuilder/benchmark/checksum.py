@@ -0,0 +1,54 @@
+"""Micro-benchmark of sfnt.calcChecksum against the previous implementation,
+which unpacked and summed the data in blocks of 4096 bytes.
+
+    python -m otRebuilder.benchmark.checksum
+"""
+
+from __future__ import print_function, division, absolute_import
+import os
+import random
+import struct
+import timeit
+
+import otRebuilder.benchmark
+from fontTools.ttLib import sfnt
+
+
+SIZES = [1 << 10, 1 << 16, 1 << 20, 1 << 24]  # From a tiny table to a large `glyf`
+REPEAT = 5
+
+
+def calcChecksumReference(data):
+    remainder = len(data) % 4
+    if remainder:
+        data += b"\0" * (4 - remainder)
+    value = 0
+    blockSize = 4096
+    for i in range(0, len(data), blockSize):
+        block = data[i:i+blockSize]
+        longs = struct.unpack(">%dL" % (len(block) // 4), block)
+        value = (value + sum(longs)) & 0xffffffff
+    return value
+
+
+def run_benchmark(function, data):
+    number = max(1, (1 << 22) // len(data))
+    results = timeit.repeat(lambda: function(data), repeat = REPEAT, number = number)
+    return min(results) / number
+
+
+def main():
+    engine = "numpy" if sfnt.numpy is not None else "array"
+    print("calcChecksum (%s) vs. reference:" % engine)
+    for size in SIZES:
+        data = os.urandom(size + 3)  # Unpadded
+        assert sfnt.calcChecksum(data) == calcChecksumReference(data)
+        reference = run_benchmark(calcChecksumReference, data)
+        current = run_benchmark(sfnt.calcChecksum, data)
+        print("%9d bytes:\treference=%.1fus\tcurrent=%.1fus\tspeedup=%.1fx" % (
+            size + 3, reference * 1000000., current * 1000000., reference / current))
+
+
+if __name__ == "__main__":
+    random.seed(1)
+    main()
@@ -0,0 +1,112 @@
+"""Micro-benchmark of the cmap format 4 segment builder against the previous
+implementation, which split every range of consecutive codes with splitRange()
+and collected the glyph IDs of each segment code by code.
+
+    python -m otRebuilder.benchmark.cmap4
+"""
+
+from __future__ import print_function, division, absolute_import
+import random
+import timeit
+
+import otRebuilder.benchmark
+from fontTools.ttLib.tables import _c_m_a_p
+
+
+# Blocks of a CJK font: ASCII, CJK punctuation and kana, CJK Unified Ideographs, Hangul and fullwidth forms
+BLOCKS = [(0x20, 0x7E), (0x3000, 0x30FF), (0x4E00, 0x9FFF), (0xAC00, 0xD7A3), (0xFF00, 0xFFEF)]
+SIZES = [1000, 5000, 20000, 30000]
+REPEAT = 5
+
+
+def buildSegmentsReference(charCodes, gids):
+    cmap = dict(zip(charCodes, gids))
+    lastCode = charCodes[0]
+    endCode = []
+    startCode = [lastCode]
+    for charCode in charCodes[1:]:
+        if charCode == lastCode + 1:
+            lastCode = charCode
+            continue
+        start, end = _c_m_a_p.splitRange(startCode[-1], lastCode, cmap)
+        startCode.extend(start)
+        endCode.extend(end)
+        startCode.append(charCode)
+        lastCode = charCode
+    start, end = _c_m_a_p.splitRange(startCode[-1], lastCode, cmap)
+    startCode.extend(start)
+    endCode.extend(end)
+    startCode.append(0xffff)
+    endCode.append(0xffff)
+
+    idDelta = []
+    idRangeOffset = []
+    glyphIndexArray = []
+    for i in range(len(endCode)-1):
+        indices = []
+        for charCode in range(startCode[i], endCode[i] + 1):
+            indices.append(cmap[charCode])
+        if (indices == list(range(indices[0], indices[0] + len(indices)))):
+            idDelta.append((indices[0] - startCode[i]) % 0x10000)
+            idRangeOffset.append(0)
+        else:
+            idDelta.append(0)
+            idRangeOffset.append(2 * (len(endCode) + len(glyphIndexArray) - i))
+            glyphIndexArray.extend(indices)
+    idDelta.append(1)
+    idRangeOffset.append(0)
+    return startCode, endCode, idDelta, idRangeOffset, glyphIndexArray
+
+
+# Picks `size` codes from BLOCKS, mostly in runs, and gives them glyph IDs which are
+# consecutive in places, like glyphs ordered by code with some of them shared or moved.
+def makeMapping(size, rng):
+    allCodes = [code for first, last in BLOCKS for code in range(first, last + 1)]
+    size = min(size, len(allCodes))
+    charCodes = []
+    position = 0
+    while len(charCodes) < size:
+        position += int(rng.random() * 8)  # Gaps
+        runLength = 1 + int(rng.random() * 64)
+        charCodes.extend(allCodes[position:position + runLength])
+        position += runLength
+        if position >= len(allCodes):
+            position = 0
+            charCodes = sorted(set(charCodes))
+    charCodes = sorted(set(charCodes))[:size]
+    gids = []
+    nextGID = 1
+    for code in charCodes:
+        r = rng.random()
+        if r < 0.05:
+            gids.append(1 + int(rng.random() * size))  # Shared or moved glyph
+        else:
+            if r < 0.08:
+                nextGID += 1 + int(rng.random() * 16)  # Skipped glyphs
+            gids.append(nextGID)
+            nextGID += 1
+    return charCodes, [gid & 0xFFFF for gid in gids]
+
+
+def run_benchmark(function, charCodes, gids):
+    number = max(1, 200000 // len(charCodes))
+    results = timeit.repeat(lambda: function(charCodes, gids), repeat = REPEAT, number = number)
+    return min(results) / number
+
+
+def main():
+    engine = "numpy" if _c_m_a_p.numpy is not None else "list"
+    print("cmap format 4 buildSegments (%s) vs. reference:" % engine)
+    rng = random.Random(1)
+    for size in SIZES:
+        charCodes, gids = makeMapping(size, rng)
+        segments = _c_m_a_p.buildSegments(charCodes, gids)
+        assert segments == buildSegmentsReference(charCodes, gids)
+        reference = run_benchmark(buildSegmentsReference, charCodes, gids)
+        current = run_benchmark(_c_m_a_p.buildSegments, charCodes, gids)
+        print("%6d codes, %5d segments:\treference=%.2fms\tcurrent=%.2fms\tspeedup=%.1fx" % (
+            len(charCodes), len(segments[0]), reference * 1000., current * 1000., reference / current))
+
+
+if __name__ == "__main__":
+    main()
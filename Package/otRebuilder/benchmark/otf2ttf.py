@@ -0,0 +1,65 @@
+"""Throughput of the otf2ttf glyph conversion, in glyphs per second, through
+Outlines.CharStringConverter against the former path of drawing the charstrings
+through Cu2QuPen onto TTGlyphPen, with and without --vectorizeCurves.
+
+The charstrings are decompiled beforehand, as both paths need that alike.
+A synthetic CFF-based font is used unless a font file is given.
+
+    python -m otRebuilder.benchmark.otf2ttf [options] [inputFont]
+"""
+
+from __future__ import print_function, division, absolute_import
+import argparse
+import timeit
+
+import otRebuilder.benchmark
+from fontTools.misc.py23 import *
+from fontTools.ttLib import TTFont
+from otRebuilder.benchmark import synthetic
+from otRebuilder.Lib import Converter
+import cu2qu.batch
+
+
+REPEAT = 3
+
+
+def loadCharStrings(fontPath, glyphCount):
+    if fontPath:
+        font = TTFont(fontPath)
+    else:
+        stream = BytesIO()
+        synthetic.makeFont(synthetic.FontSpec(cff = True, glyphs = glyphCount)).save(stream)
+        stream.seek(0)
+        font = TTFont(stream)
+    charStrings = list(font["CFF "].cff.values())[0].CharStrings
+    glyphs = [(glyphName, charStrings[glyphName]) for glyphName in font.getGlyphOrder()]
+    for glyphName, charString in glyphs:
+        charString.decompile()
+    return glyphs
+
+
+def run_benchmark(drawGlyphs, glyphs, vectorize):
+    convert = lambda: list(drawGlyphs(glyphs, synthetic.MAX_ERR, True, vectorize))
+    return min(timeit.repeat(convert, repeat = REPEAT, number = 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark the otf2ttf glyph conversion.")
+    parser.add_argument("inputFont", nargs = "?", help = "a CFF-based font (default: a synthetic one)")
+    parser.add_argument("--glyphs", type = int, default = 5000, help = "glyph count of the synthetic font")
+    args = parser.parse_args()
+
+    glyphs = loadCharStrings(args.inputFont, args.glyphs)
+    print("otf2ttf glyph conversion of %d glyphs, charstrings vs. pens:" % len(glyphs))
+    for vectorize in (False, True):
+        if vectorize and cu2qu.batch.numpy is None:
+            continue
+        reference = run_benchmark(Converter._otf2ttfDrawGlyphsWithPens, glyphs, vectorize)
+        current = run_benchmark(Converter._otf2ttfDrawGlyphs, glyphs, vectorize)
+        print("%-10s\tpens=%.0f glyphs/s\tcharstrings=%.0f glyphs/s\tspeedup=%.1fx" % (
+            "vectorized" if vectorize else "scalar", len(glyphs) / reference, len(glyphs) / current,
+            reference / current))
+
+
+if __name__ == "__main__":
+    main()
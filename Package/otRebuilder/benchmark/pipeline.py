@@ -0,0 +1,183 @@
+"""Benchmark of the otrebuild pipeline on synthetic fonts.
+
+Each case runs otrebuild in a fresh process on a TrueType and a CFF-based font
+built by otRebuilder.benchmark.synthetic, and reports the best wall time of
+several runs, along with the per-stage times of its --profile report.
+
+    python -m otRebuilder.benchmark.pipeline [options]
+
+Results can be saved with -o and compared against an earlier run with --baseline.
+"""
+
+from __future__ import print_function, division, absolute_import
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import otRebuilder.benchmark
+from fontTools.misc.py23 import *
+from otRebuilder.benchmark import synthetic
+from otRebuilder.Lib import Constants
+
+
+FLAVORS = ["TrueType", "CFF"]
+CASES = [
+    ("O1", ["--O1"]),
+    ("O2", ["--O2"]),
+    ("O3", ["--O3"]),
+    ("otf2ttf", ["--otf2ttf"]),
+    ("UPM", ["--UPM"]),  # To the typical UPM of the other flavor
+    ]
+REPEAT = 3
+
+
+def getCaseArgs(caseName, spec):
+    args = list(dict(CASES)[caseName])
+    if caseName == "UPM":
+        args.append(str(synthetic.TRUETYPE_UPM if spec.cff else synthetic.CFF_UPM))
+    return args
+
+
+def isApplicable(caseName, spec):
+    return caseName != "otf2ttf" or spec.cff
+
+
+def prepareFont(spec, fontDir):
+    fontPath = os.path.join(fontDir, spec.getName() + (".otf" if spec.cff else ".ttf"))
+    if not os.path.exists(fontPath):  # Fonts are reproducible, so keep earlier ones.
+        synthetic.makeFont(spec).save(fontPath)
+    return fontPath
+
+
+# Runs otrebuild once. Returns the wall time and the --profile report of the font.
+def runCase(fontPath, caseArgs, workDir):
+    outputPath = os.path.join(workDir, "output" + os.path.splitext(fontPath)[1])
+    reportPath = os.path.join(workDir, "report.json")
+    for path in (outputPath, reportPath):
+        if os.path.exists(path):
+            os.remove(path)
+    packageDir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [packageDir, env.get("PYTHONPATH")]))
+    command = [sys.executable, "-W", "ignore", "-m", "otRebuilder.otrebuild"] + caseArgs + [
+        "--profile", reportPath, "-o", outputPath, fontPath
+        ]
+    with open(os.devnull, "wb") as devnull:
+        startTime = time.time()
+        subprocess.check_call(command, stdout = devnull, env = env)
+        elapsed = time.time() - startTime
+    with open(reportPath, "r") as reportFile:
+        report = json.load(reportFile)
+    return elapsed, report["fonts"][0]
+
+
+def runBenchmark(specs, caseNames, repeat, fontDir):
+    results = []
+    workDir = tempfile.mkdtemp()
+    try:
+        for spec in specs:
+            fontPath = prepareFont(spec, fontDir)
+            for caseName in caseNames:
+                if not isApplicable(caseName, spec):
+                    continue
+                caseArgs = getCaseArgs(caseName, spec)
+                runs = []
+                bestReport = None
+                for i in range(repeat):
+                    elapsed, report = runCase(fontPath, caseArgs, workDir)
+                    if not runs or elapsed < min(runs):
+                        bestReport = report
+                    runs.append(elapsed)
+                result = {
+                    "font": spec.getName(),
+                    "case": caseName,
+                    "args": caseArgs,
+                    "runs": runs,
+                    "best": min(runs),
+                    "stages": dict((stage["name"], stage["time"]) for stage in bestReport["stages"]),
+                    "maxRSS": bestReport["maxRSS"],
+                    }
+                results.append(result)
+                print("%-36s %-8s %8.3f s" % (result["font"], caseName, result["best"]))
+    finally:
+        shutil.rmtree(workDir)
+    return results
+
+
+def compareResults(results, baselinePath):
+    with open(baselinePath, "r") as baselineFile:
+        baseline = json.load(baselineFile)
+    baselineTimes = dict(((r["font"], r["case"]), r["best"]) for r in baseline["results"])
+    print("\nCompared with %s:" % baselinePath)
+    for result in results:
+        baselineTime = baselineTimes.get((result["font"], result["case"]))
+        if baselineTime is None:
+            continue
+        print("%-36s %-8s %8.3f s -> %8.3f s  %5.2fx" % (
+            result["font"], result["case"], baselineTime, result["best"], baselineTime / result["best"]))
+    return
+
+
+def writeResults(resultsPath, specs, results):
+    report = {
+        "otRebuilder": Constants.VERSION,
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "fonts": dict((spec.getName(), spec.toDict()) for spec in specs),
+        "results": results,
+        }
+    reportStr = json.dumps(report, indent = 2, sort_keys = True)
+    with open(resultsPath, "w") as resultsFile:
+        resultsFile.write(tounicode(reportStr) + u"\n")
+    return
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark otrebuild on synthetic fonts.")
+    parser.add_argument("--glyphs", type = int, default = 5000)
+    parser.add_argument("--codepoints", type = int, default = None, help = "defaults to the glyph count")
+    parser.add_argument("--names", type = int, default = 100)
+    parser.add_argument("--kernPairs", type = int, default = 10000)
+    parser.add_argument("--flavors", default = ",".join(FLAVORS), help = "default: %(default)s")
+    parser.add_argument("--cases", default = ",".join(name for name, args in CASES), help = "default: %(default)s")
+    parser.add_argument("--repeat", type = int, default = REPEAT)
+    parser.add_argument("--fontDir", help = "where to keep the synthetic fonts between runs")
+    parser.add_argument("--baseline", metavar = "results", help = "earlier results to compare with")
+    parser.add_argument("-o", metavar = "results", help = "save the results as JSON")
+    args = parser.parse_args()
+
+    flavors = args.flavors.split(",")
+    caseNames = args.cases.split(",")
+    for name in flavors:
+        if name not in FLAVORS:
+            parser.error("unknown flavor: %s" % name)
+    for name in caseNames:
+        if name not in dict(CASES):
+            parser.error("unknown case: %s" % name)
+    specs = [
+        synthetic.FontSpec(name == "CFF", args.glyphs, args.codepoints, args.names, args.kernPairs)
+        for name in flavors
+        ]
+
+    fontDir = args.fontDir or tempfile.mkdtemp()
+    if not os.path.isdir(fontDir):
+        os.makedirs(fontDir)
+    try:
+        results = runBenchmark(specs, caseNames, args.repeat, fontDir)
+    finally:
+        if not args.fontDir:
+            shutil.rmtree(fontDir)
+    if args.baseline:
+        compareResults(results, args.baseline)
+    if args.o:
+        writeResults(args.o, specs, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Synthetic TrueType and CFF-based fonts for benchmarking, with configurable
+numbers of glyphs, cmap entries, name records and GPOS kerning pairs.
+
+    python -m otRebuilder.benchmark.synthetic [options] <outputFont>
+"""
+
+from __future__ import print_function, division, absolute_import
+import argparse
+import math
+import random
+
+import otRebuilder.benchmark
+from fontTools.cffLib import CFFFontSet, CharStrings, GlobalSubrsIndex, IndexedStrings, PrivateDict, TopDict, TopDictIndex
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.misc.py23 import *
+from fontTools.misc.timeTools import timestampFromString
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib.tables._c_m_a_p import CmapSubtable
+from fontTools.ttLib.tables._g_l_y_f import GlyphComponent
+from fontTools.ttLib.tables.O_S_2f_2 import Panose
+from cu2qu.pens import Cu2QuPen
+
+
+FAMILY_NAME = "Synthetic"
+CFF_UPM = 1000
+TRUETYPE_UPM = 2048
+COMPOSITE_RATIO = 10  # Every 10th glyph of a TrueType font is a composite.
+MAX_ERR = 1.0
+TIMESTAMP = timestampFromString("Mon Jan  1 00:00:00 2018")  # Keeps the output reproducible
+
+
+class FontSpec(object):
+    def __init__(self, cff = False, glyphs = 5000, codepoints = None, names = 100, kernPairs = 10000, seed = 1):
+        self.cff = cff
+        self.glyphs = glyphs
+        self.codepoints = glyphs if codepoints is None else codepoints
+        self.names = names
+        self.kernPairs = kernPairs
+        self.seed = seed
+
+    def getName(self):
+        return "%s-%dg-%dc-%dn-%dk" % (
+            "CFF" if self.cff else "TrueType",
+            self.glyphs, self.codepoints, self.names, self.kernPairs
+            )
+
+    def toDict(self):
+        return dict(self.__dict__)
+
+
+# Unlike random.randint(), gives the same numbers on Python 2 and 3.
+def randint(rng, a, b):
+    return a + int(rng.random() * (b - a + 1))
+
+
+# Draws a blob with two contours of four cubic curves each, jittered by the random generator.
+def drawOutline(pen, rng, upm):
+    scale = upm / CFF_UPM
+    for xMin, yMin, xMax, yMax in ((50, 0, 550, 700), (150, 150, 450, 550)):
+        xMid, yMid = (xMin + xMax) // 2, (yMin + yMax) // 2
+        points = [
+            (xMin, yMid), (xMin, yMax), (xMin, yMax), (xMid, yMax),
+            (xMax, yMax), (xMax, yMax), (xMax, yMid), (xMax, yMin),
+            (xMax, yMin), (xMid, yMin), (xMin, yMin), (xMin, yMin)
+            ]
+        points = [
+            (int((x + randint(rng, -40, 40)) * scale), int((y + randint(rng, -40, 40)) * scale))
+            for x, y in points
+            ]
+        pen.moveTo(points[0])
+        for i in range(1, len(points), 3):
+            pen.curveTo(points[i], points[i + 1], points[(i + 2) % len(points)])
+        pen.closePath()
+    return
+
+
+def makeGlyphOrder(spec):
+    return [".notdef"] + ["glyph%05d" % i for i in range(1, spec.glyphs)]
+
+
+# Maps BMP codepoints first, then supplementary ones. Extra codepoints share glyphs.
+def makeCmap(spec, glyphOrder):
+    codepoints = [c for c in range(0x20, 0xFFFE) if not 0xD800 <= c <= 0xDFFF]
+    if spec.codepoints > len(codepoints):
+        codepoints.extend(range(0x20000, 0x20000 + spec.codepoints - len(codepoints)))
+    cmap = {}
+    for i, codepoint in enumerate(codepoints[:spec.codepoints]):
+        cmap[codepoint] = glyphOrder[1 + i % (len(glyphOrder) - 1)]
+    return cmap
+
+
+def setupGlyf(font, spec, glyphOrder, rng):
+    glyphs = {".notdef": TTGlyphPen(None).glyph()}
+    for i, glyphName in enumerate(glyphOrder[1:], 1):
+        if i % COMPOSITE_RATIO == 0:
+            glyph = TTGlyphPen(None).glyph()
+            glyph.numberOfContours = -1
+            glyph.components = []
+            for baseName, x in ((glyphOrder[i - 1], 0), (glyphOrder[i - 2], 600)):
+                component = GlyphComponent()
+                component.glyphName = baseName
+                component.x, component.y = x, randint(rng, -100, 100)
+                component.flags = 0x4
+                glyph.components.append(component)
+        else:
+            ttPen = TTGlyphPen(None)
+            drawOutline(Cu2QuPen(ttPen, MAX_ERR, reverse_direction = True), rng, TRUETYPE_UPM)
+            glyph = ttPen.glyph()
+        glyphs[glyphName] = glyph
+    glyf = font["glyf"] = newTable("glyf")
+    glyf.glyphOrder = glyphOrder
+    glyf.glyphs = glyphs
+    font["loca"] = newTable("loca")
+    hmtx = font["hmtx"] = newTable("hmtx")
+    hmtx.metrics = {}
+    for glyphName in glyphOrder:
+        glyph = glyf[glyphName]
+        glyph.recalcBounds(glyf)
+        hmtx.metrics[glyphName] = (1200, getattr(glyph, "xMin", 0))
+    maxp = font["maxp"] = newTable("maxp")
+    maxp.__dict__.update(
+        tableVersion = 0x10000, maxZones = 1, maxTwilightPoints = 0, maxStorage = 0,
+        maxFunctionDefs = 0, maxInstructionDefs = 0, maxStackElements = 0, maxSizeOfInstructions = 0,
+        maxComponentElements = 2
+        )
+    return
+
+
+def setupCFF(font, spec, glyphOrder, rng):
+    strings = IndexedStrings()
+    private = PrivateDict(strings = strings)
+    topDict = TopDict(strings = strings)
+    topDict.charset = glyphOrder
+    topDict.Private = private
+    topDict.FullName = FAMILY_NAME + " Regular"
+    topDict.FamilyName = FAMILY_NAME
+    topDict.Weight = "Regular"
+    globalSubrs = GlobalSubrsIndex()
+    topDict.GlobalSubrs = globalSubrs
+    charStrings = CharStrings(None, glyphOrder, globalSubrs, private, None, None)
+    hmtx = font["hmtx"] = newTable("hmtx")
+    hmtx.metrics = {}
+    for glyphName in glyphOrder:
+        pen = T2CharStringPen(600, None)
+        if glyphName != ".notdef":
+            drawOutline(pen, rng, CFF_UPM)
+        charString = pen.getCharString(private)
+        charStrings[glyphName] = charString
+        bounds = charString.calcBounds()
+        hmtx.metrics[glyphName] = (600, int(math.floor(bounds[0])) if bounds else 0)
+    topDict.CharStrings = charStrings
+    cff = CFFFontSet()
+    cff.major, cff.minor, cff.hdrSize, cff.offSize = 1, 0, 4, 4
+    cff.fontNames = [FAMILY_NAME + "-Regular"]
+    cff.strings = strings
+    cff.topDictIndex = TopDictIndex()
+    cff.topDictIndex.append(topDict)
+    cff.GlobalSubrs = globalSubrs
+    font["CFF "] = newTable("CFF ")
+    font["CFF "].cff = cff
+    maxp = font["maxp"] = newTable("maxp")
+    maxp.tableVersion = 0x5000
+    return
+
+
+def setupTables(font, spec, glyphOrder, rng):
+    upm = CFF_UPM if spec.cff else TRUETYPE_UPM
+    head = font["head"] = newTable("head")
+    head.__dict__.update(
+        tableVersion = 1.0, fontRevision = 1.0, checkSumAdjustment = 0, magicNumber = 0x5F0F3CF5,
+        flags = 3, unitsPerEm = upm, created = TIMESTAMP, modified = TIMESTAMP,
+        xMin = 0, yMin = 0, xMax = 0, yMax = 0, macStyle = 0, lowestRecPPEM = 8, fontDirectionHint = 2,
+        indexToLocFormat = 0, glyphDataFormat = 0
+        )
+    hhea = font["hhea"] = newTable("hhea")
+    hhea.__dict__.update(
+        tableVersion = 0x10000, ascent = upm * 4 // 5, descent = -upm // 5, lineGap = 0,
+        caretSlopeRise = 1, caretSlopeRun = 0, caretOffset = 0, reserved0 = 0, reserved1 = 0,
+        reserved2 = 0, reserved3 = 0, metricDataFormat = 0
+        )
+
+    os2 = font["OS/2"] = newTable("OS/2")
+    os2.__dict__.update(
+        version = 4, xAvgCharWidth = 0, usWeightClass = 400, usWidthClass = 5, fsType = 0,
+        ySubscriptXSize = upm * 13 // 20, ySubscriptYSize = upm * 3 // 5, ySubscriptXOffset = 0,
+        ySubscriptYOffset = upm * 3 // 40, ySuperscriptXSize = upm * 13 // 20,
+        ySuperscriptYSize = upm * 3 // 5, ySuperscriptXOffset = 0, ySuperscriptYOffset = upm * 7 // 20,
+        yStrikeoutSize = upm // 20, yStrikeoutPosition = upm // 4, sFamilyClass = 0,
+        ulUnicodeRange1 = 0, ulUnicodeRange2 = 0, ulUnicodeRange3 = 0, ulUnicodeRange4 = 0,
+        achVendID = "NONE", fsSelection = 0x40, usFirstCharIndex = 0, usLastCharIndex = 0,
+        sTypoAscender = upm * 4 // 5, sTypoDescender = -upm // 5, sTypoLineGap = 0,
+        usWinAscent = upm, usWinDescent = upm // 5, ulCodePageRange1 = 1, ulCodePageRange2 = 0,
+        sxHeight = upm // 2, sCapHeight = upm * 7 // 10, usDefaultChar = 0, usBreakChar = 32,
+        usMaxContext = 2
+        )
+    os2.panose = Panose()
+    for attr in ("bFamilyType", "bSerifStyle", "bWeight", "bProportion", "bContrast", "bStrokeVariation",
+            "bArmStyle", "bLetterForm", "bMidline", "bXHeight"):
+        setattr(os2.panose, attr, 0)
+
+    name = font["name"] = newTable("name")
+    name.names = []
+    baseNames = (FAMILY_NAME, "Regular", FAMILY_NAME + " Regular", FAMILY_NAME + " Regular",
+        "Version 1.000", FAMILY_NAME + "-Regular")
+    for nameID, string in enumerate(baseNames, 1):
+        name.setName(tounicode(string), nameID, 3, 1, 0x409)
+        name.setName(tounicode(string), nameID, 1, 0, 0)
+    for i in range(spec.names):
+        platformID, platEncID, langID = ((3, 1, 0x409 + i // 1000), (1, 0, i // 1000))[i % 2]
+        name.setName(tounicode("Synthetic record %d" % i), 256 + i % 1000, platformID, platEncID, langID)
+
+    post = font["post"] = newTable("post")
+    post.__dict__.update(
+        formatType = 3.0 if spec.cff else 2.0, italicAngle = 0, underlinePosition = -upm // 10,
+        underlineThickness = upm // 20, isFixedPitch = 0, minMemType42 = 0, maxMemType42 = 0,
+        minMemType1 = 0, maxMemType1 = 0, extraNames = [], mapping = {}
+        )
+
+    cmapMapping = makeCmap(spec, glyphOrder)
+    cmap = font["cmap"] = newTable("cmap")
+    cmap.tableVersion = 0
+    cmap.tables = []
+    bmpMapping = dict((c, g) for c, g in cmapMapping.items() if c <= 0xFFFF)
+    for format, platformID, platEncID, mapping in (
+            (4, 0, 3, bmpMapping), (4, 3, 1, bmpMapping), (12, 3, 10, cmapMapping)):
+        if format == 12 and len(mapping) == len(bmpMapping):
+            continue
+        subtable = CmapSubtable.newSubtable(format)
+        subtable.platformID, subtable.platEncID, subtable.language = platformID, platEncID, 0
+        subtable.cmap = mapping
+        cmap.tables.append(subtable)
+    return
+
+
+# Kerning pairs between random glyphs, one kern feature for the default script.
+def setupGPOS(font, spec, glyphOrder, rng):
+    if spec.kernPairs <= 0:
+        return
+    pairs = set()
+    while len(pairs) < min(spec.kernPairs, (len(glyphOrder) - 1) ** 2):
+        pairs.add((randint(rng, 1, len(glyphOrder) - 1), randint(rng, 1, len(glyphOrder) - 1)))
+    lines = ["languagesystem DFLT dflt;", "feature kern {"]
+    for left, right in sorted(pairs):
+        lines.append("    pos %s %s %d;" % (glyphOrder[left], glyphOrder[right], randint(rng, -100, 100)))
+    lines.append("} kern;")
+    addOpenTypeFeaturesFromString(font, "\n".join(lines))
+    return
+
+
+def makeFont(spec):
+    rng = random.Random(spec.seed)
+    glyphOrder = makeGlyphOrder(spec)
+    font = TTFont(sfntVersion = "OTTO" if spec.cff else "\0\1\0\0", recalcTimestamp = False)
+    font.setGlyphOrder(glyphOrder)
+    setupTables(font, spec, glyphOrder, rng)
+    if spec.cff:
+        setupCFF(font, spec, glyphOrder, rng)
+    else:
+        setupGlyf(font, spec, glyphOrder, rng)
+    setupGPOS(font, spec, glyphOrder, rng)
+    return font
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Build a synthetic font for benchmarking.")
+    parser.add_argument("outputFont")
+    parser.add_argument("--cff", action = "store_true", help = "build a CFF-based font")
+    parser.add_argument("--glyphs", type = int, default = 5000)
+    parser.add_argument("--codepoints", type = int, default = None, help = "defaults to the glyph count")
+    parser.add_argument("--names", type = int, default = 100)
+    parser.add_argument("--kernPairs", type = int, default = 10000)
+    parser.add_argument("--seed", type = int, default = 1)
+    args = parser.parse_args()
+    spec = FontSpec(args.cff, args.glyphs, args.codepoints, args.names, args.kernPairs, args.seed)
+    makeFont(spec).save(args.outputFont)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,27 +4,37 @@
 from __future__ import print_function, division, absolute_import
 import argparse
 import codecs
+import copy
+import cProfile
+import glob
+import json
+import multiprocessing
 import os.path
+import platform
 import sys
+import time
+import traceback
 
 dependencyDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "Dep")
 sys.path.insert(0, dependencyDir)
 
 from fontTools.misc.macCreatorType import getMacCreatorAndType
-from fontTools.misc.cliTools import makeOutputFileName
+from fontTools.misc.cliTools import makeOutputFileName, numberAddedRE
 from fontTools.misc.py23 import *
-from fontTools.ttLib import TTFont
+from fontTools.ttLib import TTFont, TTCollection
 import toml
 
 from otRebuilder.Lib import Initializer
 from otRebuilder.Lib import Fixer
 from otRebuilder.Lib import Rebuilder
 from otRebuilder.Lib import Converter
+from otRebuilder.Lib import Caches
+from otRebuilder.Lib import Profiler
 from otRebuilder.Lib import Constants
 
 
-usageStr = "usage: otrebuild [options] <inputFont>"
-descriptionStr = """    OpenType Font Rebuilder: Version 1.5.6, powered by fontTools
+usageStr = "usage: otrebuild [options] <inputFont> [<inputFont> ...]"
+descriptionStr = """    OpenType Font Rebuilder: Version %s, powered by fontTools
 
     This is a simple tool to resolve naming, styling and mapping issues
         among OpenType fonts. Without any options given, it can scan and
@@ -35,24 +45,66 @@ descriptionStr = """    OpenType Font Rebuilder: Version 1.5.6, powered by fontT
         compatibility. It also supplies extra useful functionalities
         to simplify multilingual OpenType font packaging workflow.
 
-    TrueType and OpenType fonts are both supported. Output files are
-        always created with different names, so an existing file is
-        never overwritten.
+    TrueType and OpenType fonts are both supported, as well as their
+        collections (TTC/OTC), of which every font is processed. Tables
+        shared among the fonts of a collection are processed only once,
+        and tables with the same data are written only once. Output
+        files are always created with different names, so an existing
+        file is never overwritten.
+
+    Batch mode is enabled when more than one input is given, or when
+        an input is a directory or a wildcard pattern. All fonts are
+        then processed in parallel, errors are reported per font, and
+        a summary is printed at the end.
 
     Options:
-        -o <outputFont>: Specify the output font file.
+        -o <outputFont>: Specify the output font file. In batch mode it
+            specifies the output directory instead.
+        --workers <count>: Batch mode only. Specify the number of worker
+            processes. It defaults to the number of CPUs.
         -c <configTOML>: Specify the configuration file. It is an
             TOML-format text file and it must be UTF-8 encoded.
-        --UPM <targetUPM>: Change a TrueType font's units-per-em value.
+        --UPM <targetUPM>: Change a font's units-per-em value.
             The entire font will be rescaled to adapt the new UPM value.
             A typical UPM for TrueType font is 2048, and for CFF-based
             font is 1000. UPM > 5000 will cause problems in Adobe apps
-            such as InDesign and Illustrator. `MATH` table is currently
-            not supported; please rebuild it after application.
+            such as InDesign and Illustrator. Layout tables `BASE`, `GPOS`,
+            `JSTF` and `MATH` are rescaled as well, with their structure kept.
+            Charstrings of CFF-based fonts are rescaled along with their
+            subroutines, which are kept rather than expanded.
         --otf2ttf: For CFF-based font only. Convert a CFF-based font
             into a TrueType-outline font. Glyph bounding boxes and
             min/max values will be automatically recalculated. This
             option would be ignored if a TrueType font is specified.
+        --convertWorkers <count>: Convert glyphs in parallel with the
+            given number of worker processes. It currently applies to
+            --otf2ttf, and it is ignored in batch mode.
+        --vectorizeCurves: Convert the curves of all glyphs together
+            with NumPy for --otf2ttf, instead of one by one, retrying
+            only those which need more quadratic segments. The output
+            is the same either way. It is ignored without NumPy.
+        --composeDuplicates: Make glyphs whose outlines duplicate an
+            earlier glyph's, at the same place or moved by whole units,
+            into composite glyphs referring to it with --otf2ttf, which
+            makes `glyf` smaller. Otherwise only the duplicates at the
+            same place are found, and they get a copy of the outline.
+            Either way, each distinct outline is converted only once.
+        --cacheDir <dir>: Keep converted glyphs of --otf2ttf in the given
+            directory, so that unchanged glyphs are not converted again
+            in later runs. It can be shared among batch mode workers.
+        --cacheSize <MiB>: Specify the size limit of each cache in
+            --cacheDir. Least recently used entries are dropped beyond
+            it. It defaults to 512 MiB.
+        --cacheTables: Keep decompiled tables such as `CFF `, `GSUB`
+            and `GPOS` in --cacheDir as well, so that later runs on the
+            same unchanged font load them instead of decompiling them
+            again. The cache is loaded with Python's pickle module, so
+            only use a directory that nobody else can write to.
+        --saveWorkers <count>: Compile independent tables such as `GSUB`,
+            `GPOS`, `cmap` and `name` in parallel with the given number
+            of worker processes when saving the font. The output is the
+            same either way. It is ignored in batch mode, for collections,
+            and on platforms without fork().
         --macOffice: Add standard weight strings onto Mac English
             subfamily and remove legacy Macintosh Roman character
             mapping in order to obtain maximum compatibilities with
@@ -82,6 +134,16 @@ descriptionStr = """    OpenType Font Rebuilder: Version 1.5.6, powered by fontT
             valid digital signature in order to enable advanced OpenType
             features. This option can forge an empty but valid DSIG
             placeholder.
+        --profile <report>: Record the time and peak memory usage of
+            every processing stage, as well as the time spent on each
+            font table and the fixes of GSUB/GPOS offset overflows,
+            into the given JSON file. The peak memory is that of the
+            whole process so far; how much each stage raised it is
+            recorded as well. Tables compiled by --saveWorkers are left
+            out of the table times, and workers out of the memory.
+        --profileStats <stats>: Dump cProfile statistics of the whole
+            run into the given file, which can be examined with the
+            `pstats` module. It is ignored in batch mode.
         --O1: Mild optimization, as a shortcut to --smoothRendering,
             --allowUpgrade, and --dummySignature.
         --O2: Typical optimization, as a shortcut to --recalculate, 
@@ -93,11 +155,13 @@ descriptionStr = """    OpenType Font Rebuilder: Version 1.5.6, powered by fontT
 
     ** Windows legacy symbol fonts are currently not supported.
     ** Variable fonts are currently not supported.
-"""
+""" % Constants.VERSION
 
 
 def main():
     paths, jobs = parseArgs()
+    if paths.isBatch():
+        return processBatch(paths, jobs)
     processIO(paths)
     processFont(paths, jobs)
     return
@@ -114,14 +178,22 @@ def parseArgs():
 
     parser = argparse.ArgumentParser(
         description = descriptionStr, 
-        usage = "%(prog)s [options] <inputFont>", 
+        usage = "%(prog)s [options] <inputFont> [<inputFont> ...]", 
         formatter_class = argparse.RawDescriptionHelpFormatter
         )
-    parser.add_argument("inputFont", metavar = "inputFont", help = argparse.SUPPRESS)
+    parser.add_argument("inputFont", metavar = "inputFont", nargs = "+", help = argparse.SUPPRESS)
     parser.add_argument("-o", metavar = "outputFont", help = argparse.SUPPRESS)
+    parser.add_argument("--workers", metavar = "count", type = int, help = argparse.SUPPRESS)
     parser.add_argument("-c", metavar = "configTOML", help = argparse.SUPPRESS)
     parser.add_argument("--UPM", metavar = "targetUPM", type = int, help = argparse.SUPPRESS)
     parser.add_argument("--otf2ttf", action = "store_true", help = argparse.SUPPRESS)
+    parser.add_argument("--convertWorkers", metavar = "count", type = int, help = argparse.SUPPRESS)
+    parser.add_argument("--vectorizeCurves", action = "store_true", help = argparse.SUPPRESS)
+    parser.add_argument("--composeDuplicates", action = "store_true", help = argparse.SUPPRESS)
+    parser.add_argument("--saveWorkers", metavar = "count", type = int, help = argparse.SUPPRESS)
+    parser.add_argument("--cacheDir", metavar = "dir", help = argparse.SUPPRESS)
+    parser.add_argument("--cacheSize", metavar = "MiB", type = int, help = argparse.SUPPRESS)
+    parser.add_argument("--cacheTables", action = "store_true", help = argparse.SUPPRESS)
     parser.add_argument("--macOffice", action = "store_true", help = argparse.SUPPRESS)
     parser.add_argument("--refresh", action = "store_true", help = argparse.SUPPRESS)
     parser.add_argument("--recalculate", action = "store_true", help = argparse.SUPPRESS)
@@ -132,6 +204,8 @@ def parseArgs():
     parser.add_argument("--rebuildMapping", action = "store_true", help = argparse.SUPPRESS)
     parser.add_argument("--allowUpgrade", action = "store_true", help = argparse.SUPPRESS)
     parser.add_argument("--dummySignature", action = "store_true", help = argparse.SUPPRESS)
+    parser.add_argument("--profile", metavar = "report", help = argparse.SUPPRESS)
+    parser.add_argument("--profileStats", metavar = "stats", help = argparse.SUPPRESS)
     mutexGroup = parser.add_mutually_exclusive_group()
     mutexGroup.add_argument("--O1", action = "store_true", help = argparse.SUPPRESS)
     mutexGroup.add_argument("--O2", action = "store_true", help = argparse.SUPPRESS)
@@ -141,7 +215,8 @@ def parseArgs():
     paths = Paths()
     jobs = Jobs()
 
-    paths.inputFile = args.inputFont
+    paths.inputFiles = args.inputFont
+    paths.inputFile = args.inputFont[0]
     paths.configFile = args.c
     paths.outputFile = args.o
 
@@ -179,6 +254,9 @@ def parseArgs():
         jobs.fix_name = False
 
     jobs.general_recalc = args.recalculate
+    jobs.general_profile = args.profile
+    jobs.general_profileStats = args.profileStats
+    jobs.general_saveWorkers = args.saveWorkers
     jobs.init_refreshTables = args.refresh
     jobs.init_removeGlyphNames = args.removeGlyphNames
     jobs.init_removeBitmap = args.removeBitmap
@@ -187,20 +265,45 @@ def parseArgs():
     jobs.rebuild_DSIG = args.dummySignature
     jobs.convert_otf2ttf = args.otf2ttf
     jobs.convert_changeUPM = args.UPM
+    jobs.convert_workers = args.convertWorkers
+    jobs.convert_vectorize = args.vectorizeCurves
+    jobs.convert_composeDuplicates = args.composeDuplicates
+    jobs.convert_cacheDir = args.cacheDir
+    jobs.convert_cacheSize = args.cacheSize
+    jobs.general_cacheTables = args.cacheTables
+    jobs.batch_workers = args.workers
+    if args.cacheTables and not args.cacheDir:
+        print("WARNING: --cacheTables is ignored without --cacheDir.", file = sys.stderr)
     
     return paths, jobs
 
 
 class Paths(object):
     def __init__(self):
+        self.inputFiles = []
         self.inputFile = None
         self.configFile = None
         self.outputFile = None
 
+    # Batch mode: more than one input, or any input being a directory or a wildcard pattern.
+    def isBatch(self):
+        if len(self.inputFiles) > 1:
+            return True
+        for inputPath in self.inputFiles:
+            if os.path.isdir(inputPath):
+                return True
+            if not os.path.exists(inputPath) and glob.has_magic(inputPath):
+                return True
+        return False
+
 
 class Jobs(object):
     def __init__(self):
         self.general_recalc = False
+        self.general_profile = None
+        self.general_profileStats = None
+        self.general_saveWorkers = None
+        self.general_cacheTables = False
         self.init_refreshTables = False
         self.init_removeGlyphNames = False
         self.init_removeBitmap = False
@@ -216,6 +319,12 @@ class Jobs(object):
         self.rebuild_DSIG = False
         self.convert_otf2ttf = False
         self.convert_changeUPM = None
+        self.convert_workers = None
+        self.convert_vectorize = False
+        self.convert_composeDuplicates = False
+        self.convert_cacheDir = None
+        self.convert_cacheSize = None
+        self.batch_workers = None
 
 
 def processIO(paths):
@@ -223,7 +332,7 @@ def processIO(paths):
         print("ERROR: Input font file does not exist.", file = sys.stderr)
         sys.exit(2)
     elif getFontType(paths.inputFile) is None:
-        print("ERROR: Invalid font file. Only TTF and OTF are supported.", file = sys.stderr)
+        print("ERROR: Invalid font file. Only TTF, OTF, TTC and OTC are supported.", file = sys.stderr)
         sys.exit(1)
     else:
         pass
@@ -257,28 +366,255 @@ def getFontType(fileName):
         return "OTF"
     elif head in ("\0\1\0\0", "true"):
         return "TTF"
+    elif head == "ttcf":
+        return "TTC"
     return None
 
 
 def processFont(paths, jobs):
     print("Input Font: " + paths.inputFile + "\nProcessing...")
-    font = TTFont(
-        file = paths.inputFile, 
-        res_name_or_index = 0, 
-        recalcBBoxes = jobs.general_recalc, 
-        ignoreDecompileErrors = True, 
-        recalcTimestamp = True  # It might be altered by Rebuilder
-        )
-    config = None
+    configDict = None
     if paths.configFile:
-        doJobs(font, jobs, getConfigDict(paths.configFile))
+        configDict = getConfigDict(paths.configFile)
+    if jobs.general_profileStats:
+        stats = cProfile.Profile()
+        report = stats.runcall(rebuildFont, paths, jobs, configDict)
+        stats.dump_stats(jobs.general_profileStats)
     else:
-        doJobs(font, jobs)
-    font.save(paths.outputFile)
+        report = rebuildFont(paths, jobs, configDict)
+    if report:
+        writeProfileReport(jobs.general_profile, [report])
     print("Done.\nOutput Font: " + paths.outputFile)
     return
 
 
+# Returns the profile report if --profile is given.
+def rebuildFont(paths, jobs, configDict = None):
+    if jobs.general_profile:
+        profiler = Profiler.Profiler()
+    else:
+        profiler = Profiler.NullProfiler()
+    tableStore = openTableCache(jobs)
+    try:
+        if getFontType(paths.inputFile) == "TTC":
+            rebuildCollection(paths, jobs, configDict, profiler, tableStore)
+        else:
+            with profiler.stage("open"):
+                font = profiler.getTTFontClass()(
+                    file = paths.inputFile, 
+                    res_name_or_index = 0, 
+                    recalcBBoxes = jobs.general_recalc, 
+                    ignoreDecompileErrors = True, 
+                    recalcTimestamp = True,  # It might be altered by Rebuilder
+                    useMmap = True,  # Output files never overwrite the input
+                    tableStore = tableStore
+                    )
+            editableTables = getEditableTables(font, jobs, configDict)
+            doJobs(font, jobs, configDict, profiler)
+            releaseTables(font, editableTables)
+            with profiler.stage("save"):
+                font.save(paths.outputFile, workers = jobs.general_saveWorkers)
+            font.close()
+    finally:
+        if tableStore:
+            tableStore.close()
+    report = profiler.getReport()
+    if report:
+        report["inputFont"] = paths.inputFile
+        report["outputFont"] = paths.outputFile
+    return report
+
+
+# Every font of a collection is processed in turn. Fonts share the table objects which they
+# read from the same place in the file, so shared tables are decompiled only once, converted
+# only once, and compiled only once; tables with the same data are written only once.
+def rebuildCollection(paths, jobs, configDict, profiler, tableStore = None):
+    with profiler.stage("open"):
+        collection = TTCollection(
+            file = paths.inputFile, 
+            shareTables = True, 
+            fontClass = profiler.getTTFontClass(), 
+            recalcBBoxes = jobs.general_recalc, 
+            ignoreDecompileErrors = True, 
+            recalcTimestamp = True,  # It might be altered by Rebuilder
+            useMmap = True,  # Output files never overwrite the input
+            tableStore = tableStore
+            )
+    convertedTables = {}
+    for font in collection.fonts:
+        # Workers alter their `Jobs` object on the fly, so each font must get its own copy.
+        fontJobs = copy.deepcopy(jobs)
+        fontConfigDict = copy.deepcopy(configDict)
+        editableTables = getEditableTables(font, fontJobs, fontConfigDict)
+        doJobs(font, fontJobs, fontConfigDict, profiler, convertedTables)
+        releaseTables(font, editableTables)
+    with profiler.stage("save"):
+        collection.save(paths.outputFile)
+    collection.close()
+    return
+
+
+def writeProfileReport(reportPath, fontReports, totalTime = None):
+    report = {
+        "otRebuilder": Constants.VERSION,
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "fonts": fontReports,
+        }
+    if totalTime is not None:
+        report["totalTime"] = totalTime
+    reportStr = json.dumps(report, indent = 2, sort_keys = True)
+    try:
+        with open(reportPath, "w") as reportFile:
+            reportFile.write(tounicode(reportStr) + u"\n")
+    except IOError:
+        print("ERROR: Cannot write the profile report.", file = sys.stderr)
+        sys.exit(1)
+    return
+
+
+def processBatch(paths, jobs):
+    if paths.configFile and not os.path.exists(paths.configFile):
+        print("ERROR: Config TOML file does not exist.", file = sys.stderr)
+        sys.exit(2)
+    if paths.outputFile and not os.path.isdir(paths.outputFile):
+        print("ERROR: Output directory does not exist.", file = sys.stderr)
+        sys.exit(2)
+    configDict = None
+    if paths.configFile:
+        configDict = getConfigDict(paths.configFile)  # Parsed only once for the whole batch
+    inputFiles = expandInputs(paths.inputFiles)
+    if not inputFiles:
+        print("ERROR: No font file found.", file = sys.stderr)
+        sys.exit(2)
+    tasks = []
+    reservedOutputs = set()
+    for inputFile in inputFiles:
+        fontPaths = Paths()
+        fontPaths.inputFiles = [inputFile]
+        fontPaths.inputFile = inputFile
+        fontPaths.configFile = paths.configFile
+        fontPaths.outputFile = makeBatchOutputFileName(inputFile, paths.outputFile, reservedOutputs)
+        reservedOutputs.add(fontPaths.outputFile)
+        # Workers alter their `Jobs` object on the fly, so each font must get its own copy.
+        tasks.append((fontPaths, copy.deepcopy(jobs), configDict))
+
+    workers = jobs.batch_workers
+    if not workers or workers < 1:
+        workers = multiprocessing.cpu_count()
+    workers = min(workers, len(tasks))
+    print("Batch: %d font(s), %d worker(s)\nProcessing..." % (len(tasks), workers))
+    if jobs.general_profileStats:
+        print("WARNING: --profileStats is ignored in batch mode.", file = sys.stderr)
+    failures = []
+    reports = []
+    startTime = time.time()
+    if workers == 1:
+        results = (processBatchItem(task) for task in tasks)
+        failures = collectBatchResults(results, len(tasks), reports)
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            failures = collectBatchResults(pool.imap_unordered(processBatchItem, tasks), len(tasks), reports)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    elapsed = time.time() - startTime
+    if jobs.general_profile:
+        writeProfileReport(jobs.general_profile, reports, elapsed)
+
+    for inputFile, messages in failures:
+        print("\nERROR: " + inputFile, file = sys.stderr)
+        print(messages.rstrip(), file = sys.stderr)
+    print("\nDone. %d succeeded, %d failed." % (len(tasks) - len(failures), len(failures)))
+    print("Total time: %.2f s, %.2f fonts/s." % (elapsed, len(tasks) / max(elapsed, 1e-6)))
+    if failures:
+        return 1
+    return
+
+
+def collectBatchResults(results, total, reports):
+    failures = []
+    count = 0
+    for inputFile, outputFile, succeeded, messages, report in results:
+        count += 1
+        if report:
+            reports.append(report)
+        if succeeded:
+            print("[%d/%d] OK: %s -> %s" % (count, total, inputFile, outputFile))
+            for line in messages.splitlines():  # Warnings only
+                print("    " + line)
+        else:
+            print("[%d/%d] FAILED: %s" % (count, total, inputFile))
+            failures.append((inputFile, messages))
+    return failures
+
+
+# Runs in a worker process. Every font is isolated: whatever would have stopped
+# a single-font run, either sys.exit() or an exception, is collected as text instead.
+def processBatchItem(task):
+    paths, jobs, configDict = task
+    succeeded = False
+    report = None
+    stderr = sys.stderr
+    sys.stderr = StringIO()
+    try:
+        if not os.path.exists(paths.inputFile):
+            print("ERROR: Input font file does not exist.", file = sys.stderr)
+        elif getFontType(paths.inputFile) is None:
+            print("ERROR: Invalid font file. Only TTF, OTF, TTC and OTC are supported.", file = sys.stderr)
+        else:
+            report = rebuildFont(paths, jobs, copy.deepcopy(configDict))
+            succeeded = True
+    except SystemExit:
+        pass
+    except Exception:
+        traceback.print_exc(file = sys.stderr)
+    finally:
+        messages = sys.stderr.getvalue()
+        sys.stderr = stderr
+    return paths.inputFile, paths.outputFile, succeeded, messages, report
+
+
+# Directories are scanned (non-recursively) for TTF/OTF files, and wildcard patterns are
+# expanded here as well, so that they also work on shells that do not expand them.
+def expandInputs(inputPaths):
+    inputFiles = []
+    for inputPath in inputPaths:
+        if os.path.isdir(inputPath):
+            for fileName in sorted(os.listdir(inputPath)):
+                filePath = os.path.join(inputPath, fileName)
+                if os.path.isfile(filePath) and getFontType(filePath):
+                    inputFiles.append(filePath)
+        elif not os.path.exists(inputPath) and glob.has_magic(inputPath):
+            for filePath in sorted(glob.glob(inputPath)):
+                if os.path.isfile(filePath):
+                    inputFiles.append(filePath)
+        else:
+            inputFiles.append(inputPath)  # Missing files will be reported by the worker.
+    uniqueFiles = []
+    for inputFile in inputFiles:
+        if inputFile not in uniqueFiles:
+            uniqueFiles.append(inputFile)
+    return uniqueFiles
+
+
+# Same as makeOutputFileName(), but also avoids names already taken within this batch.
+def makeBatchOutputFileName(inputFile, outputDir, reservedOutputs):
+    outputFile = makeOutputFileName(inputFile, outputDir)
+    dirName, fileName = os.path.split(outputFile)
+    fileName, ext = os.path.splitext(fileName)
+    fileName = numberAddedRE.split(fileName)[0]
+    n = 1
+    while outputFile in reservedOutputs or os.path.exists(outputFile):
+        outputFile = os.path.join(dirName, fileName + "#" + repr(n) + ext)
+        n += 1
+    return outputFile
+
+
 def getConfigDict(configPath):
     configDict = None
     try:
@@ -305,16 +641,62 @@ def getConfigDict(configPath):
     return configDict
 
 
-def doJobs(ttfontObj, jobsObj, configDict = None):
-    doInits(ttfontObj, jobsObj)
-    doFixes(ttfontObj, jobsObj)
-    doRebuilds(ttfontObj, jobsObj, configDict)
-    doConverts(ttfontObj, jobsObj)
+# `convertedTables` is shared among the fonts of a collection; see Converter.Converter.
+def doJobs(ttfontObj, jobsObj, configDict = None, profiler = None, convertedTables = None):
+    if profiler is None:
+        profiler = Profiler.NullProfiler()
+    with profiler.stage("doInits"):
+        doInits(ttfontObj, jobsObj, profiler)
+    with profiler.stage("doFixes"):
+        doFixes(ttfontObj, jobsObj, profiler)
+    with profiler.stage("doRebuilds"):
+        doRebuilds(ttfontObj, jobsObj, configDict, profiler)
+    with profiler.stage("doConverts"):
+        doConverts(ttfontObj, jobsObj, profiler, convertedTables)
     return
 
 
-def doInits(ttfontObj, jobsObj):
-    init = Initializer.Initializer(ttfontObj, jobsObj)
+# Returns the tags of tables that the jobs might edit, or None if any table might be edited.
+# Other tables are only read, if ever, so they can be saved as they are. New jobs must be
+# added here; otrebuild_test checks every job's output against compiling all loaded tables.
+def getEditableTables(ttfontObj, jobsObj, configDict = None):
+    if jobsObj.init_refreshTables or jobsObj.convert_changeUPM:
+        return None
+    tags = set(["head", "hhea", "maxp", "OS/2", "cmap", "name"])  # Always edited by Fixer
+    if ttfontObj.has_key("CFF ") or jobsObj.init_removeGlyphNames:
+        tags.add("post")
+    if jobsObj.init_removeHinting:
+        tags.update(["glyf", "loca"])
+    if jobsObj.rebuild_gasp:
+        tags.add("gasp")
+    if jobsObj.rebuild_prep:
+        tags.add("prep")
+    if jobsObj.rebuild_DSIG:
+        tags.add("DSIG")
+    if configDict:
+        tags.update(["CFF ", "post", "vhea"])
+    if jobsObj.convert_otf2ttf:
+        tags.update(["glyf", "loca", "post", "prep", "gasp"])
+    if jobsObj.general_recalc:
+        tags.update(["CFF ", "glyf", "loca"])  # Bounding boxes are recalculated upon compile.
+    return tags
+
+
+# Drops decompiled tables which have not been edited, so that their original data is saved
+# instead of being compiled again.
+def releaseTables(ttfontObj, editableTables):
+    if editableTables is None or not ttfontObj.reader:
+        return
+    if ttfontObj.recalcBBoxes:  # Fixer might have turned it on.
+        editableTables = editableTables | set(["CFF ", "glyf", "loca"])
+    for tag in list(ttfontObj.tables.keys()):
+        if tag not in editableTables and ttfontObj.reader.has_key(tag):
+            del ttfontObj.tables[tag]  # Not `del ttfontObj[tag]`, which drops the data as well.
+    return
+
+
+def doInits(ttfontObj, jobsObj, profiler):
+    init = profiler.instrument(Initializer.Initializer(ttfontObj, jobsObj))
     if init.isSymbolFont():
         print("ERROR: Windows legacy symbol font detected. It is currently not supported.", file = sys.stderr)
         sys.exit(1)
@@ -336,8 +718,8 @@ def doInits(ttfontObj, jobsObj):
     return
 
 
-def doFixes(ttfontObj, jobsObj):
-    fixer = Fixer.Fixer(ttfontObj, jobsObj)
+def doFixes(ttfontObj, jobsObj, profiler):
+    fixer = profiler.instrument(Fixer.Fixer(ttfontObj, jobsObj))
     fixer.fixHeader()
     fixer.fixHead()
     fixer.fixHhea()
@@ -353,8 +735,8 @@ def doFixes(ttfontObj, jobsObj):
     return
 
 
-def doRebuilds(ttfontObj, jobsObj, configDict):
-    rebuilder = Rebuilder.Rebuilder(ttfontObj, jobsObj, configDict)
+def doRebuilds(ttfontObj, jobsObj, configDict, profiler):
+    rebuilder = profiler.instrument(Rebuilder.Rebuilder(ttfontObj, jobsObj, configDict))
     if jobsObj.rebuild_gasp:
         rebuilder.rebuildGasp()
     if jobsObj.rebuild_prep:
@@ -370,27 +752,73 @@ def doRebuilds(ttfontObj, jobsObj, configDict):
     return
 
 
-def doConverts(ttfontObj, jobsObj):
-    converter = Converter.Converter(ttfontObj, jobsObj)
+def doConverts(ttfontObj, jobsObj, profiler, convertedTables = None):
+    converter = profiler.instrument(Converter.Converter(ttfontObj, jobsObj, convertedTables))
     targetUPM = jobsObj.convert_changeUPM
     if jobsObj.convert_otf2ttf:
-        if jobsObj.init_removeGlyphNames:
-            converter.otf2ttf(
-                Constants.OTF2TTF_DFLT_MAX_ERR,
-                3.0,  # Ignore any stored glyph names.
-                Constants.OTF2TTF_DFLT_REVERSE
-                )
-        else:
-            converter.otf2ttf(
-                Constants.OTF2TTF_DFLT_MAX_ERR,
-                Constants.OTF2TTF_DFLT_POST_FORMAT,
-                Constants.OTF2TTF_DFLT_REVERSE
-                )
+        cache = openConvertCache(jobsObj)
+        try:
+            if jobsObj.init_removeGlyphNames:
+                converter.otf2ttf(
+                    Constants.OTF2TTF_DFLT_MAX_ERR,
+                    3.0,  # Ignore any stored glyph names.
+                    Constants.OTF2TTF_DFLT_REVERSE,
+                    jobsObj.convert_workers,
+                    cache,
+                    jobsObj.convert_vectorize,
+                    jobsObj.convert_composeDuplicates
+                    )
+            else:
+                converter.otf2ttf(
+                    Constants.OTF2TTF_DFLT_MAX_ERR,
+                    Constants.OTF2TTF_DFLT_POST_FORMAT,
+                    Constants.OTF2TTF_DFLT_REVERSE,
+                    jobsObj.convert_workers,
+                    cache,
+                    jobsObj.convert_vectorize,
+                    jobsObj.convert_composeDuplicates
+                    )
+        finally:
+            if cache:
+                cache.close()
     if targetUPM:
         converter.changeUPM(targetUPM)
     return
 
 
+def openConvertCache(jobsObj):
+    return openDiskCache(jobsObj, Constants.OTF2TTF_CACHE_FILE)
+
+
+def openTableCache(jobsObj):
+    if not jobsObj.general_cacheTables:
+        return None
+    diskCache = openDiskCache(jobsObj, Constants.TABLE_CACHE_FILE)
+    if diskCache is None:
+        return None
+    return Caches.TableCache(diskCache)
+
+
+def openDiskCache(jobsObj, cacheFile):
+    cacheDir = jobsObj.convert_cacheDir
+    if not cacheDir:
+        return None
+    if not os.path.isdir(cacheDir):
+        try:
+            os.makedirs(cacheDir)
+        except OSError:
+            if not os.path.isdir(cacheDir):  # Another batch worker may have just created it.
+                print("ERROR: Cannot create the cache directory.", file = sys.stderr)
+                sys.exit(1)
+    cacheSize = jobsObj.convert_cacheSize
+    if cacheSize is None:
+        cacheSize = Constants.OTF2TTF_DFLT_CACHE_SIZE
+    return Caches.DiskCache(
+        os.path.join(cacheDir, cacheFile),
+        max(0, cacheSize) * 1024 * 1024
+        )
+
+
 if __name__ == "__main__":
     sys.exit(main())
 
@@ -0,0 +1,152 @@
+from __future__ import print_function, division, absolute_import
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from otRebuilder.Lib import Caches
+from otRebuilder.test.otBase_test import makeGPOS
+from otRebuilder.test.sfnt_test import makeTestFontFile
+from fontTools.ttLib import TTFont
+
+
+class DiskCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempDir, "test.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_persistence(self):
+        cache = Caches.DiskCache(self.path, 1024)
+        key = Caches.DiskCache.makeKey("a", 1.0, True)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, b"\x00\x01\xff")
+        cache.close()
+
+        cache = Caches.DiskCache(self.path, 1024)
+        self.assertEqual(cache.get(key), b"\x00\x01\xff")
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        cache.close()
+
+    def test_keys(self):
+        makeKey = Caches.DiskCache.makeKey
+        self.assertEqual(makeKey("a", 1.0, True), makeKey("a", 1.0, True))
+        self.assertNotEqual(makeKey("a", 1.0, True), makeKey("a", 1.0, False))
+        self.assertNotEqual(makeKey("a", 1.0, True), makeKey("a", 0.5, True))
+
+    def test_hit_rate(self):
+        cache = Caches.DiskCache(self.path, 1024)
+        self.assertEqual(cache.hitRate(), 0.0)
+        cache.put("a", b"x")
+        cache.get("a")
+        cache.get("b")
+        cache.get("a")
+        cache.get("c")
+        self.assertEqual(cache.hitRate(), 0.5)
+        cache.close()
+
+    def test_lru_eviction(self):
+        cache = Caches.DiskCache(self.path, 30)
+        for key in ("a", "b", "c"):
+            cache.put(key, b"0123456789")
+            time.sleep(0.01)
+        cache.close()
+
+        cache = Caches.DiskCache(self.path, 30)
+        cache.get("a")  # "b" becomes the least recently used one.
+        time.sleep(0.01)
+        cache.put("d", b"0123456789")
+        cache.close()
+
+        cache = Caches.DiskCache(self.path, 30)
+        self.assertIsNone(cache.get("b"))
+        for key in ("a", "c", "d"):
+            self.assertEqual(cache.get(key), b"0123456789")
+        cache.close()
+
+
+    def test_shared(self):
+        # Two processes sharing --cacheDir, each with its cache open for the whole run
+        first = Caches.DiskCache(self.path, 1024, timeout = 1)
+        second = Caches.DiskCache(self.path, 1024, timeout = 1)
+        first.put("a", b"x")
+        second.put("b", b"y")  # Not locked out by the first one
+        first.putMany([("c", b"z"), ("d", b"w")])
+        second.putMany([("e", b"v")])
+        self.assertEqual(second.get("a"), b"x")
+        self.assertEqual(first.get("e"), b"v")
+        first.close()
+        second.close()
+        cache = Caches.DiskCache(self.path, 1024)
+        self.assertEqual([cache.get(key) for key in "abcde"], [b"x", b"y", b"z", b"w", b"v"])
+        cache.close()
+
+
+class TableCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.cachePath = os.path.join(self.tempDir, "tables.sqlite")
+        makeTestFontFile(os.path.join(self.tempDir, "test.ttf"))
+        font = TTFont(os.path.join(self.tempDir, "test.ttf"))
+        makeGPOS(font)
+        self.path = os.path.join(self.tempDir, "gpos.ttf")
+        font.save(self.path)
+        self.digest = Caches._sourceDigest
+
+    def tearDown(self):
+        Caches._sourceDigest = self.digest
+        shutil.rmtree(self.tempDir)
+
+    # Loads GPOS and hhea through a fresh cache, returning the cache and the font.
+    def loadTables(self):
+        tableStore = Caches.TableCache(Caches.DiskCache(self.cachePath, 1024 * 1024 * 1024))
+        font = TTFont(self.path, useMmap = True, tableStore = tableStore)
+        font["GPOS"]
+        font["hhea"]
+        tableStore.close()
+        return tableStore, font
+
+    def test_round_trip(self):
+        tableStore, font = self.loadTables()
+        self.assertEqual((tableStore.diskCache.hits, tableStore.diskCache.misses), (0, 1))
+        tableStore, cachedFont = self.loadTables()
+        self.assertEqual((tableStore.diskCache.hits, tableStore.diskCache.misses), (1, 0))  # Not for hhea
+        self.assertIsNot(cachedFont["GPOS"], font["GPOS"])
+        self.assertEqual(cachedFont.getTableData("GPOS"), font.getTableData("GPOS"))
+        cachedFont.close()
+        font.close()
+
+    def test_invalidation(self):
+        self.loadTables()[1].close()
+        mtime = os.path.getmtime(self.path)
+        os.utime(self.path, (mtime + 10, mtime + 10))
+        tableStore, font = self.loadTables()
+        self.assertEqual(tableStore.diskCache.hits, 0)
+        font.close()
+        Caches._sourceDigest = "0" * 40  # Another version of fontTools
+        tableStore, font = self.loadTables()
+        self.assertEqual(tableStore.diskCache.hits, 0)
+        font.close()
+
+    def test_font_reference(self):
+        tableStore, font = self.loadTables()
+        font["GPOS"].ttFont = font  # Never pickled along
+        tableStore = Caches.TableCache(Caches.DiskCache(self.cachePath, 1024 * 1024 * 1024))
+        tableStore.store(font, "GPOS", font["GPOS"])
+        cachedFont = TTFont(self.path, tableStore = tableStore)
+        self.assertIs(cachedFont["GPOS"].ttFont, cachedFont)
+        font["GPOS"].ttFont = lambda: None  # Not picklable, so not stored
+        tableStore.store(font, "GPOS", font["GPOS"])
+        self.assertIsNotNone(tableStore.load(cachedFont, "GPOS"))
+        tableStore.close()
+        cachedFont.close()
+        font.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
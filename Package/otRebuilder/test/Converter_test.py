@@ -0,0 +1,346 @@
+from __future__ import print_function, division, absolute_import
+import copy
+import os
+import unittest
+
+from otRebuilder.test import DATADIR
+from otRebuilder.Lib import Converter
+from otRebuilder.Lib import Fixer
+
+from fontTools.cffLib import CFFFontSet, TopDictIndex, TopDict, CharStrings, GlobalSubrsIndex, PrivateDict, IndexedStrings
+from fontTools.misc.transform import Scale
+from fontTools.pens.basePen import NullPen
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.transformPen import TransformPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib.tables._g_l_y_f import GlyphComponent
+from cu2qu.pens import Cu2QuPen
+from ufoLib.glifLib import GlyphSet
+
+
+MAX_ERR = 1.0
+
+
+def makeTestFont():
+    """Build a TrueType font out of RobotoSubset-Regular.ufo, plus a few
+    composites with offsets that do not scale to whole numbers. The subset
+    has no advance widths, so a fixed one is used."""
+    ufoGlyphs = GlyphSet(os.path.join(DATADIR, "RobotoSubset-Regular.ufo", "glyphs"))
+    glyphOrder = [".notdef"] + sorted(ufoGlyphs.keys())
+    glyphs = {}
+    for glyphName in glyphOrder[1:]:
+        ufoGlyph = ufoGlyphs[glyphName]
+        ttPen = TTGlyphPen(None)
+        ufoGlyph.draw(Cu2QuPen(ttPen, MAX_ERR, reverse_direction=True))
+        glyphs[glyphName] = ttPen.glyph()
+    glyphs[".notdef"] = TTGlyphPen(None).glyph()
+    for glyphName, components in (
+            ("Aacute", (("A", 0, 0), ("a", 101, 1463))),
+            ("Oslash", (("O", -33, 7), ("slash", 257, -75)))):
+        glyphOrder.append(glyphName)
+        glyph = TTGlyphPen(None).glyph()
+        glyph.numberOfContours = -1
+        glyph.components = []
+        for baseName, x, y in components:
+            if baseName not in glyphs:
+                baseName = "l"
+            component = GlyphComponent()
+            component.glyphName = baseName
+            component.x, component.y = x, y
+            component.flags = 0x4
+            glyph.components.append(component)
+        glyphs[glyphName] = glyph
+
+    font = TTFont()
+    font.setGlyphOrder(glyphOrder)
+    glyf = font["glyf"] = newTable("glyf")
+    glyf.glyphOrder = glyphOrder
+    glyf.glyphs = glyphs
+    head = font["head"] = newTable("head")
+    head.unitsPerEm = 2048
+    head.xMin = head.yMin = head.xMax = head.yMax = 0
+    hmtx = font["hmtx"] = newTable("hmtx")
+    hmtx.metrics = {}
+    for glyphName in glyphOrder:
+        glyph = glyf[glyphName]
+        glyph.recalcBounds(glyf)
+        hmtx.metrics[glyphName] = (1200, getattr(glyph, "xMin", 0))
+    # An outline whose lsb does not match its xMin gets drawn at lsb.
+    hmtx.metrics["b"] = (1200, hmtx.metrics["b"][1] + 7)
+    return font
+
+
+def makeTestCFFFont():
+    """Build a CFF-based font out of RobotoSubset-Regular.ufo, plus a few
+    glyphs duplicating others: at the same place, moved by whole units, and
+    moved by half a unit."""
+    ufoGlyphs = GlyphSet(os.path.join(DATADIR, "RobotoSubset-Regular.ufo", "glyphs"))
+    glyphs = [(glyphName, glyphName, (0, 0)) for glyphName in sorted(ufoGlyphs.keys())]
+    glyphs += [("A.copy", "A", (0, 0)), ("o.sup", "o", (10, 500)), ("e.half", "e", (0.5, 0))]
+    glyphOrder = [".notdef"] + [glyphName for glyphName, _, _ in glyphs]
+    private = PrivateDict()
+    globalSubrs = GlobalSubrsIndex()
+    topDict = TopDict(GlobalSubrs = globalSubrs)
+    topDict.charset = glyphOrder
+    topDict.Private = private
+    charStrings = topDict.CharStrings = CharStrings(None, glyphOrder, globalSubrs, private, None, None)
+    charStrings[".notdef"] = T2CharStringPen(500, None).getCharString(private, globalSubrs)
+    for glyphName, baseName, offset in glyphs:
+        t2Pen = T2CharStringPen(1200, None, roundTolerance = 0)
+        ufoGlyphs[baseName].draw(TransformPen(t2Pen, (1, 0, 0, 1) + offset))
+        charStrings[glyphName] = t2Pen.getCharString(private, globalSubrs)
+    fontSet = CFFFontSet()
+    fontSet.major, fontSet.minor = 1, 0
+    fontSet.fontNames = ["Test"]
+    fontSet.topDictIndex = TopDictIndex()
+    fontSet.topDictIndex.append(topDict)
+    fontSet.GlobalSubrs = globalSubrs
+    fontSet.strings = IndexedStrings()
+
+    font = TTFont(sfntVersion = "OTTO")
+    font.setGlyphOrder(glyphOrder)
+    font["CFF "] = newTable("CFF ")
+    font["CFF "].cff = fontSet
+    head = font["head"] = newTable("head")
+    head.unitsPerEm = 2048
+    post = font["post"] = newTable("post")
+    post.formatType = 3.0
+    hmtx = font["hmtx"] = newTable("hmtx")
+    hmtx.metrics = dict((glyphName, (1200, 0)) for glyphName in glyphOrder)
+    return font
+
+
+def makeScalableCFFFont():
+    """makeTestCFFFont() with the values that Fixer.fixFromCFF() copies from
+    `CFF ` to `head` and `post`, and a `VORG` table."""
+    font = makeTestCFFFont()
+    topDict = font["CFF "].cff.topDictIndex[0]
+    topDict.recalcFontBBox()
+    topDict.UnderlinePosition = -150
+    head = font["head"]
+    head.xMin, head.yMin, head.xMax, head.yMax = topDict.FontBBox
+    post = font["post"]
+    post.underlinePosition = -150
+    post.underlineThickness = 50
+    vorg = font["VORG"] = newTable("VORG")
+    vorg.majorVersion, vorg.minorVersion = 1, 0
+    vorg.defaultVertOriginY = 1800
+    vorg.VOriginRecords = {"A": 1901, "o.sup": 1333}
+    return font
+
+
+def changeUPMWithPens(font, targetUPM):
+    """The former Converter.changeUPM glyph loop, kept here as reference."""
+    scaleFactor = targetUPM / font["head"].unitsPerEm
+    scaledGlyphs = {}
+    glyphSet = font.getGlyphSet()
+    for glyphName in glyphSet.keys():
+        glyph = glyphSet[glyphName]
+        basePen = TTGlyphPen(glyphSet)
+        scalePen = TransformPen(basePen, Scale(scaleFactor, scaleFactor))
+        if glyph._glyph.isComposite():
+            glyph.draw(basePen)
+            for i in range(len(basePen.components)):
+                componentName, oldTrans = basePen.components[i]
+                newTrans = oldTrans[:4] + (oldTrans[4] * scaleFactor, oldTrans[5] * scaleFactor)
+                basePen.components[i] = (componentName, newTrans)
+        else:
+            glyph.draw(scalePen)
+        scaledGlyphs[glyphName] = basePen.glyph()
+    glyf = newTable("glyf")
+    glyf.glyphOrder = font.getGlyphOrder()
+    glyf.glyphs = scaledGlyphs
+    return glyf
+
+
+class ChangeUPMTest(unittest.TestCase):
+
+    def assertSameGlyf(self, expected, actual):
+        self.assertEqual(expected.glyphOrder, actual.glyphOrder)
+        for glyphName in expected.glyphOrder:
+            self.assertEqual(
+                expected[glyphName].compile(expected, True),
+                actual[glyphName].compile(actual, True),
+                "glyph '%s' differs from the pen output" % glyphName)
+
+    def checkUPM(self, targetUPM):
+        font = makeTestFont()
+        expected = changeUPMWithPens(copy.deepcopy(font), targetUPM)
+        Converter.Converter(font, None).changeUPM(targetUPM)
+        self.assertEqual(font["head"].unitsPerEm, targetUPM)
+        self.assertSameGlyf(expected, font["glyf"])
+
+    def test_scale_down(self):
+        self.checkUPM(1000)
+
+    def test_scale_up(self):
+        self.checkUPM(4096)
+
+    def test_scale_odd_factor(self):
+        self.checkUPM(1234)
+
+    def test_shared_tables(self):
+        # Two fonts of a collection, sharing everything but `head`
+        font = makeTestFont()
+        expected = changeUPMWithPens(copy.deepcopy(font), 1000)
+        advance, lsb = font["hmtx"]["b"]
+        other = TTFont()
+        other.setGlyphOrder(font.getGlyphOrder())
+        for tag in ("glyf", "hmtx"):
+            other[tag] = font[tag]
+        other["head"] = copy.deepcopy(font["head"])
+        convertedTables = {}
+        Converter.Converter(font, None, convertedTables).changeUPM(1000)
+        Converter.Converter(other, None, convertedTables).changeUPM(1000)
+        self.assertEqual(other["head"].unitsPerEm, 1000)
+        self.assertSameGlyf(expected, font["glyf"])
+        self.assertEqual(font["hmtx"]["b"], (round(advance * 1000 / 2048), round(lsb * 1000 / 2048)))
+
+    def test_after_otf2ttf(self):
+        # Glyphs made by --otf2ttf have no bounds until compiled.
+        font = makeScalableCFFFont()
+        Converter.Converter(font, None).otf2ttf(MAX_ERR)
+        expected = changeUPMWithPens(copy.deepcopy(font), 1000)
+        Converter.Converter(font, None).changeUPM(1000)
+        self.assertEqual(font["head"].unitsPerEm, 1000)
+        self.assertSameGlyf(expected, font["glyf"])
+
+    def test_hinting_removed(self):
+        font = makeTestFont()
+        Converter.Converter(font, None).changeUPM(1000)
+        glyf = font["glyf"]
+        for glyphName in glyf.keys():
+            glyph = glyf[glyphName]
+            if glyph.isComposite():
+                self.assertFalse(hasattr(glyph, "program"))
+            elif glyph.numberOfContours > 0:
+                self.assertEqual(glyph.program.getBytecode(), b"")
+
+    def test_cff(self):
+        # The charstrings are scaled in place, see Scalers_test for their outlines.
+        font = makeScalableCFFFont()
+        topDict = font["CFF "].cff.topDictIndex[0]
+        widths = {}
+        for glyphName in font.getGlyphOrder():
+            topDict.CharStrings[glyphName].draw(NullPen())
+            widths[glyphName] = topDict.CharStrings[glyphName].width
+        Converter.Converter(font, None).changeUPM(1000)
+        self.assertEqual(font["head"].unitsPerEm, 1000)
+        self.assertNotIn("glyf", font)
+        self.assertEqual(topDict.FontMatrix, [0.001 * 2.048, 0, 0, 0.001 * 2.048, 0, 0])
+        for glyphName in font.getGlyphOrder():
+            charString = topDict.CharStrings[glyphName]
+            charString.draw(NullPen())
+            self.assertEqual(charString.width, int(round(widths[glyphName] * 1000 / 2048)), glyphName)
+        self.assertEqual(font["hmtx"]["A"][0], int(round(1200 * 1000 / 2048)))
+        self.assertEqual(font["VORG"].defaultVertOriginY, int(round(1800 * 1000 / 2048)))
+        self.assertEqual(font["VORG"].VOriginRecords, {"A": int(round(1901 * 1000 / 2048)), "o.sup": int(round(1333 * 1000 / 2048))})
+
+    def test_cff_collection(self):
+        # Two faces of a collection sharing `CFF `, each fixed and then converted in turn like otrebuild does
+        font = makeScalableCFFFont()
+        fontBBox = [int(round(value * 1000 / 2048)) for value in font["CFF "].cff.topDictIndex[0].FontBBox]
+        other = TTFont(sfntVersion = "OTTO")
+        other.setGlyphOrder(font.getGlyphOrder())
+        for tag in ("CFF ", "hmtx", "VORG"):
+            other[tag] = font[tag]
+        for tag in ("head", "post"):
+            other[tag] = copy.deepcopy(font[tag])
+        convertedTables = {}
+        for face in (font, other):
+            Fixer.Fixer(face, None).fixFromCFF()
+            Converter.Converter(face, None, convertedTables).changeUPM(1000)
+        self.assertEqual(font["CFF "].cff.topDictIndex[0].FontBBox, fontBBox)
+        for face in (font, other):
+            head = face["head"]
+            self.assertEqual(head.unitsPerEm, 1000)
+            self.assertEqual([head.xMin, head.yMin, head.xMax, head.yMax], fontBBox)
+            self.assertEqual(face["post"].underlinePosition, int(round(-150 * 1000 / 2048)))
+            self.assertEqual(face["post"].underlineThickness, int(round(50 * 1000 / 2048)))
+        self.assertEqual(font["VORG"].defaultVertOriginY, int(round(1800 * 1000 / 2048)))
+
+    @unittest.skipIf(Converter.numpy is None, "numpy not installed")
+    def test_without_numpy(self):
+        numpy = Converter.numpy
+        Converter.numpy = None
+        try:
+            self.checkUPM(1000)
+        finally:
+            Converter.numpy = numpy
+
+
+
+class Otf2ttfTest(unittest.TestCase):
+
+    def setUp(self):
+        self.font = makeTestCFFFont()
+        # The former conversion, drawing every glyph through pens on its own
+        self.expected = {}
+        glyphSet = self.font.getGlyphSet()
+        for glyphName in glyphSet.keys():
+            ttPen = TTGlyphPen(None)
+            glyphSet[glyphName].draw(Cu2QuPen(ttPen, MAX_ERR, True))
+            self.expected[glyphName] = ttPen.glyph().compile(None, True)
+        self.drawGlyphs = Converter._otf2ttfDrawGlyphs
+        self.converted = []
+        def countingDrawGlyphs(glyphs, *args):
+            self.converted.extend(glyphName for glyphName, _ in glyphs)
+            return self.drawGlyphs(glyphs, *args)
+        Converter._otf2ttfDrawGlyphs = countingDrawGlyphs
+
+    def tearDown(self):
+        Converter._otf2ttfDrawGlyphs = self.drawGlyphs
+
+    def convert(self, composeDuplicates):
+        Converter.Converter(self.font, None).otf2ttf(MAX_ERR, composeDuplicates = composeDuplicates)
+        self.assertNotIn("CFF ", self.font)
+        return self.font["glyf"]
+
+    def test_same_output(self):
+        glyf = self.convert(False)
+        for glyphName, glyphData in self.expected.items():
+            self.assertEqual(glyf[glyphName].compile(glyf, True), glyphData, "glyph '%s' differs" % glyphName)
+        self.assertNotIn("A.copy", self.converted)
+        self.assertIn("o.sup", self.converted)
+        self.assertEqual(len(self.converted), len(self.expected) - 1)
+
+    def test_compose_duplicates(self):
+        glyf = self.convert(True)
+        for glyphName, (baseName, x, y) in (("A.copy", ("A", 0, 0)), ("o.sup", ("o", 10, 500))):
+            glyph = glyf[glyphName]
+            self.assertTrue(glyph.isComposite())
+            self.assertEqual([(c.glyphName, c.x, c.y) for c in glyph.components], [(baseName, x, y)])
+            self.assertNotIn(glyphName, self.converted)
+        self.assertFalse(glyf["e.half"].isComposite())  # Cannot be moved by half a unit
+        for glyphName, glyphData in self.expected.items():
+            if not glyf[glyphName].isComposite():
+                self.assertEqual(glyf[glyphName].compile(glyf, True), glyphData, "glyph '%s' differs" % glyphName)
+        self.assertEqual(self.font["maxp"].maxComponentElements, 1)
+
+    def test_workers(self):
+        tables = []
+        for workers in (1, 2):
+            font = makeTestCFFFont()
+            Converter.Converter(font, None).otf2ttf(MAX_ERR, workers = workers)
+            font["hhea"] = newTable("hhea")
+            # `glyf` comes first, as compiling it sets the offsets of `loca`.
+            tables.append([font[tag].compile(font) for tag in ("glyf", "loca", "hmtx")])
+        self.assertEqual(tables[1], tables[0])
+
+
+class Otf2ttfDrawGlyphsTest(unittest.TestCase):
+
+    def test_vectorize(self):
+        ufoGlyphs = GlyphSet(os.path.join(DATADIR, "RobotoSubset-Regular.ufo", "glyphs"))
+        glyphs = [(glyphName, ufoGlyphs[glyphName]) for glyphName in sorted(ufoGlyphs.keys())]
+        expected = list(Converter._otf2ttfDrawGlyphs(glyphs, MAX_ERR, True, False))
+        actual = list(Converter._otf2ttfDrawGlyphs(glyphs, MAX_ERR, True, True))
+        self.assertEqual([glyphName for glyphName, _ in actual], [glyphName for glyphName, _ in expected])
+        for (glyphName, expectedGlyph), (_, actualGlyph) in zip(expected, actual):
+            self.assertEqual(actualGlyph, expectedGlyph, "glyph '%s' differs" % glyphName)
+        self.assertTrue(any(glyph.numberOfContours > 0 for _, glyph in actual))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+from __future__ import print_function, division, absolute_import
+import unittest
+
+import otRebuilder.test
+from otRebuilder.test.Converter_test import makeTestCFFFont
+from otRebuilder.Lib import Converter, Outlines
+
+from fontTools.cffLib import PrivateDict
+from fontTools.misc.psCharStrings import T2CharString
+from fontTools.pens.recordingPen import RecordingPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from cu2qu.batch import numpy
+from cu2qu.pens import Cu2QuPen
+
+
+MAX_ERR = 1.0
+
+# Outlines that the pens handle in special ways: lines and curves back to the start point,
+# zero-length lines, lone points, drawing before any moveto, and most curve operators.
+PROGRAMS = {
+    "closingLine": [100, 0, "rmoveto", 200, 0, 0, 300, -200, 0, 0, -300, "rlineto", "endchar"],
+    "closingCurve": [0, 0, "rmoveto", 100, 0, 100, 100, 0, 100, -100, 0, -100, -100, 0, -100, "rrcurveto", "endchar"],
+    "zeroLineFirst": [50, 50, "rmoveto", 0, 0, "rlineto", 100, 100, 100, 100, "hvcurveto", -100, "hlineto", "endchar"],
+    "zeroLineOnly": [50, 50, "rmoveto", 0, 0, "rlineto", 10, 10, "rmoveto", 10, "vlineto", "endchar"],
+    "lonePoints": [50, "hmoveto", 30, "vmoveto", 5, 20, 20, 0, 20, "vvcurveto", "endchar"],
+    "noMoveTo": [20, 30, "rlineto", 40, 20, 10, 30, 20, "hhcurveto", "endchar"],
+    "flexes": [
+        500, 0, 0, "rmoveto", 10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 110, 120, 50, "flex",
+        10, 20, 5, 30, 40, 50, 60, "hflex", 10, 5, 20, 5, 30, 40, 50, 5, 60, "hflex1",
+        10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 30, "flex1", 0.5, -20.25, "rlineto", "endchar"],
+    "mixed": [
+        10, 20, 30, 40, "hstemhm", 10, 20, "hintmask", b"\xc0", 0, 0, "rmoveto",
+        10, 10, 20, 20, 30, 0, 40, 50, "rcurveline", 10, 0, 0, 10, 20, 20, 30, 30, 40, -40, "rlinecurve",
+        30, 20, 10, 40, 50, 60, 70, 80, 90, "vhcurveto", "endchar"],
+    }
+
+
+def makeCharString(program):
+    private = PrivateDict()
+    private.nominalWidthX = private.defaultWidthX = 0
+    return T2CharString(program = list(program), private = private)
+
+
+def drawWithPens(charString, reverseDirection):
+    ttPen = TTGlyphPen(None)
+    charString.draw(Cu2QuPen(ttPen, MAX_ERR, reverseDirection))
+    return ttPen.glyph()
+
+
+class CharStringConverterTest(unittest.TestCase):
+
+    def setUp(self):
+        charStrings = list(makeTestCFFFont()["CFF "].cff.values())[0].CharStrings
+        self.charStrings = [(glyphName, charStrings[glyphName]) for glyphName in charStrings.keys()]
+        self.charStrings += [(name, makeCharString(program)) for name, program in sorted(PROGRAMS.items())]
+
+    def assertSameGlyphs(self, expected, actual):
+        self.assertEqual([glyphName for glyphName, _ in actual], [glyphName for glyphName, _ in expected])
+        for (glyphName, expectedGlyph), (_, actualGlyph) in zip(expected, actual):
+            self.assertEqual(list(actualGlyph.coordinates), list(expectedGlyph.coordinates), glyphName)
+            self.assertEqual(list(actualGlyph.flags), list(expectedGlyph.flags), glyphName)
+            self.assertEqual(actualGlyph.endPtsOfContours, expectedGlyph.endPtsOfContours, glyphName)
+            self.assertEqual(actualGlyph.compile(None, True), expectedGlyph.compile(None, True), glyphName)
+
+    def checkConvert(self, reverseDirection, vectorize):
+        expected = [(glyphName, drawWithPens(charString, reverseDirection)) for glyphName, charString in self.charStrings]
+        converter = Outlines.CharStringConverter(MAX_ERR, reverseDirection, vectorize)
+        for glyphName, charString in self.charStrings:
+            converter.addCharString(glyphName, charString)
+        self.assertEqual(converter.unsupported, [])
+        self.assertSameGlyphs(expected, converter.glyphs())
+
+    def test_same_as_pens(self):
+        self.checkConvert(True, False)
+
+    def test_same_as_pens_forward(self):
+        self.checkConvert(False, False)
+
+    @unittest.skipIf(numpy is None, "numpy not installed")
+    def test_same_as_pens_vectorized(self):
+        self.checkConvert(True, True)
+
+    def test_record(self):
+        for glyphName, charString in self.charStrings:
+            recPen = RecordingPen()
+            charString.draw(recPen)
+            # The same numbers of the same types, as recordings key the otf2ttf cache by their repr().
+            self.assertEqual(repr(Outlines.recordCharString(charString)), repr(recPen.value), glyphName)
+
+    def test_seac(self):
+        seac = makeCharString([0, 0, 65, 194, "endchar"])  # "A" and "acute" from StandardEncoding
+        self.assertRaises(Outlines.UnsupportedOutline, Outlines.recordCharString, seac)
+        glyphs = self.charStrings[:3] + [("Aacute", seac)]
+        converter = Outlines.CharStringConverter(MAX_ERR)
+        for glyphName, charString in glyphs:
+            converter.addCharString(glyphName, charString)
+        self.assertEqual(converter.unsupported, ["Aacute"])
+        self.assertEqual(len(converter.glyphs()), 3)
+
+        # Left to the pens by otf2ttf
+        quadGlyphs = dict(Converter._otf2ttfDrawGlyphs(glyphs, MAX_ERR, True, False))
+        self.assertEqual([component.glyphName for component in quadGlyphs["Aacute"].components], ["A", "acute"])
+        self.assertEqual(quadGlyphs[glyphs[0][0]].compile(None, True), drawWithPens(glyphs[0][1], True).compile(None, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
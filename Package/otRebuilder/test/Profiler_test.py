@@ -0,0 +1,78 @@
+from __future__ import print_function, division, absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+
+from otRebuilder.Lib import Profiler
+from otRebuilder.test.sfnt_test import makeTestFontFile
+
+
+class Worker(object):
+
+    def work(self):
+        return 42
+
+    def _private(self):
+        return 0
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempDir, "test.ttf")
+        makeTestFontFile(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def test_stages_and_methods(self):
+        profiler = Profiler.Profiler()
+        worker = profiler.instrument(Worker())
+        with profiler.stage("doFixes"):
+            self.assertEqual(worker.work(), 42)
+            worker._private()
+        report = profiler.getReport()
+        self.assertEqual([stage["name"] for stage in report["stages"]], ["doFixes"])
+        self.assertEqual([method["name"] for method in report["methods"]], ["Worker.work"])
+        self.assertGreaterEqual(report["totalTime"], 0.0)
+
+    @unittest.skipIf(Profiler.getMaxRSS() is None, "no peak memory on this platform")
+    def test_memory_growth(self):
+        profiler = Profiler.Profiler()
+        with profiler.stage("grow"):
+            data = bytearray(64 * 1024 * 1024)
+        del data
+        with profiler.stage("reuse"):
+            data = bytearray(32 * 1024 * 1024)  # Within the earlier peak
+        del data
+        grow, reuse = profiler.getReport()["stages"]
+        self.assertGreaterEqual(grow["maxRSSGrowth"], 32 * 1024)
+        self.assertLess(reuse["maxRSSGrowth"], 16 * 1024)
+        self.assertGreaterEqual(reuse["maxRSS"], grow["maxRSS"])
+
+    def test_tables(self):
+        profiler = Profiler.Profiler()
+        font = profiler.getTTFontClass()(self.path)
+        font["glyf"]  # Also loads `loca`
+        self.assertIsNone(font.get("CFF "))
+        font.save(os.path.join(self.tempDir, "output.ttf"))
+        font.close()
+        tables = profiler.getReport()["tables"]
+        self.assertIn("decompile", tables["glyf"])
+        self.assertIn("decompile", tables["loca"])
+        self.assertIn("compile", tables["glyf"])
+        self.assertNotIn("CFF ", tables)
+
+    def test_null_profiler(self):
+        profiler = Profiler.NullProfiler()
+        worker = Worker()
+        self.assertIs(profiler.instrument(worker), worker)
+        with profiler.stage("doFixes"):
+            pass
+        self.assertIsNone(profiler.getReport())
+
+
+if __name__ == "__main__":
+    unittest.main()
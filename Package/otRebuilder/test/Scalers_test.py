@@ -0,0 +1,477 @@
+from __future__ import print_function, division, absolute_import
+import io
+import struct
+import unittest
+
+import otRebuilder.test
+from otRebuilder.test.Converter_test import makeTestCFFFont
+from otRebuilder.Lib import Scalers
+
+from fontTools.cffLib import SubrsIndex
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.misc.psCharStrings import T2CharString
+from fontTools.misc.xmlWriter import XMLWriter
+from fontTools.pens.recordingPen import RecordingPen
+from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib.tables import otTables
+
+
+GLYPHS = [".notdef", "a", "b", "c", "f", "i", "f_i", "acute", "grave", "parenleft", "parenleft.ext"]
+
+FEATURES = """
+languagesystem DFLT dflt;
+markClass [acute] <anchor 150 -12> @TOP;
+markClass [grave] <anchor 75 -30> @BOTTOM;
+@FIRST = [a b];
+@SECOND = [c f];
+lookup SINGLE {
+    pos a <3 5 7 9>;
+    pos [b c] -33;
+} SINGLE;
+lookup PAIRS {
+    enum pos a [b c] -41;
+    pos f i <-5 0 -11 0>;
+} PAIRS;
+lookup CLASSES {
+    pos @FIRST @SECOND 25;
+} CLASSES;
+lookup CURSIVE {
+    pos cursive a <anchor 0 100> <anchor 511 100>;
+    pos cursive b <anchor NULL> <anchor 511 100>;
+} CURSIVE;
+feature kern {
+    lookup SINGLE;
+    lookup PAIRS;
+    lookup CLASSES;
+    lookup CURSIVE;
+} kern;
+feature mark {
+    pos base [a b] <anchor 251 503> mark @TOP <anchor 251 -101> mark @BOTTOM;
+    pos base c <anchor 251 503> mark @TOP <anchor 250 -99> mark @BOTTOM;
+    pos ligature f_i <anchor 111 503> mark @TOP <anchor NULL> mark @BOTTOM
+        ligComponent <anchor 333 503> mark @TOP <anchor 333 -101> mark @BOTTOM;
+} mark;
+feature mkmk {
+    pos mark acute <anchor 150 257> mark @TOP;
+} mkmk;
+"""
+
+BASE = """<BASE>
+  <Version value="0x00010000"/>
+  <HorizAxis>
+    <BaseTagList>
+      <BaselineTag index="0" value="ideo"/>
+      <BaselineTag index="1" value="romn"/>
+    </BaseTagList>
+    <BaseScriptList>
+      <BaseScriptRecord index="0">
+        <BaseScriptTag value="latn"/>
+        <BaseScript>
+          <BaseValues>
+            <DefaultIndex value="1"/>
+            <BaseCoord index="0" Format="1">
+              <Coordinate value="-121"/>
+            </BaseCoord>
+            <BaseCoord index="1" Format="1">
+              <Coordinate value="0"/>
+            </BaseCoord>
+          </BaseValues>
+          <DefaultMinMax>
+            <MinCoord Format="1">
+              <Coordinate value="-205"/>
+            </MinCoord>
+            <MaxCoord Format="2">
+              <Coordinate value="797"/>
+              <ReferenceGlyph value="a"/>
+              <BaseCoordPoint value="3"/>
+            </MaxCoord>
+            <FeatMinMaxRecord index="0">
+              <FeatureTableTag value="kern"/>
+              <MinCoord Format="1">
+                <Coordinate value="-333"/>
+              </MinCoord>
+            </FeatMinMaxRecord>
+          </DefaultMinMax>
+          <BaseLangSysRecord index="0">
+            <BaseLangSysTag value="TRK "/>
+            <MinMax>
+              <MaxCoord Format="1">
+                <Coordinate value="911"/>
+              </MaxCoord>
+            </MinMax>
+          </BaseLangSysRecord>
+        </BaseScript>
+      </BaseScriptRecord>
+    </BaseScriptList>
+  </HorizAxis>
+</BASE>"""
+
+JSTF = """<JSTF>
+  <Version value="0x00010000"/>
+  <JstfScriptRecord index="0">
+    <JstfScriptTag value="latn"/>
+    <JstfScript>
+      <DefJstfLangSys>
+        <JstfPriority index="0">
+          <ShrinkageJstfMax>
+            <Lookup index="0">
+              <LookupType value="1"/>
+              <LookupFlag value="0"/>
+              <SinglePos index="0" Format="1">
+                <Coverage Format="1">
+                  <Glyph value="a"/>
+                </Coverage>
+                <ValueFormat value="4"/>
+                <Value XAdvance="-57"/>
+              </SinglePos>
+            </Lookup>
+          </ShrinkageJstfMax>
+          <ExtensionJstfMax>
+            <Lookup index="0">
+              <LookupType value="1"/>
+              <LookupFlag value="0"/>
+              <SinglePos index="0" Format="1">
+                <Coverage Format="1">
+                  <Glyph value="a"/>
+                </Coverage>
+                <ValueFormat value="5"/>
+                <Value XPlacement="13" XAdvance="115"/>
+              </SinglePos>
+            </Lookup>
+          </ExtensionJstfMax>
+        </JstfPriority>
+      </DefJstfLangSys>
+    </JstfScript>
+  </JstfScriptRecord>
+</JSTF>"""
+
+MATH = """<MATH>
+  <Version value="0x00010000"/>
+  <MathConstants>
+    <ScriptPercentScaleDown value="80"/>
+    <ScriptScriptPercentScaleDown value="60"/>
+    <DelimitedSubFormulaMinHeight value="3072"/>
+    <DisplayOperatorMinHeight value="2013"/>
+    %s
+    <RadicalDegreeBottomRaisePercent value="65"/>
+  </MathConstants>
+  <MathGlyphInfo>
+    <MathItalicsCorrectionInfo>
+      <Coverage Format="1">
+        <Glyph value="f"/>
+      </Coverage>
+      <ItalicsCorrection index="0">
+        <Value value="37"/>
+      </ItalicsCorrection>
+    </MathItalicsCorrectionInfo>
+    <MathTopAccentAttachment>
+      <TopAccentCoverage Format="1">
+        <Glyph value="a"/>
+        <Glyph value="b"/>
+      </TopAccentCoverage>
+      <TopAccentAttachment index="0">
+        <Value value="251"/>
+      </TopAccentAttachment>
+      <TopAccentAttachment index="1">
+        <Value value="-13"/>
+      </TopAccentAttachment>
+    </MathTopAccentAttachment>
+    <MathKernInfo>
+      <MathKernCoverage Format="1">
+        <Glyph value="f"/>
+      </MathKernCoverage>
+      <MathKernInfoRecords index="0">
+        <TopRightMathKern>
+          <CorrectionHeight index="0">
+            <Value value="503"/>
+          </CorrectionHeight>
+          <KernValue index="0">
+            <Value value="-55"/>
+          </KernValue>
+          <KernValue index="1">
+            <Value value="21"/>
+          </KernValue>
+        </TopRightMathKern>
+      </MathKernInfoRecords>
+    </MathKernInfo>
+  </MathGlyphInfo>
+  <MathVariants>
+    <MinConnectorOverlap value="41"/>
+    <VertGlyphCoverage Format="1">
+      <Glyph value="parenleft"/>
+    </VertGlyphCoverage>
+    <VertGlyphConstruction index="0">
+      <GlyphAssembly>
+        <ItalicsCorrection>
+          <Value value="7"/>
+        </ItalicsCorrection>
+        <PartRecords index="0">
+          <glyph value="parenleft.ext"/>
+          <StartConnectorLength value="333"/>
+          <EndConnectorLength value="335"/>
+          <FullAdvance value="1001"/>
+          <PartFlags value="1"/>
+        </PartRecords>
+      </GlyphAssembly>
+      <MathGlyphVariantRecord index="0">
+        <VariantGlyph value="parenleft"/>
+        <AdvanceMeasurement value="1493"/>
+      </MathGlyphVariantRecord>
+    </VertGlyphConstruction>
+  </MathVariants>
+</MATH>"""
+
+MATH_VALUE_NAMES = """MathLeading AxisHeight AccentBaseHeight FlattenedAccentBaseHeight SubscriptShiftDown
+    SubscriptTopMax SubscriptBaselineDropMin SuperscriptShiftUp SuperscriptShiftUpCramped SuperscriptBottomMin
+    SuperscriptBaselineDropMax SubSuperscriptGapMin SuperscriptBottomMaxWithSubscript SpaceAfterScript
+    UpperLimitGapMin UpperLimitBaselineRiseMin LowerLimitGapMin LowerLimitBaselineDropMin StackTopShiftUp
+    StackTopDisplayStyleShiftUp StackBottomShiftDown StackBottomDisplayStyleShiftDown StackGapMin
+    StackDisplayStyleGapMin StretchStackTopShiftUp StretchStackBottomShiftDown StretchStackGapAboveMin
+    StretchStackGapBelowMin FractionNumeratorShiftUp FractionNumeratorDisplayStyleShiftUp
+    FractionDenominatorShiftDown FractionDenominatorDisplayStyleShiftDown FractionNumeratorGapMin
+    FractionNumDisplayStyleGapMin FractionRuleThickness FractionDenominatorGapMin FractionDenomDisplayStyleGapMin
+    SkewedFractionHorizontalGap SkewedFractionVerticalGap OverbarVerticalGap OverbarRuleThickness
+    OverbarExtraAscender UnderbarVerticalGap UnderbarRuleThickness UnderbarExtraDescender RadicalVerticalGap
+    RadicalDisplayStyleVerticalGap RadicalRuleThickness RadicalExtraAscender RadicalKernBeforeDegree
+    RadicalKernAfterDegree""".split()
+
+# Fields in design units, as named in otData
+SCALED_FIELDS = set([
+    "XPlacement", "YPlacement", "XAdvance", "YAdvance", "XCoordinate", "YCoordinate", "Coordinate", "Value",
+    "DelimitedSubFormulaMinHeight", "DisplayOperatorMinHeight", "MinConnectorOverlap", "AdvanceMeasurement",
+    "StartConnectorLength", "EndConnectorLength", "FullAdvance",
+    ])
+
+# Subroutines are numbered from -107 on, when there are fewer than 1240 of them.
+LOCAL_SUBRS = [
+    [100, 0, "rlineto", 0, 100, "rlineto", "return"],
+    [10, 21, 33, 47, 51, 63, "return"],  # Operands of the caller's operator
+    ["hintmask", b"\x80", 203, "hlineto", "return"],
+    ]
+GLOBAL_SUBRS = [
+    [-307, "hlineto", "endchar"],
+    ]
+# Hints (with a ghost hint), subroutines and flexes, most having no width operand
+PROGRAMS = {
+    "subrs": [
+        601, 0, 53, 447, -21, "hstemhm", 31, 43, "vstemhm", "hintmask", b"\xe0", 117, 101, "rmoveto",
+        -107, "callsubr", -106, "callsubr", "rrcurveto", -105, "callsubr", -107, "callgsubr"],
+    "flexes": [
+        505, 3, "rmoveto", 10, 21, 30, 41, 51, 61, 70, 81, 90, 101, 110, 121, 50, "flex",
+        11, 21, 5, 31, 41, 51, 61, "hflex", 10, 5, 21, 5, 31, 41, 51, 5, 61, "hflex1",
+        11, 21, 31, 41, 51, 61, 71, 81, 91, 101, 33, "flex1", 17, -20, 9, 13, 7, "vvcurveto",
+        5, 7, 9, 11, 13, 15, 17, 19, 21, "hvcurveto", "endchar"],
+    # Its flex1 ends horizontally, but would not with its deltas rounded one by one at 1000 / 2048.
+    "turned": [0, 0, "rmoveto", 3, 0, 0, 2, 0, 0, 0, 0, 0, 0, -3, "flex1", "endchar"],
+    }
+
+
+# A CFF-based font of UPM 1000 with the glyphs above, read from its compiled data like any other.
+def makeCFFFont():
+    font = makeTestCFFFont()
+    font["head"].unitsPerEm = 1000
+    cff = font["CFF "].cff
+    topDict = cff.topDictIndex[0]
+    private = topDict.Private
+    private.nominalWidthX = 100
+    private.defaultWidthX = 500
+    private.BlueValues = [-12, 0, 500, 512]
+    private.StdHW = 53
+    private.StemSnapH = [53, 67]
+    private.Subrs = SubrsIndex(private = private, globalSubrs = cff.GlobalSubrs)
+    for program in LOCAL_SUBRS:
+        private.Subrs.append(T2CharString(program = program, private = private, globalSubrs = cff.GlobalSubrs))
+    for program in GLOBAL_SUBRS:
+        cff.GlobalSubrs.append(T2CharString(program = program, private = private, globalSubrs = cff.GlobalSubrs))
+    glyphOrder = font.getGlyphOrder() + sorted(PROGRAMS.keys())
+    for glyphName in sorted(PROGRAMS.keys()):
+        topDict.charset.append(glyphName)
+        topDict.CharStrings[glyphName] = T2CharString(
+            program = PROGRAMS[glyphName], private = private, globalSubrs = cff.GlobalSubrs)
+    font.setGlyphOrder(glyphOrder)
+    reloadCFF(font)
+    return font
+
+
+def reloadCFF(font):
+    data = font["CFF "].compile(font)
+    font["CFF "] = newTable("CFF ")
+    font["CFF "].decompile(data, font)
+
+
+def drawCharStrings(font):
+    charStrings = font["CFF "].cff.topDictIndex[0].CharStrings
+    outlines = {}
+    for glyphName in font.getGlyphOrder():
+        recPen = RecordingPen()
+        charStrings[glyphName].draw(recPen)
+        outlines[glyphName] = (charStrings[glyphName].width, recPen.value)
+    return outlines
+
+
+def makeFont():
+    font = TTFont()
+    font.setGlyphOrder(GLYPHS)
+    addOpenTypeFeaturesFromString(font, FEATURES)
+    lookup = font["GPOS"].table.LookupList.Lookup[1]  # PAIRS, as an Extension lookup
+    for i, subTable in enumerate(lookup.SubTable):
+        extSubTable = otTables.ExtensionPos()
+        extSubTable.Format = 1
+        extSubTable.ExtSubTable = subTable
+        lookup.SubTable[i] = extSubTable
+    lookup.LookupType = 9
+    mathValues = "".join(
+        '<%s><Value value="%d"/></%s>' % (name, 7 + i * 53, name) for i, name in enumerate(MATH_VALUE_NAMES))
+    xml = "<ttFont>%s%s%s</ttFont>" % (BASE, JSTF, MATH % mathValues)
+    font.importXML(io.BytesIO(xml.encode("utf-8")))
+    return font
+
+
+# Scales the decompiled table by walking its objects, like Converter used to.
+def scaleObjects(obj, scaleFactor, visited):
+    if id(obj) in visited:
+        return
+    visited.add(id(obj))
+    for name, value in list(vars(obj).items()):
+        if isinstance(value, int) and name in SCALED_FIELDS:
+            setattr(obj, name, int(round(value * scaleFactor)))
+        elif isinstance(value, list):
+            for item in value:
+                if hasattr(item, "__dict__"):
+                    scaleObjects(item, scaleFactor, visited)
+        elif hasattr(value, "__dict__"):
+            scaleObjects(value, scaleFactor, visited)
+
+
+def dumpXML(table, font):
+    stream = io.BytesIO()
+    table.toXML(XMLWriter(stream), font)
+    return stream.getvalue()
+
+
+class LayoutScalerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.font = makeFont()
+
+    def checkTable(self, tag, scaleFactor):
+        data = self.font.getTableData(tag)
+        scaled = Scalers.LayoutScaler(data, tag, scaleFactor).scale()
+        self.assertEqual(len(scaled), len(data))
+        actual = newTable(tag)
+        actual.decompile(scaled, self.font)
+        expected = newTable(tag)
+        expected.decompile(data, self.font)
+        scaleObjects(expected.table, scaleFactor, set())
+        self.assertEqual(dumpXML(actual, self.font), dumpXML(expected, self.font))
+        self.assertNotEqual(scaled, data)
+
+    def test_GPOS(self):
+        self.checkTable("GPOS", 1000 / 2048)
+        self.checkTable("GPOS", 4096 / 1000)
+
+    def test_BASE(self):
+        self.checkTable("BASE", 1000 / 2048)
+
+    def test_JSTF(self):
+        self.checkTable("JSTF", 1000 / 2048)
+
+    def test_MATH(self):
+        self.checkTable("MATH", 1000 / 2048)
+        data = Scalers.LayoutScaler(self.font.getTableData("MATH"), "MATH", 0.5).scale()
+        table = newTable("MATH")
+        table.decompile(data, self.font)
+        constants = table.table.MathConstants
+        self.assertEqual(constants.ScriptPercentScaleDown, 80)  # Percentages stay
+        self.assertEqual(constants.RadicalDegreeBottomRaisePercent, 65)
+        self.assertEqual(constants.DisplayOperatorMinHeight, int(round(2013 * 0.5)))
+
+    def test_sharing_kept(self):
+        # All base records of the `pos base` rules above point to one @TOP anchor.
+        data = self.font.getTableData("GPOS")
+        scaled = Scalers.LayoutScaler(data, "GPOS", 0.5).scale()
+        anchor = struct.pack(">Hhh", 1, 251, 503)
+        self.assertEqual(data.count(anchor), 1)
+        self.assertEqual(scaled.find(struct.pack(">Hhh", 1, int(round(251 * 0.5)), int(round(503 * 0.5)))),
+                         data.find(anchor))
+        table = newTable("GPOS")
+        table.decompile(scaled, self.font)
+        for lookup in table.table.LookupList.Lookup:
+            if lookup.LookupType == 4:
+                for record in lookup.SubTable[0].BaseArray.BaseRecord:
+                    self.assertEqual(record.BaseAnchor[0].YCoordinate, int(round(503 * 0.5)))
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class CFFScalerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.font = makeCFFFont()
+
+    def getPrivate(self):
+        return self.font["CFF "].cff.topDictIndex[0].Private
+
+    # Points are off by half a unit at most, plus another one for every subroutine they are drawn by.
+    def checkScale(self, scaleFactor):
+        expected = drawCharStrings(self.font)
+        Scalers.CFFScaler(self.font["CFF "].cff, scaleFactor).scale()
+        reloadCFF(self.font)
+        actual = drawCharStrings(self.font)
+        self.assertEqual(sorted(actual.keys()), sorted(expected.keys()))
+        for glyphName in expected.keys():
+            (expectedWidth, expectedOutline), (width, outline) = expected[glyphName], actual[glyphName]
+            self.assertEqual(width, int(round(expectedWidth * scaleFactor)), glyphName)
+            self.assertEqual([op for op, _ in outline], [op for op, _ in expectedOutline], glyphName)
+            tolerance = 2 if glyphName == "subrs" else 0.5
+            for (_, expectedPoints), (_, points) in zip(expectedOutline, outline):
+                for (expectedX, expectedY), (x, y) in zip(expectedPoints, points):
+                    self.assertLessEqual(abs(x - expectedX * scaleFactor), tolerance, glyphName)
+                    self.assertLessEqual(abs(y - expectedY * scaleFactor), tolerance, glyphName)
+
+    def test_scale_up(self):
+        self.checkScale(2048 / 1000)
+
+    def test_scale_down(self):
+        self.checkScale(1000 / 2048)
+
+    def test_scale_odd_factor(self):
+        self.checkScale(1234 / 1000)
+
+    def test_subroutines_kept(self):
+        Scalers.CFFScaler(self.font["CFF "].cff, 0.5).scale()
+        private = self.getPrivate()
+        self.assertEqual(len(private.Subrs), len(LOCAL_SUBRS))
+        self.assertEqual(private.Subrs[0].program, [50, 0, "rlineto", 0, 50, "rlineto", "return"])
+        program = self.font["CFF "].cff.topDictIndex[0].CharStrings["subrs"].program
+        self.assertEqual(program.count("callsubr"), 3)
+        edges = [int(round(edge * 0.5)) for edge in (701, 53, 500)]
+        self.assertEqual(program[:5], [edges[0] - 50, 0, edges[1], edges[2] - edges[1], -21])  # The ghost hint stays
+
+    def test_dicts(self):
+        Scalers.CFFScaler(self.font["CFF "].cff, 2.048).scale()
+        private = self.getPrivate()
+        self.assertEqual(private.BlueValues, [-25, 0, 1024, 1049])
+        self.assertEqual(private.StdHW, 109)
+        self.assertEqual(private.StemSnapH, [109, 137])
+        self.assertEqual((private.nominalWidthX, private.defaultWidthX), (205, 1024))
+        self.assertEqual(self.font["CFF "].cff.topDictIndex[0].FontMatrix, [0.00048828125, 0, 0, 0.00048828125, 0, 0])
+
+    def test_flex_turned(self):
+        Scalers.CFFScaler(self.font["CFF "].cff, 1000 / 2048).scale()
+        charString = self.font["CFF "].cff.topDictIndex[0].CharStrings["turned"]
+        self.assertEqual(charString.program, [0, 0, "rmoveto", 1, 0, 0, 1, 0, 0, 0, 0, 0, 0, -1, -1, 50, "flex", "endchar"])
+
+    def test_arithmetic_rejected(self):
+        charStrings = self.font["CFF "].cff.topDictIndex[0].CharStrings
+        charStrings["turned"] = T2CharString(program = [1, 2, "add", 0, "rmoveto", "endchar"], private = self.getPrivate())
+        programs = {}
+        for glyphName in ("subrs", "flexes"):
+            charStrings[glyphName].decompile()
+            programs[glyphName] = list(charStrings[glyphName].program)
+        self.assertRaises(ValueError, Scalers.CFFScaler(self.font["CFF "].cff, 0.5).scale)
+        for glyphName, program in programs.items():
+            self.assertEqual(charStrings[glyphName].program, program)
+        self.assertEqual(self.getPrivate().BlueValues, [-12, 0, 500, 512])
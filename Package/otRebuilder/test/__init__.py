@@ -0,0 +1,7 @@
+import os
+import sys
+
+dependencyDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../Dep")
+sys.path.insert(0, dependencyDir)
+
+DATADIR = os.path.join(dependencyDir, "cu2qu", "test", "data")
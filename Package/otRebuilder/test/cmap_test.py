@@ -0,0 +1,100 @@
+from __future__ import print_function, division, absolute_import
+import random
+import unittest
+
+import otRebuilder.test
+from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib.tables import _c_m_a_p
+from fontTools.ttLib.tables._c_m_a_p import CmapSubtable, SortedMappingCache
+from otRebuilder.benchmark.cmap4 import buildSegmentsReference, makeMapping
+from otRebuilder.Lib import Workers
+
+
+def makeFont():
+    font = TTFont()
+    font.setGlyphOrder([".notdef"] + ["glyph%05d" % i for i in range(1, 400)])
+    return font
+
+
+def makeFullDict(font):
+    glyphOrder = font.getGlyphOrder()
+    fullDict = {}
+    codes = list(range(0x20, 0x80)) + list(range(0x4E00, 0x4E80)) + [0xD800, 0xDBFF] + list(range(0x20000, 0x20040))
+    for i, code in enumerate(codes):
+        fullDict[code] = glyphOrder[1 + (i * 7) % 399 if i % 3 else 1 + i % 399]
+    return fullDict
+
+
+class CmapCompileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.font = makeFont()
+        self.fullSubtable = Workers.CmapWorker.makeSubtable(3, 10, 0, 12, makeFullDict(self.font))
+
+    def test_bmp_from_full(self):
+        mappings = SortedMappingCache(self.font)
+        mappings.addFull(self.fullSubtable.cmap)
+        truncatedDict = Workers.CmapWorker.makeTruncatedDict(self.fullSubtable.cmap)
+        mapping = mappings.get(truncatedDict)
+        self.assertIs(mapping, mappings.get(self.fullSubtable.cmap).getBMP())
+        self.assertEqual(mapping.charCodes, sorted(truncatedDict.keys()))
+
+        truncatedDict[0x20] = "glyph00399"  # No longer the BMP part of the full mapping
+        mappings = SortedMappingCache(self.font)
+        mappings.addFull(self.fullSubtable.cmap)
+        self.assertEqual(mappings.get(truncatedDict).names[0], "glyph00399")
+
+    def test_round_trip(self):
+        subtables = Workers.CmapWorker.subtables_buildUnicodeAllFromFull(self.fullSubtable)
+        macRomanDict = dict((code, glyphName) for code, glyphName in self.fullSubtable.cmap.items() if code < 0x7F)
+        subtables.append(Workers.CmapWorker.makeSubtable(1, 0, 0, 6, macRomanDict))
+        format13 = CmapSubtable.newSubtable(13)
+        format13.platformID, format13.platEncID, format13.language = 0, 6, 0
+        format13.cmap = dict((code, "glyph00001") for code in self.fullSubtable.cmap)
+        subtables.append(format13)
+        expected = dict(
+            ((subtable.platformID, subtable.platEncID), dict(subtable.cmap)) for subtable in subtables)
+
+        cmap = newTable("cmap")
+        cmap.tableVersion = 0
+        cmap.tables = subtables
+        data = cmap.compile(self.font)
+        decompiled = newTable("cmap")
+        decompiled.decompile(data, self.font)
+        self.assertEqual(len(decompiled.tables), len(expected))
+        for subtable in decompiled.tables:
+            self.assertEqual(subtable.cmap, expected[(subtable.platformID, subtable.platEncID)])
+
+
+class BuildSegmentsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.numpy = _c_m_a_p.numpy
+
+    def tearDown(self):
+        _c_m_a_p.numpy = self.numpy
+
+    def checkSegments(self):
+        rng = random.Random(1)
+        mappings = [
+            ([0x41], [1]),
+            ([0x41, 0x42, 0x43], [1, 2, 3]),
+            ([0x41, 0x43, 0x44, 0x45, 0x46, 0x47, 0x48], [1, 3, 4, 5, 6, 7, 8]),
+            (list(range(0x20, 0x40)), [1, 9] + list(range(2, 22)) + [7, 3, 3, 3, 3, 3, 3, 3, 3, 40]),
+            ]
+        mappings.extend(makeMapping(size, rng) for size in (10, 100, 2000))
+        for charCodes, gids in mappings:
+            self.assertEqual(_c_m_a_p.buildSegments(charCodes, gids), buildSegmentsReference(charCodes, gids))
+        self.assertEqual(_c_m_a_p.buildSegments([], []), ([0xffff], [0xffff], [1], [0], []))
+
+    @unittest.skipIf(_c_m_a_p.numpy is None, "numpy not installed")
+    def test_numpy(self):
+        self.checkSegments()
+
+    def test_lists(self):
+        _c_m_a_p.numpy = None
+        self.checkSegments()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+from __future__ import print_function, division, absolute_import
+import copy
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import otRebuilder.test
+from otRebuilder.test.sfnt_test import makeTestFontFile
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables._g_l_y_f import Glyph, GlyphComponent, WE_HAVE_A_SCALE
+
+
+def breakBounds(glyf):
+    """Overwrite the bounding box of every compact glyph, so that it has to be recalculated."""
+    for glyph in glyf.glyphs.values():
+        if getattr(glyph, "data", b""):
+            glyph.data = glyph.data[:2] + struct.pack(">hhhh", 1, 2, 3, 4) + glyph.data[10:]
+
+
+class PatchBoundsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempDir, "test.ttf")
+        makeTestFontFile(self.path)
+
+        # A composite with a scaled component, which has to be expanded.
+        font = TTFont(self.path)
+        glyf = font["glyf"]
+        component = GlyphComponent()
+        component.glyphName = "O"
+        component.x, component.y = 10, -20
+        component.flags = 0x4
+        component.transform = [[0.5, 0], [0, 0.5]]
+        glyph = Glyph()
+        glyph.numberOfContours = -1
+        glyph.components = [component]
+        glyf["Oscaled"] = glyph
+        font.setGlyphOrder(glyf.glyphOrder)
+        font["hmtx"].metrics["Oscaled"] = (1200, 0)
+        font.save(self.path)
+        font.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def loadGlyf(self):
+        font = TTFont(self.path, recalcBBoxes = True)
+        breakBounds(font["glyf"])
+        return font
+
+    def test_same_bounds(self):
+        patched = self.loadGlyf()
+        expanded = self.loadGlyf()
+        patchedGlyf = patched["glyf"]
+        expandedGlyf = expanded["glyf"]
+        patchedGlyf.compile(patched)
+        for glyphName in expandedGlyf.keys():
+            expandedGlyf[glyphName].recalcBounds(expandedGlyf)
+        for glyphName in patched.getGlyphOrder():
+            glyph = expandedGlyf[glyphName]
+            if glyph.numberOfContours == 0:
+                expectedHeader = (0, 0, 0, 0, 0)
+            else:
+                expectedHeader = (glyph.numberOfContours, glyph.xMin, glyph.yMin, glyph.xMax, glyph.yMax)
+            self.assertEqual(tuple(patchedGlyf.glyphs[glyphName].getHeader()), expectedHeader, glyphName)
+
+    def test_compact(self):
+        font = self.loadGlyf()
+        glyf = font["glyf"]
+        originalData = dict(
+            (name, glyph.data) for name, glyph in glyf.glyphs.items() if getattr(glyph, "data", b""))
+        glyf.compile(font)
+        for glyphName, data in originalData.items():
+            glyph = glyf.glyphs[glyphName]
+            if glyphName in ("Oscaled", "O"):  # Expanded along with the scaled composite
+                self.assertFalse(hasattr(glyph, "data"))
+            else:
+                self.assertEqual(glyph.data[:2] + glyph.data[10:], data[:2] + data[10:])
+
+    def test_composite_fallback(self):
+        font = self.loadGlyf()
+        glyph = font["glyf"].glyphs["Oscaled"]
+        self.assertIs(glyph.patchBounds(font["glyf"]), False)
+        self.assertTrue(font["glyf"].glyphs["Aacute"].patchBounds(font["glyf"]))
+
+    def test_maxp(self):
+        patched = self.loadGlyf()
+        expanded = self.loadGlyf()
+        patched["glyf"].compile(patched)
+        for glyphName in expanded["glyf"].keys():
+            expanded["glyf"][glyphName].compile(expanded["glyf"])
+        patchedMaxp = copy.copy(patched["maxp"])
+        expandedMaxp = copy.copy(expanded["maxp"])
+        patchedMaxp.recalc(patched)
+        expandedMaxp.recalc(expanded)
+        self.assertEqual(patchedMaxp.__dict__, expandedMaxp.__dict__)
+        self.assertEqual(patched["head"].__dict__, expanded["head"].__dict__)
+        self.assertTrue(any(hasattr(glyph, "data") for glyph in patched["glyf"].glyphs.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+from __future__ import print_function, division, absolute_import
+import random
+import unittest
+
+import otRebuilder.test
+from otRebuilder.Lib import Workers
+
+from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib.tables import _h_m_t_x, _k_e_r_n
+from fontTools.ttLib.tables._h_m_t_x import GlyphMetrics
+from fontTools.ttLib.tables._k_e_r_n import KernPairs
+
+
+GLYPH_COUNT = 300
+
+
+def makeFont():
+    glyphOrder = [".notdef"] + ["glyph%05d" % i for i in range(1, GLYPH_COUNT)]
+    font = TTFont()
+    font.setGlyphOrder(glyphOrder)
+    maxp = font["maxp"] = newTable("maxp")
+    maxp.numGlyphs = GLYPH_COUNT
+    font["hhea"] = newTable("hhea")
+    rng = random.Random(1)
+    hmtx = font["hmtx"] = newTable("hmtx")
+    hmtx.metrics = {}
+    for i, glyphName in enumerate(glyphOrder):
+        advance = 0 if i % 7 == 0 else rng.randint(1, 2048)
+        hmtx.metrics[glyphName] = (advance if i < 250 else 1000, rng.randint(-300, 300))
+    kern = font["kern"] = newTable("kern")
+    kern.version = 0
+    subtable = _k_e_r_n.KernTable_format_0()
+    subtable.coverage = 1
+    subtable.kernTable = {}
+    for i in range(500):
+        pair = (rng.choice(glyphOrder), rng.choice(glyphOrder))
+        subtable.kernTable[pair] = rng.randint(-500, 500)
+    kern.kernTables = [subtable]
+    return font
+
+
+# Decompiles the tables of the font from their data.
+def reloadTable(font, tag):
+    data = font.getTableData(tag)
+    table = newTable(tag)
+    table.decompile(data, font)
+    return data, table
+
+
+class GlyphMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.font = makeFont()
+        self.numpy = _h_m_t_x.numpy
+
+    def tearDown(self):
+        _h_m_t_x.numpy = self.numpy
+
+    def test_round_trip(self):
+        expected = dict(self.font["hmtx"].metrics)
+        data, hmtx = reloadTable(self.font, "hmtx")
+        self.assertIsInstance(hmtx.metrics, GlyphMetrics)
+        self.assertEqual(hmtx.metrics.toDict(), expected)
+        self.assertEqual(hmtx.compile(self.font), data)
+        self.assertEqual(self.font["hhea"].numberOfHMetrics, 251)  # Up to the first of the last 50
+
+    def test_dict_api(self):
+        expected = dict(self.font["hmtx"].metrics)
+        metrics = GlyphMetrics.fromDict(expected, self.font.getGlyphOrder())
+        metrics["glyph00001"] = (10.4, -3.6)
+        expected["glyph00001"] = (10, -4)
+        metrics["extra"] = (5, 5)
+        expected["extra"] = (5, 5)
+        del metrics["glyph00002"]
+        del expected["glyph00002"]
+        self.assertEqual(len(metrics), len(expected))
+        self.assertEqual(sorted(metrics.items()), sorted(expected.items()))
+        self.assertEqual(metrics["glyph00003"], expected["glyph00003"])
+        self.assertTrue("extra" in metrics)
+        self.assertFalse("glyph00002" in metrics)
+        self.assertEqual(metrics.toDict(), expected)
+
+    def checkScale(self):
+        values = [0, 1, -1, 3, -3, 5, -5, 7, 1023, -1023, 2047, 32767, -32768]
+        metrics = GlyphMetrics(["g%d" % i for i in range(len(values))], values, values[::-1])
+        for factor in (0.5, 1000 / 2048, 2048 / 1000, 1.5, 3):
+            scaled = metrics.copy()
+            scaled.scale(factor)
+            self.assertEqual(list(scaled.advances), [int(round(value * factor)) for value in values])
+            self.assertEqual(list(scaled.sideBearings), [int(round(value * factor)) for value in values[::-1]])
+
+    @unittest.skipIf(_h_m_t_x.numpy is None, "numpy not installed")
+    def test_scale_numpy(self):
+        self.checkScale()
+
+    def test_scale_lists(self):
+        _h_m_t_x.numpy = None
+        self.checkScale()
+
+    def test_xAvgCharWidth(self):
+        hmtx = self.font["hmtx"]
+        expected = Workers.OS2f2Worker.recalcXAvgCharWidth(hmtx)
+        advances = [advance for advance, _ in hmtx.metrics.values() if advance]
+        self.assertEqual(expected, sum(advances) // len(advances))
+        _, hmtx = reloadTable(self.font, "hmtx")
+        self.assertEqual(Workers.OS2f2Worker.recalcXAvgCharWidth(hmtx), expected)
+
+
+class KernPairsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.font = makeFont()
+
+    def test_round_trip(self):
+        expected = dict(self.font["kern"].kernTables[0].kernTable)
+        data, kern = reloadTable(self.font, "kern")
+        kernTable = kern.kernTables[0].kernTable
+        self.assertIsInstance(kernTable, KernPairs)
+        self.assertEqual(kernTable.toDict(), expected)
+        self.assertEqual(kern.compile(self.font), data)
+
+    def test_dict_api(self):
+        subtable = self.font["kern"].kernTables[0]
+        expected = dict(subtable.kernTable)
+        subtable.kernTable = KernPairs.fromDict(expected, self.font.getGlyphOrder())
+        for pair in list(expected.keys())[:10]:
+            del subtable.kernTable[pair]
+            del expected[pair]
+        subtable.kernTable[(".notdef", ".notdef")] = -7.6  # Sorted before the others upon compile
+        expected[(".notdef", ".notdef")] = -8
+        self.assertEqual(subtable.kernTable.toDict(), expected)
+        self.assertFalse(subtable.kernTable.isValid())
+        data = self.font["kern"].compile(self.font)
+        subtable.kernTable = expected
+        self.assertEqual(self.font["kern"].compile(self.font), data)
+
+    def test_scale(self):
+        subtable = self.font["kern"].kernTables[0]
+        expected = dict((pair, int(round(value * 0.75))) for pair, value in subtable.kernTable.items())
+        subtable.kernTable = KernPairs.fromDict(subtable.kernTable, self.font.getGlyphOrder())
+        subtable.kernTable.scale(0.75)
+        self.assertEqual(subtable.kernTable.toDict(), expected)
+
+    def test_invalid_glyph_ids(self):
+        kern = self.font["kern"]
+        kern.kernTables[0].kernTable = {("glyph00001", "glyph00400"): 10}
+        data = kern.compile(self.font)
+        _, kern = reloadTable(self.font, "kern")
+        self.assertEqual(kern.kernTables[0].kernTable, {("glyph00001", "glyph00400"): 10})
+        self.assertEqual(kern.compile(self.font), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
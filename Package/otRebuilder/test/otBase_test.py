@@ -0,0 +1,107 @@
+from __future__ import print_function, division, absolute_import
+import unittest
+
+import otRebuilder.test
+from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib.tables import otBase, otTables
+
+
+GLYPH_COUNT = 3000
+LOOKUP_COUNT = 16  # About 6 KB each, which adds up to far more than 64 KB
+
+
+def makeGPOS(font):
+    glyphs = font.getGlyphOrder()[1:]
+    lookups = []
+    for i in range(LOOKUP_COUNT):
+        subtable = otTables.SinglePos()
+        subtable.Format = 2
+        subtable.ValueFormat = 4
+        subtable.Coverage = otTables.Coverage()
+        subtable.Coverage.glyphs = glyphs
+        subtable.Value = []
+        for j in range(len(glyphs)):
+            value = otBase.ValueRecord()
+            value.XAdvance = (i * 7 + j) % 500  # No two lookups alike, so nothing is shared
+            subtable.Value.append(value)
+        subtable.ValueCount = len(subtable.Value)
+        lookup = otTables.Lookup()
+        lookup.LookupType = 1
+        lookup.LookupFlag = 0
+        lookup.SubTable = [subtable]
+        lookup.SubTableCount = 1
+        lookups.append(lookup)
+    table = otTables.GPOS()
+    table.Version = 0x00010000
+    table.ScriptList = otTables.ScriptList()
+    table.ScriptList.ScriptRecord = []
+    table.FeatureList = otTables.FeatureList()
+    table.FeatureList.FeatureRecord = []
+    table.LookupList = otTables.LookupList()
+    table.LookupList.Lookup = lookups
+    gpos = font["GPOS"] = newTable("GPOS")
+    gpos.table = table
+    return gpos
+
+
+# Fixes one overflow per compile, like BaseTTXConverter.compile used to.
+def compileOneFixAtATime(gpos, font):
+    while True:
+        try:
+            writer = otBase.OTTableWriter(tableTag = "GPOS")
+            gpos.table.compile(writer, font)
+            return writer.getAllData()
+        except otBase.OTLOffsetOverflowError as e:
+            if e.value.itemName is None:
+                assert otTables.fixLookupOverFlows(font, e.value)
+            else:
+                assert otTables.fixSubTableOverFlows(font, e.value)
+
+
+class OverflowTest(unittest.TestCase):
+
+    def setUp(self):
+        self.font = TTFont()
+        self.font.setGlyphOrder([".notdef"] + ["glyph%05d" % i for i in range(1, GLYPH_COUNT)])
+
+    def test_same_data(self):
+        expected = compileOneFixAtATime(makeGPOS(self.font), self.font)
+        gpos = makeGPOS(self.font)
+        self.assertEqual(gpos.compile(self.font), expected)
+        stats = gpos.overflowStats
+        self.assertGreater(stats["fixes"], 1)
+        self.assertLess(stats["compiles"], stats["fixes"] + 1)
+        self.assertEqual(stats["retriesSaved"], stats["fixes"] - (stats["compiles"] - 1))
+
+    def test_no_overflow(self):
+        gpos = makeGPOS(self.font)
+        del gpos.table.LookupList.Lookup[2:]
+        gpos.compile(self.font)
+        self.assertEqual(gpos.overflowStats, {"compiles": 1, "fixes": 0, "retriesSaved": 0})
+
+    def test_failed_fix(self):
+        gpos = makeGPOS(self.font)
+        for lookup in gpos.table.LookupList.Lookup:
+            lookup.SubTable[0].DontShare = True
+        records = [otBase.OverflowErrorRecord(("GPOS", i, 0, "Coverage", None)) for i in (0, 1)]
+        # The last subtable is fixed first, then the other cannot be split.
+        splitFuncs = otTables.splitTable["GPOS"]
+        splitFuncs[1] = lambda oldSubTable, newSubTable, record: record.LookupListIndex == 1
+        try:
+            self.assertEqual(otTables.fixOverFlows(self.font, records, []), 0)
+        finally:
+            del splitFuncs[1]
+
+    def test_repeated_overflows(self):
+        gpos = makeGPOS(self.font)
+        fixOverFlows = otTables.fixOverFlows
+        otTables.fixOverFlows = lambda font, overflowRecords, tables: 1  # Fixes nothing
+        try:
+            self.assertRaises(otBase.OTLOffsetOverflowError, gpos.compile, self.font)
+        finally:
+            otTables.fixOverFlows = fixOverFlows
+        self.assertEqual(gpos.overflowStats["compiles"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
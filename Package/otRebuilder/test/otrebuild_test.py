@@ -0,0 +1,264 @@
+from __future__ import print_function, division, absolute_import
+import copy
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import otRebuilder.test
+from otRebuilder.test.Converter_test import makeTestFont, makeScalableCFFFont
+from fontTools.misc.py23 import StringIO
+from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib.tables._c_m_a_p import CmapSubtable
+from fontTools.ttLib.tables.O_S_2f_2 import Panose
+from fontTools.ttLib.tables.ttProgram import Program
+
+try:
+    from otRebuilder import otrebuild
+except SyntaxError:  # Initializer is written for Python 2 only.
+    otrebuild = None
+
+
+CONFIG = {
+    "General": {"version": 1.23, "embeddingRestriction": 0, "codepages": ["latin", "macRoman"]},
+    "Name": {"en": {"fontFamily": u"Rebuilt", "fontSubfamily": u"Bold Italic"}},
+    "Style": {"weightScale": 7, "widthScale": 5, "italicAngle": -12.0, "underlinePosition": -200},
+    "Metrics": {"ascender": 1800, "descender": -400, "lineGap": 100},
+    }
+
+
+def makeFullTestFontFile(path, isCFF = False):
+    """Save one of Converter_test's fonts, with the rest of the tables
+    that otrebuild expects."""
+    if isCFF:
+        font = makeScalableCFFFont()
+        del font["VORG"]
+    else:
+        font = makeTestFont()
+        font["loca"] = newTable("loca")
+        prep = font["prep"] = newTable("prep")
+        prep.program = Program()
+        prep.program.fromBytecode(b"\xb0\x01\x21")  # PUSHB[0] 1, POP[]
+        font["glyf"]["A"].program = prep.program
+        gasp = font["gasp"] = newTable("gasp")
+        gasp.version = 1
+        gasp.gaspRange = {0xFFFF: 15}
+    glyphOrder = font.getGlyphOrder()
+    font["head"].__dict__.update(
+        tableVersion = 1.0, fontRevision = 1.0, checkSumAdjustment = 0, magicNumber = 0x5F0F3CF5,
+        flags = 3, created = 0, modified = 0, macStyle = 0, lowestRecPPEM = 8,
+        fontDirectionHint = 2, indexToLocFormat = 0, glyphDataFormat = 0
+        )
+    hhea = font["hhea"] = newTable("hhea")
+    hhea.__dict__.update(
+        tableVersion = 0x10000, ascent = 1900, descent = -500, lineGap = 0, caretSlopeRise = 1,
+        caretSlopeRun = 0, caretOffset = 0, reserved0 = 0, reserved1 = 0, reserved2 = 0,
+        reserved3 = 0, metricDataFormat = 0
+        )
+    maxp = font["maxp"] = newTable("maxp")
+    maxp.tableVersion = 0x5000
+    if not isCFF:
+        maxp.__dict__.update(
+            tableVersion = 0x10000, maxZones = 1, maxTwilightPoints = 0, maxStorage = 0,
+            maxFunctionDefs = 0, maxInstructionDefs = 0, maxStackElements = 0, maxSizeOfInstructions = 0,
+            maxComponentElements = 2
+            )
+    post = font["post"] = newTable("post")
+    post.__dict__.update(
+        formatType = 2.0, italicAngle = 0, underlinePosition = -150, underlineThickness = 50,
+        isFixedPitch = 0, minMemType42 = 0, maxMemType42 = 0, minMemType1 = 0, maxMemType1 = 0,
+        extraNames = [], mapping = {}
+        )
+    cmap = font["cmap"] = newTable("cmap")
+    cmap.tableVersion = 0
+    subtable = CmapSubtable.newSubtable(4)
+    subtable.platformID, subtable.platEncID, subtable.language = 3, 1, 0
+    subtable.cmap = dict((ord(glyphName), glyphName) for glyphName in glyphOrder if len(glyphName) == 1)
+    cmap.tables = [subtable]
+    name = font["name"] = newTable("name")
+    name.names = []
+    for nameID, string in ((1, u"Test"), (2, u"Regular"), (3, u"Test Regular"), (4, u"Test Regular"),
+            (5, u"Version 1.000"), (6, u"Test-Regular")):
+        name.setName(string, nameID, 3, 1, 0x409)
+    panose = Panose()
+    for attr in ("bFamilyType", "bSerifStyle", "bWeight", "bProportion", "bContrast",
+            "bStrokeVariation", "bArmStyle", "bLetterForm", "bMidline", "bXHeight"):
+        setattr(panose, attr, 0)
+    os2 = font["OS/2"] = newTable("OS/2")
+    os2.__dict__.update(
+        version = 4, xAvgCharWidth = 1200, usWeightClass = 400, usWidthClass = 5, fsType = 0,
+        ySubscriptXSize = 650, ySubscriptYSize = 600, ySubscriptXOffset = 0, ySubscriptYOffset = 75,
+        ySuperscriptXSize = 650, ySuperscriptYSize = 600, ySuperscriptXOffset = 0, ySuperscriptYOffset = 350,
+        yStrikeoutSize = 50, yStrikeoutPosition = 300, sFamilyClass = 0, panose = panose,
+        ulUnicodeRange1 = 1, ulUnicodeRange2 = 0, ulUnicodeRange3 = 0, ulUnicodeRange4 = 0,
+        achVendID = "TEST", fsSelection = 0x40, usFirstCharIndex = 0x41, usLastCharIndex = 0x7A,
+        sTypoAscender = 1500, sTypoDescender = -500, sTypoLineGap = 0, usWinAscent = 1900,
+        usWinDescent = 500, ulCodePageRange1 = 1, ulCodePageRange2 = 0, sxHeight = 1000,
+        sCapHeight = 1400, usDefaultChar = 0, usBreakChar = 32, usMaxContext = 1
+        )
+    font.save(path)
+
+
+@unittest.skipIf(otrebuild is None, "otrebuild runs on Python 2 only")
+class EditableTablesTest(unittest.TestCase):
+    """Tables left out of getEditableTables() are saved as they were read, so
+    every job must come out the same as when all loaded tables are compiled."""
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.ttPath = os.path.join(self.tempDir, "test.ttf")
+        self.cffPath = os.path.join(self.tempDir, "test.otf")
+        makeFullTestFontFile(self.ttPath)
+        makeFullTestFontFile(self.cffPath, True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def rebuild(self, inputFile, outputName, jobs, configDict):
+        paths = otrebuild.Paths()
+        paths.inputFile = inputFile
+        paths.outputFile = os.path.join(self.tempDir, outputName)
+        otrebuild.rebuildFont(paths, copy.deepcopy(jobs), copy.deepcopy(configDict))
+        return TTFont(paths.outputFile)
+
+    def checkJobs(self, inputFile, configDict = None, **jobAttrs):
+        jobs = otrebuild.Jobs()
+        for attr, value in jobAttrs.items():
+            setattr(jobs, attr, value)
+        released = self.rebuild(inputFile, "released", jobs, configDict)
+        getEditableTables = otrebuild.getEditableTables
+        otrebuild.getEditableTables = lambda *args: None
+        try:
+            compiled = self.rebuild(inputFile, "compiled", jobs, configDict)
+        finally:
+            otrebuild.getEditableTables = getEditableTables
+        self.assertEqual(sorted(released.keys()), sorted(compiled.keys()))
+        for tag in released.reader.keys():
+            if tag == "head":  # Saved at different times
+                for head in (released["head"], compiled["head"]):
+                    head.modified = head.checkSumAdjustment = 0
+                self.assertEqual(released["head"].compile(released), compiled["head"].compile(compiled))
+            else:
+                self.assertEqual(released.reader[tag], compiled.reader[tag], "'%s' differs" % tag)
+        released.close()
+        compiled.close()
+
+    def test_default(self):
+        self.checkJobs(self.ttPath)
+        self.checkJobs(self.cffPath)
+
+    def test_config(self):
+        self.checkJobs(self.ttPath, CONFIG, fix_name = False, rebuild_allowUpgrade = True)
+        self.checkJobs(self.cffPath, CONFIG, fix_name = False, rebuild_allowUpgrade = True)
+
+    def test_removeGlyphNames(self):
+        self.checkJobs(self.ttPath, init_removeGlyphNames = True)
+        self.checkJobs(self.cffPath, init_removeGlyphNames = True)
+
+    def test_removeHinting(self):
+        self.checkJobs(self.ttPath, init_removeHinting = True, rebuild_gasp = True, rebuild_prep = True)
+
+    def test_smoothRendering(self):
+        self.checkJobs(self.ttPath, rebuild_gasp = True)
+
+    def test_rebuildMapping(self):
+        self.checkJobs(self.ttPath, fix_cmap = False, rebuild_cmap = True)
+
+    def test_macOffice(self):
+        self.checkJobs(self.ttPath, rebuild_macOffice = True)
+
+    def test_dummySignature(self):
+        self.checkJobs(self.ttPath, rebuild_DSIG = True)
+
+    def test_removeBitmap(self):
+        self.checkJobs(self.ttPath, init_removeBitmap = True)
+
+    def test_recalculate(self):
+        self.checkJobs(self.ttPath, general_recalc = True)
+        self.checkJobs(self.cffPath, general_recalc = True)
+
+    def test_otf2ttf(self):
+        self.checkJobs(self.cffPath, convert_otf2ttf = True)
+        self.checkJobs(self.cffPath, convert_otf2ttf = True, init_removeGlyphNames = True)
+
+
+@unittest.skipIf(otrebuild is None, "otrebuild runs on Python 2 only")
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.inputDir = os.path.join(self.tempDir, "input")
+        self.outputDir = os.path.join(self.tempDir, "output")
+        os.mkdir(self.inputDir)
+        os.mkdir(self.outputDir)
+        makeFullTestFontFile(self.inputPath("a.ttf"))
+        makeFullTestFontFile(self.inputPath("b.otf"), True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def inputPath(self, fileName):
+        return os.path.join(self.inputDir, fileName)
+
+    def writeFile(self, path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def test_expand_directory(self):
+        self.writeFile(self.inputPath("notes.txt"), b"Not a font")
+        os.mkdir(self.inputPath("sub.ttf"))
+        self.assertEqual(otrebuild.expandInputs([self.inputDir]), [self.inputPath("a.ttf"), self.inputPath("b.otf")])
+
+    def test_expand_pattern(self):
+        pattern = os.path.join(self.inputDir, "*.ttf")
+        self.assertEqual(otrebuild.expandInputs([pattern]), [self.inputPath("a.ttf")])
+        self.assertEqual(
+            otrebuild.expandInputs([self.inputPath("b.otf"), self.inputDir, pattern]),
+            [self.inputPath("b.otf"), self.inputPath("a.ttf")])
+        missing = self.inputPath("missing.ttf")  # Reported later, by the worker
+        self.assertEqual(otrebuild.expandInputs([missing]), [missing])
+        self.assertEqual(otrebuild.expandInputs([self.inputPath("*.woff")]), [])
+
+    def test_output_names(self):
+        otherDir = os.path.join(self.tempDir, "other")
+        os.mkdir(otherDir)
+        shutil.copy(self.inputPath("a.ttf"), otherDir)
+        self.writeFile(os.path.join(self.outputDir, "a.ttf"), b"")
+        reservedOutputs = set()
+        outputs = []
+        for inputFile in (self.inputPath("a.ttf"), os.path.join(otherDir, "a.ttf")):
+            outputs.append(otrebuild.makeBatchOutputFileName(inputFile, self.outputDir, reservedOutputs))
+            reservedOutputs.add(outputs[-1])
+        self.assertEqual(outputs, [os.path.join(self.outputDir, "a#1.ttf"), os.path.join(self.outputDir, "a#2.ttf")])
+
+    def test_bad_fonts(self):
+        self.writeFile(self.inputPath("a1.ttf"), b"\0\1\0\0" + b"\xff" * 100)  # Fails to open
+        self.writeFile(self.inputPath("a2.ttf"), b"Not a font")
+        paths = otrebuild.Paths()
+        paths.inputFiles = [self.inputPath("a.ttf"), self.inputPath("a1.ttf"), self.inputPath("a2.ttf"),
+            self.inputPath("b.otf"), self.inputPath("missing.ttf")]
+        paths.outputFile = self.outputDir
+        for workers in (1, 2):
+            jobs = otrebuild.Jobs()
+            jobs.batch_workers = workers
+            stdout = sys.stdout
+            sys.stdout = StringIO()
+            stderr = sys.stderr
+            sys.stderr = StringIO()
+            try:
+                self.assertEqual(otrebuild.processBatch(paths, jobs), 1)
+                messages = sys.stderr.getvalue()
+            finally:
+                sys.stdout = stdout
+                sys.stderr = stderr
+            for fileName in ("a1.ttf", "a2.ttf", "missing.ttf"):
+                self.assertIn("ERROR: " + self.inputPath(fileName), messages)
+            self.assertEqual(sorted(os.listdir(self.outputDir)), ["a.ttf", "b.otf"])
+            for fileName in ("a.ttf", "b.otf"):
+                TTFont(os.path.join(self.outputDir, fileName)).close()
+                os.remove(os.path.join(self.outputDir, fileName))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,268 @@
+from __future__ import print_function, division, absolute_import
+import os
+import random
+import shutil
+import struct
+import tempfile
+import unittest
+
+import otRebuilder.test
+from otRebuilder.test.Converter_test import makeTestFont
+from otRebuilder.test.otBase_test import makeGPOS
+from fontTools.misc.py23 import BytesIO, bytesjoin
+from fontTools import ttLib
+from fontTools.ttLib import TTFont, TTLibError, newTable, sfnt
+
+
+def calcChecksumPlain(data):
+    data += b"\0" * (-len(data) % 4)
+    return sum(struct.unpack(">%dL" % (len(data) // 4), data)) & 0xffffffff
+
+
+def randomBytes(rng, length):
+    return struct.pack("%dB" % length, *[rng.randint(0, 255) for i in range(length)])
+
+
+def makeTestFontFile(path):
+    font = makeTestFont()
+    font["head"].__dict__.update(
+        tableVersion = 1.0, fontRevision = 1.0, checkSumAdjustment = 0, magicNumber = 0x5F0F3CF5,
+        flags = 3, created = 0, modified = 0, macStyle = 0, lowestRecPPEM = 8,
+        fontDirectionHint = 2, indexToLocFormat = 0, glyphDataFormat = 0
+        )
+    hhea = font["hhea"] = newTable("hhea")
+    hhea.__dict__.update(
+        tableVersion = 0x10000, ascent = 1900, descent = -500, lineGap = 0, caretSlopeRise = 1,
+        caretSlopeRun = 0, caretOffset = 0, reserved0 = 0, reserved1 = 0, reserved2 = 0,
+        reserved3 = 0, metricDataFormat = 0
+        )
+    maxp = font["maxp"] = newTable("maxp")
+    maxp.__dict__.update(
+        tableVersion = 0x10000, maxZones = 1, maxTwilightPoints = 0, maxStorage = 0,
+        maxFunctionDefs = 0, maxInstructionDefs = 0, maxStackElements = 0, maxSizeOfInstructions = 0,
+        maxComponentElements = 2
+        )
+    post = font["post"] = newTable("post")
+    post.__dict__.update(
+        formatType = 2.0, italicAngle = 0, underlinePosition = -100, underlineThickness = 50,
+        isFixedPitch = 0, minMemType42 = 0, maxMemType42 = 0, minMemType1 = 0, maxMemType1 = 0,
+        extraNames = [], mapping = {}
+        )
+    font["loca"] = newTable("loca")
+    font.save(path)
+
+
+class CalcChecksumTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(1)
+
+    def test_lengths(self):
+        for length in list(range(0, 17)) + [4095, 4096, 4097, 65539]:
+            data = randomBytes(self.rng, length)
+            self.assertEqual(sfnt.calcChecksum(data), calcChecksumPlain(data))
+
+    def test_high_words(self):
+        data = b"\xff\xff\xff\xff" * 1000 + b"\x80"
+        self.assertEqual(sfnt.calcChecksum(data), calcChecksumPlain(data))
+
+    def test_buffers(self):
+        data = randomBytes(self.rng, 1001)
+        expected = calcChecksumPlain(data)
+        self.assertEqual(sfnt.calcChecksum(bytearray(data)), expected)
+        self.assertEqual(sfnt.calcChecksum(memoryview(data)), expected)
+        self.assertEqual(sfnt.calcChecksum(sfnt._sliceView(b"ab" + data + b"cd", 2, 1003)), expected)
+
+    def test_incremental(self):
+        data = randomBytes(self.rng, 10001)
+        view = memoryview(data)
+        value = 0
+        for i in range(0, len(data), 1024):
+            value = sfnt.calcChecksum(view[i:i + 1024], value)
+        self.assertEqual(value, calcChecksumPlain(data))
+
+    def test_head(self):
+        data = randomBytes(self.rng, 54)
+        self.assertEqual(
+            sfnt._calcHeadChecksum(data),
+            calcChecksumPlain(data[:8] + b"\0\0\0\0" + data[12:])
+            )
+
+
+class WriteChunksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(2)
+
+    def writeTable(self, chunks, joined):
+        stream = BytesIO()
+        writer = sfnt.SFNTWriter(stream, 1)
+        if joined:
+            writer["glyf"] = b"".join(chunks)
+        else:
+            writer.writeChunks("glyf", chunks)
+        entry = writer.tables["glyf"]
+        return stream.getvalue(), entry.offset, entry.length, entry.checkSum
+
+    def test_same_as_joined(self):
+        chunks = [randomBytes(self.rng, self.rng.randint(0, 300)) for i in range(1000)]
+        self.assertEqual(self.writeTable(chunks, False), self.writeTable(chunks, True))
+
+    def test_glyf_chunks(self):
+        tempDir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tempDir, "test.ttf")
+            makeTestFontFile(path)
+            font = TTFont(path)
+            glyf = font["glyf"]
+            chunks = glyf.compileChunks(font)
+            self.assertGreater(len(chunks), 1)
+            self.assertEqual(bytesjoin(chunks), glyf.compile(font))
+            font.close()
+        finally:
+            shutil.rmtree(tempDir)
+
+
+class MmapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempDir, "test.ttf")
+        makeTestFontFile(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def saveCopy(self, useMmap, fileName):
+        font = TTFont(self.path, recalcTimestamp = False, useMmap = useMmap)
+        self.assertEqual(font.reader.mmap is not None, useMmap)
+        font["glyf"]  # Decompiled from a view, if mapped
+        font["hhea"]
+        outputPath = os.path.join(self.tempDir, fileName)
+        font.save(outputPath)
+        font.close()
+        with open(outputPath, "rb") as outputFile:
+            return outputFile.read()
+
+    def test_same_output(self):
+        self.assertEqual(self.saveCopy(True, "mapped.ttf"), self.saveCopy(False, "read.ttf"))
+
+    def test_glyphs(self):
+        mapped = TTFont(self.path, useMmap = True)
+        read = TTFont(self.path)
+        mappedGlyphs = mapped["glyf"].glyphs
+        readGlyphs = read["glyf"].glyphs
+        self.assertEqual(sorted(mappedGlyphs.keys()), sorted(readGlyphs.keys()))
+        for glyphName, glyph in mappedGlyphs.items():
+            data = getattr(glyph, "data", b"")  # Empty glyphs keep no data
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(data, getattr(readGlyphs[glyphName], "data", b""))
+        mapped.close()
+        read.close()
+
+    def test_no_overwrite(self):
+        font = TTFont(self.path, useMmap = True)
+        self.assertRaises(TTLibError, font.save, self.path)
+        font.close()
+
+
+class UnseekableStream(object):
+
+    def __init__(self):
+        self.stream = BytesIO()
+
+    def write(self, data):
+        self.stream.write(data)
+
+
+class SaveDirectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempDir, "test.ttf")
+        makeTestFontFile(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def saveCopy(self, stream, useMmap = False):
+        font = TTFont(self.path, recalcTimestamp = False, useMmap = useMmap)
+        font["hhea"].lineGap = 100  # The other tables are copied.
+        font.save(stream)
+        font.close()
+
+    def checkSameAsSeparateSave(self):
+        expected = UnseekableStream()  # Saved through a temporary stream, table by table
+        self.saveCopy(expected)
+        for useMmap in (False, True):
+            stream = BytesIO()
+            self.saveCopy(stream, useMmap)
+            self.assertEqual(stream.getvalue(), expected.stream.getvalue())
+        return stream.getvalue()
+
+    def test_same_output(self):
+        self.checkSameAsSeparateSave()
+
+    def test_wrong_checksum(self):
+        with open(self.path, "rb") as fontFile:
+            data = bytearray(fontFile.read())
+        reader = sfnt.SFNTReader(BytesIO(bytes(data)))
+        directoryOffset = 12 + 16 * sorted(reader.keys()).index("post")
+        data[directoryOffset + 4:directoryOffset + 8] = b"\0\0\0\0"
+        with open(self.path, "wb") as fontFile:
+            fontFile.write(bytes(data))
+
+        data = self.checkSameAsSeparateSave()
+        reader = sfnt.SFNTReader(BytesIO(data), checkChecksums = 2)
+        reader["post"]  # Raises if the checksum is wrong
+        self.assertEqual(calcChecksumPlain(data), 0xB1B0AFBA)  # Checked through head.checkSumAdjustment
+
+
+class ParallelSaveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        makeTestFontFile(os.path.join(self.tempDir, "test.ttf"))
+        font = TTFont(os.path.join(self.tempDir, "test.ttf"))
+        makeGPOS(font)
+        self.path = os.path.join(self.tempDir, "gpos.ttf")
+        font.save(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def loadFont(self):
+        font = TTFont(self.path, recalcTimestamp = False)
+        for tag in font.keys():
+            font[tag]  # Loaded, so that every table gets compiled
+        font["hhea"].lineGap = 100
+        return font
+
+    def saveCopy(self, workers):
+        stream = BytesIO()
+        font = self.loadFont()
+        font.save(stream, workers = workers)
+        font.close()
+        return stream.getvalue()
+
+    def test_parallel_tables(self):
+        font = self.loadFont()
+        tags = [tag for tag in font.keys() if tag != "GlyphOrder"]
+        parallelTags = font._getParallelTables(tags)
+        self.assertIn("GPOS", parallelTags)
+        for tag in ("glyf", "loca", "head", "hhea", "maxp", "post"):
+            self.assertNotIn(tag, parallelTags)
+        font.close()
+
+    @unittest.skipIf(ttLib._getForkContext() is None, "processes can't be forked")
+    def test_same_output(self):
+        data = self.saveCopy(None)
+        self.assertEqual(self.saveCopy(4), data)
+        font = TTFont(BytesIO(data))
+        self.assertEqual(font["hhea"].lineGap, 100)
+        self.assertEqual(font["GPOS"].compile(font), font.getTableData("GPOS"))
+        font.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
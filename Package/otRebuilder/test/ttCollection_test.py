@@ -0,0 +1,121 @@
+from __future__ import print_function, division, absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+
+import otRebuilder.test
+from otRebuilder.test.sfnt_test import makeTestFontFile
+from fontTools.misc.py23 import BytesIO
+from fontTools.ttLib import TTFont, TTCollection, sfnt
+
+
+FONT_COUNT = 3
+
+
+def readEntries(path):
+    entries = []
+    with open(path, "rb") as file:
+        for i in range(sfnt.readTTCHeader(file).numFonts):
+            file.seek(0)
+            reader = sfnt.SFNTReader(file, fontNumber = i)
+            entries.append(dict((str(tag), (entry.offset, entry.length)) for tag, entry in reader.tables.items()))
+    return entries
+
+
+class TTCollectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.fontPath = os.path.join(self.tempDir, "test.ttf")
+        makeTestFontFile(self.fontPath)
+        self.path = os.path.join(self.tempDir, "test.ttc")
+        collection = TTCollection()
+        for i in range(FONT_COUNT):
+            font = TTFont(self.fontPath, recalcTimestamp = False)
+            if i == FONT_COUNT - 1:
+                font["post"].underlinePosition = -150  # The last font has a `post` of its own.
+            collection.fonts.append(font)
+        collection.save(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def save(self, collection, fileName):
+        outputPath = os.path.join(self.tempDir, fileName)
+        collection.save(outputPath)
+        collection.close()
+        return outputPath
+
+    def test_tables_written_once(self):
+        entries = readEntries(self.path)
+        self.assertEqual(len(entries), FONT_COUNT)
+        self.assertLess(os.path.getsize(self.path), os.path.getsize(self.fontPath) * 1.5)
+        for tag in entries[0]:
+            if tag in ("head", "post"):
+                continue
+            self.assertEqual(set(fontEntries[tag] for fontEntries in entries), set([entries[0][tag]]))
+        self.assertEqual(entries[0]["post"], entries[1]["post"])
+        self.assertNotEqual(entries[0]["post"], entries[-1]["post"])
+        self.assertNotEqual(entries[0]["head"], entries[1]["head"])  # Checksum adjustments of their own
+
+        source = TTFont(self.fontPath)
+        collection = TTCollection(self.path)
+        for font in collection:
+            for tag in source.keys():
+                if tag not in ("GlyphOrder", "head", "post"):
+                    self.assertEqual(font.getTableData(tag), source.getTableData(tag))
+        self.assertEqual(collection[-1]["post"].underlinePosition, -150)
+        collection.close()
+
+    def test_round_trip(self):
+        collection = TTCollection(self.path, shareTables = True, recalcTimestamp = False, useMmap = True)
+        outputPath = self.save(collection, "copy.ttc")
+        with open(self.path, "rb") as inputFile, open(outputPath, "rb") as outputFile:
+            self.assertEqual(outputFile.read(), inputFile.read())
+
+    def test_shared_tables(self):
+        collection = TTCollection(self.path, shareTables = True)
+        self.assertIs(collection[0]["glyf"], collection[-1]["glyf"])
+        self.assertIs(collection[0]["post"], collection[1]["post"])
+        self.assertIsNot(collection[0]["post"], collection[-1]["post"])
+        for font in collection:  # The shared `post` gives its glyph order once only.
+            self.assertEqual(font.getGlyphOrder(), collection[0].getGlyphOrder())
+        collection.close()
+        collection = TTCollection(self.path)
+        self.assertIsNot(collection[0]["glyf"], collection[1]["glyf"])
+        collection.close()
+
+    def test_compiled_once(self):
+        collection = TTCollection(self.path, shareTables = True, recalcTimestamp = False)
+        glyf = collection[0]["glyf"]
+        compiles = []
+        compileChunks = glyf.compileChunks
+        def countingCompileChunks(ttFont):
+            compiles.append(ttFont)
+            return compileChunks(ttFont)
+        glyf.compileChunks = countingCompileChunks
+        collection[0]["hhea"].lineGap = 100  # Loaded by one font, edited for all that share it
+        outputPath = self.save(collection, "edited.ttc")
+        self.assertEqual(len(compiles), 1)
+        entries = readEntries(outputPath)
+        self.assertEqual(set(fontEntries["glyf"] for fontEntries in entries), set([entries[0]["glyf"]]))
+        collection = TTCollection(outputPath)
+        for font in collection:
+            self.assertEqual(font["hhea"].lineGap, 100)
+        collection.close()
+
+    def test_unseekable(self):
+        class Unseekable(BytesIO):
+            def seek(self, *args):
+                raise IOError("not seekable")
+        collection = TTCollection(self.path, recalcTimestamp = False)
+        stream = Unseekable()
+        collection.save(stream)
+        collection.close()
+        with open(self.path, "rb") as inputFile:
+            self.assertEqual(stream.getvalue(), inputFile.read())
+
+
+if __name__ == "__main__":
+    unittest.main()